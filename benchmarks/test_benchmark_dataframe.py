@@ -0,0 +1,64 @@
+"""Benchmark tests for serializing pandas dataframes."""
+
+from __future__ import annotations
+
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from reflex.utils.serializers import format_dataframe_columns, format_dataframe_values
+
+NUM_ROWS = 100_000
+
+
+@pytest.fixture(scope="module")
+def dataframe() -> pd.DataFrame:
+    """A dataframe with numeric, string and datetime columns.
+
+    Returns:
+        The dataframe.
+    """
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(
+        {
+            "id": np.arange(NUM_ROWS),
+            "value": rng.random(NUM_ROWS),
+            "flag": rng.random(NUM_ROWS) > 0.5,
+            "name": [f"row {i}" for i in range(NUM_ROWS)],
+            "date": pd.date_range("2024-01-01", periods=NUM_ROWS, freq="min"),
+        }
+    )
+
+
+@pytest.mark.benchmark(
+    group="Dataframe serialization",
+    min_rounds=5,
+    timer=time.perf_counter,
+    disable_gc=True,
+)
+def test_serialize_dataframe_columns(benchmark, dataframe: pd.DataFrame):
+    """Test formatting a dataframe in the columnar format.
+
+    Args:
+        benchmark: The benchmark fixture.
+        dataframe: The dataframe to format.
+    """
+    benchmark(lambda: format_dataframe_columns(dataframe))
+
+
+@pytest.mark.benchmark(
+    group="Dataframe serialization",
+    min_rounds=5,
+    timer=time.perf_counter,
+    disable_gc=True,
+)
+def test_serialize_dataframe_rows(benchmark, dataframe: pd.DataFrame):
+    """Test formatting a dataframe as a list of rows.
+
+    Args:
+        benchmark: The benchmark fixture.
+        dataframe: The dataframe to format.
+    """
+    benchmark(lambda: format_dataframe_values(dataframe))
@@ -0,0 +1,61 @@
+"""Benchmark tests for sending plotly figures in state updates."""
+
+from __future__ import annotations
+
+import time
+
+import numpy as np
+import plotly.graph_objects as go
+import pytest
+
+from reflex.state import StateUpdate
+from reflex.utils import format
+from reflex.utils.serializers import serialize_figure
+
+NUM_POINTS = 1_000_000
+
+
+@pytest.fixture(scope="module")
+def figure() -> go.Figure:
+    """A scatter figure with many points.
+
+    Returns:
+        The figure.
+    """
+    rng = np.random.default_rng(0)
+    return go.Figure(go.Scattergl(x=np.arange(NUM_POINTS), y=rng.random(NUM_POINTS)))
+
+
+@pytest.mark.benchmark(
+    group="Figure update encoding",
+    timer=time.perf_counter,
+    disable_gc=True,
+)
+def test_encode_figure_serialized(benchmark, figure: go.Figure):
+    """Test encoding a figure parsed back from plotly's JSON.
+
+    Args:
+        benchmark: The benchmark fixture.
+        figure: The figure to encode.
+    """
+    benchmark(
+        lambda: StateUpdate(delta={"state": {"fig": serialize_figure(figure)}}).encode()
+    )
+
+
+@pytest.mark.benchmark(
+    group="Figure update encoding",
+    timer=time.perf_counter,
+    disable_gc=True,
+)
+def test_encode_figure_fragment(benchmark, figure: go.Figure):
+    """Test encoding a figure embedded as its JSON, encoded with the update.
+
+    Args:
+        benchmark: The benchmark fixture.
+        figure: The figure to encode.
+    """
+    formatter = format.get_state_formatter(go.Figure, defer_json=True)
+    benchmark(
+        lambda: StateUpdate(delta={"state": {"fig": formatter(figure, "fig")}}).encode()
+    )
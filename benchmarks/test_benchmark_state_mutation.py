@@ -0,0 +1,98 @@
+"""Benchmark tests for mutating nested structures in state vars."""
+
+from __future__ import annotations
+
+import time
+from typing import Dict, List
+
+import pytest
+
+from reflex.state import BaseState
+
+NUM_ROWS = 1000
+
+
+class NestedMutationState(BaseState):
+    """A state with a list of dicts and a dict of lists."""
+
+    rows: List[Dict[str, int]] = [{"id": i, "count": 0} for i in range(NUM_ROWS)]
+    groups: Dict[str, List[int]] = {str(i): [] for i in range(NUM_ROWS)}
+
+
+@pytest.fixture
+def nested_mutation_state() -> NestedMutationState:
+    """A fresh state with nested structures.
+
+    Returns:
+        The state instance.
+    """
+    return NestedMutationState(_reflex_internal_init=True)  # type: ignore
+
+
+@pytest.mark.benchmark(
+    group="Nested state mutation",
+    min_rounds=10,
+    timer=time.perf_counter,
+    disable_gc=True,
+)
+def test_mutate_iterated_rows(benchmark, nested_mutation_state: NestedMutationState):
+    """Test updating each dict of a list of dicts while iterating over it.
+
+    Args:
+        benchmark: The benchmark fixture.
+        nested_mutation_state: The state to mutate.
+    """
+
+    def benchmark_fn():
+        for row in nested_mutation_state.rows:
+            row["count"] += 1
+        nested_mutation_state.get_delta()
+        nested_mutation_state._clean()
+
+    benchmark(benchmark_fn)
+
+
+@pytest.mark.benchmark(
+    group="Nested state mutation",
+    min_rounds=10,
+    timer=time.perf_counter,
+    disable_gc=True,
+)
+def test_mutate_indexed_rows(benchmark, nested_mutation_state: NestedMutationState):
+    """Test updating the dicts of a list of dicts by index.
+
+    Args:
+        benchmark: The benchmark fixture.
+        nested_mutation_state: The state to mutate.
+    """
+
+    def benchmark_fn():
+        for i in range(NUM_ROWS):
+            nested_mutation_state.rows[i]["count"] = i
+        nested_mutation_state.get_delta()
+        nested_mutation_state._clean()
+
+    benchmark(benchmark_fn)
+
+
+@pytest.mark.benchmark(
+    group="Nested state mutation",
+    min_rounds=10,
+    timer=time.perf_counter,
+    disable_gc=True,
+)
+def test_append_to_nested_lists(benchmark, nested_mutation_state: NestedMutationState):
+    """Test appending to the lists of a dict of lists.
+
+    Args:
+        benchmark: The benchmark fixture.
+        nested_mutation_state: The state to mutate.
+    """
+
+    def benchmark_fn():
+        for key in map(str, range(NUM_ROWS)):
+            nested_mutation_state.groups[key].append(1)
+        nested_mutation_state.get_delta()
+        nested_mutation_state._clean()
+
+    benchmark(benchmark_fn)
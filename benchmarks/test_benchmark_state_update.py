@@ -0,0 +1,103 @@
+"""Benchmark tests for encoding state updates to socket messages."""
+
+from __future__ import annotations
+
+import time
+
+import pytest
+from socketio import packet
+
+from reflex import constants
+from reflex.base import Base
+from reflex.state import StateUpdate
+
+# The approximate encoded size of each row of the delta.
+ROW_SIZE = 50
+
+
+def make_update(size: int, with_none: bool = False) -> StateUpdate:
+    """Create a state update with a delta of about the given size.
+
+    Args:
+        size: The approximate size of the encoded delta in bytes.
+        with_none: Whether the first row has a None value.
+
+    Returns:
+        The state update.
+    """
+    rows = [
+        {"id": i, "name": f"row {i}", "value": i / 3}
+        for i in range(max(size // ROW_SIZE, 1))
+    ]
+    if with_none:
+        rows[0]["value"] = None
+    return StateUpdate(delta={"state.table_state": {"rows": rows, "count": len(rows)}})
+
+
+def encode_message(data: str | bytes) -> list | str:
+    """Encode the Socket.IO message sending an update.
+
+    Args:
+        data: The payload of the message.
+
+    Returns:
+        The encoded message, with any binary attachments.
+    """
+    return packet.Packet(data=[str(constants.SocketEvent.EVENT), data]).encode()
+
+
+@pytest.mark.parametrize(
+    "size", [1024, 100 * 1024, 5 * 1024 * 1024], ids=["1KB", "100KB", "5MB"]
+)
+@pytest.mark.benchmark(
+    group="State update encoding",
+    timer=time.perf_counter,
+    disable_gc=True,
+)
+def test_encode_update_json_string(benchmark, size: int):
+    """Test sending an update as a json string converted through pydantic.
+
+    Args:
+        benchmark: The benchmark fixture.
+        size: The size of the delta.
+    """
+    update = make_update(size)
+    benchmark(lambda: encode_message(Base.json(update)))
+
+
+@pytest.mark.parametrize(
+    "size", [1024, 100 * 1024, 5 * 1024 * 1024], ids=["1KB", "100KB", "5MB"]
+)
+@pytest.mark.benchmark(
+    group="State update encoding",
+    timer=time.perf_counter,
+    disable_gc=True,
+)
+def test_encode_update_payload(benchmark, size: int):
+    """Test sending an update as its encoded payload.
+
+    Args:
+        benchmark: The benchmark fixture.
+        size: The size of the delta.
+    """
+    update = make_update(size)
+    benchmark(lambda: encode_message(update.encode()))
+
+
+@pytest.mark.parametrize(
+    "size", [1024, 100 * 1024, 5 * 1024 * 1024], ids=["1KB", "100KB", "5MB"]
+)
+@pytest.mark.benchmark(
+    group="State update encoding",
+    timer=time.perf_counter,
+    disable_gc=True,
+)
+def test_encode_update_payload_with_none(benchmark, size: int):
+    """Test sending an update with a None value as its encoded payload.
+
+    Args:
+        benchmark: The benchmark fixture.
+        size: The size of the delta.
+    """
+    update = make_update(size, with_none=True)
+    benchmark(lambda: encode_message(update.encode()))
@@ -1,4 +1,5 @@
 import { GridCellKind } from "@glideapps/glide-data-grid";
+import { dataFrameCell, dataFrameLength } from "/utils/helpers/dataframe";
 
 export function getDEColumn(columns, col) {
   let c = columns[col];
@@ -67,3 +68,43 @@ export function formatDataEditorCells(col, row, columns, data) {
   }
   return { kind: GridCellKind.Loading };
 }
+
+export function formatDataWindowCell(col, row, columns, window) {
+  const index = row - window.offset;
+  if (index >= 0 && index < window.rows.length) {
+    return formatDataEditorCells(col, index, columns, window.rows);
+  }
+  return { kind: GridCellKind.Loading };
+}
+
+const value_types = { number: "float", boolean: "bool" };
+
+// Columns of the data editor, by dataframe.
+const dataframe_columns = new WeakMap();
+
+export function getDataFrameColumns(df) {
+  let columns = dataframe_columns.get(df);
+  if (columns === undefined) {
+    columns = df.columns.map((title, col) => ({
+      title: String(title),
+      id: String(title),
+      type: df.types?.[col],
+      pos: col,
+    }));
+    dataframe_columns.set(df, columns);
+  }
+  return columns;
+}
+
+export function formatDataFrameCell(col, row, columns, df) {
+  if (row < dataFrameLength(df) && col < columns.length) {
+    const value = dataFrameCell(df, col, row);
+    const column = columns[col];
+    if (column.type === undefined) {
+      // Dataframes sent as rows have no column types.
+      column.type = value_types[typeof value] ?? "str";
+    }
+    return formatCell(value, column);
+  }
+  return { kind: GridCellKind.Loading };
+}
@@ -0,0 +1,46 @@
+// Rows of the dataframes sent in the columnar format, by dataframe.
+const dataframe_rows = new WeakMap();
+
+/**
+ * Get the number of rows of a serialized dataframe.
+ *
+ * @param {object} df - the serialized dataframe, with either column_data or data
+ * @returns {number} the number of rows
+ */
+export function dataFrameLength(df) {
+  return df.column_data ? df.length : df.data.length;
+}
+
+/**
+ * Get the rows of a serialized dataframe.
+ *
+ * Dataframes sent in the columnar format are transposed once and cached.
+ *
+ * @param {object} df - the serialized dataframe, with either column_data or data
+ * @returns {Array} the list of rows
+ */
+export function dataFrameRows(df) {
+  if (!df.column_data) {
+    return df.data;
+  }
+  let rows = dataframe_rows.get(df);
+  if (rows === undefined) {
+    rows = Array.from({ length: df.length }, (_, row) =>
+      df.column_data.map((column) => column[row])
+    );
+    dataframe_rows.set(df, rows);
+  }
+  return rows;
+}
+
+/**
+ * Get a cell of a serialized dataframe.
+ *
+ * @param {object} df - the serialized dataframe, with either column_data or data
+ * @param {number} col - the index of the column
+ * @param {number} row - the index of the row
+ * @returns the value of the cell
+ */
+export function dataFrameCell(df, col, row) {
+  return df.column_data ? df.column_data[col][row] : df.data[row][col];
+}
@@ -12,6 +12,11 @@ import {
   onLoadInternalEvent,
   state_name,
   exception_state_name,
+  socketProtocol,
+  msgpackDecode,
+  msgpackEncode,
+  zstdDecompress,
+  readOnlyEvents,
 } from "utils/context.js";
 import debounce from "/utils/helpers/debounce";
 import throttle from "/utils/helpers/throttle";
@@ -35,14 +40,64 @@ const cookies = new Cookies();
 // Dictionary holding component references.
 export const refs = {};
 
-// Flag ensures that only one event is processing on the backend concurrently.
-let event_processing = false;
+// The number of events processing on the backend. Only read-only events are
+// processed concurrently, any other event is processed on its own.
+let events_processing = 0;
+// Whether all the events processing on the backend are read-only.
+let read_only_processing = true;
+// The maximum number of read-only events processing on the backend concurrently.
+const MAX_READ_ONLY_EVENTS_PROCESSING = 8;
 // Array holding pending events to be processed.
 const event_queue = [];
 
 // Pending upload promises, by id
 const upload_controllers = {};
 
+// Decoder for state updates sent as JSON bytes.
+const utf8_decoder = new TextDecoder();
+
+// Compressions of large state updates supported by this app and browser.
+const supported_compressions = [
+  ...(zstdDecompress ? ["zstd"] : []),
+  ...(typeof DecompressionStream !== "undefined" ? ["deflate"] : []),
+];
+
+/**
+ * Decode a state update sent as bytes.
+ *
+ * JSON updates are objects, so they start with "{", and compressed updates
+ * start with the zlib header or the zstd magic number, which are never the
+ * first byte of a MessagePack map.
+ *
+ * @param bytes The encoded update.
+ * @returns The state update.
+ */
+const decodeUpdate = async (bytes) => {
+  switch (bytes[0]) {
+    case 0x7b: {
+      const text = utf8_decoder.decode(bytes);
+      try {
+        return JSON.parse(text);
+      } catch (e) {
+        // Compressed updates of backends without orjson may contain NaN.
+        return JSON5.parse(text);
+      }
+    }
+    case 0x78: {
+      const stream = new Blob([bytes])
+        .stream()
+        .pipeThrough(new DecompressionStream("deflate"));
+      return decodeUpdate(
+        new Uint8Array(await new Response(stream).arrayBuffer())
+      );
+    }
+    case 0x28:
+      return decodeUpdate(zstdDecompress(bytes));
+    default:
+      return msgpackDecode(bytes);
+  }
+};
+
 /**
  * Generate a UUID (Used for session tokens).
  * Taken from: https://stackoverflow.com/questions/105034/how-do-i-create-a-guid-uuid
@@ -120,13 +175,67 @@ export const isStateful = () => {
   return event_queue.some(event => event.name.startsWith("reflex___state"));
 }
 
+/**
+ * Apply patch operations to a copy of a state var value.
+ *
+ * Only the containers along the patched paths are copied.
+ * @param value The value of the state var.
+ * @param ops The patch operations to apply, as [op, path, ...args].
+ * @returns The patched value.
+ */
+export const applyPatch = (value, ops) => {
+  const copies = new WeakSet();
+  const copy = (obj) => {
+    if (copies.has(obj)) {
+      return obj;
+    }
+    const obj_copy = Array.isArray(obj) ? [...obj] : { ...obj };
+    copies.add(obj_copy);
+    return obj_copy;
+  };
+  const root = copy(value);
+  for (const [op, path, ...args] of ops) {
+    // set and delete address an item, the other operations a container.
+    const container_path =
+      op === "set" || op === "delete" ? path.slice(0, -1) : path;
+    let container = root;
+    for (const key of container_path) {
+      container = container[key] = copy(container[key]);
+    }
+    const key = path[path.length - 1];
+    if (op === "set") {
+      container[key] = args[0];
+    } else if (op === "delete") {
+      if (Array.isArray(container)) {
+        container.splice(key, 1);
+      } else {
+        delete container[key];
+      }
+    } else if (op === "extend") {
+      container.push(...args[0]);
+    } else if (op === "insert") {
+      container.splice(args[0], 0, args[1]);
+    } else if (op === "update") {
+      Object.assign(container, args[0]);
+    }
+  }
+  return root;
+};
+
 /**
  * Apply a delta to the state.
  * @param state The state to apply the delta to.
  * @param delta The delta to apply.
  */
 export const applyDelta = (state, delta) => {
-  return { ...state, ...delta };
+  const new_state = { ...state, ...delta };
+  for (const [key, value] of Object.entries(delta)) {
+    // Values changed in place are sent as patch operations on the previous value.
+    if (value !== null && typeof value === "object" && "__reflex_patch" in value) {
+      new_state[key] = applyPatch(state[key], value.__reflex_patch);
+    }
+  }
+  return new_state;
 };
 
 /**
@@ -143,14 +252,34 @@ export const queueEventIfSocketExists = async (events, socket) => {
   await queueEvents(events, socket);
 }
 
+/**
+ * Take the backend events at the head of the queue, which are not read-only,
+ * so they are sent in a batch.
+ * @returns The events taken off the queue.
+ */
+const takeEventBatch = () => {
+  const batch = [];
+  while (
+    event_queue.length > 0 &&
+    !event_queue[0].handler &&
+    // Backend event names include the name of the state.
+    event_queue[0].name.includes(".") &&
+    !readOnlyEvents.has(event_queue[0].name)
+  ) {
+    batch.push(event_queue.shift());
+  }
+  return batch;
+};
+
 /**
  * Handle frontend event or send the event to the backend via Websocket.
  * @param event The event to send.
  * @param socket The socket object to send the event on.
+ * @param batch Whether to send the backend events queued after the event along with it.
  *
  * @returns True if the event was sent, false if it was handled locally.
  */
-export const applyEvent = async (event, socket) => {
+export const applyEvent = async (event, socket, batch = false) => {
   // Handle special events
   if (event.name == "_redirect") {
     if (event.payload.external) {
@@ -255,24 +384,35 @@ export const applyEvent = async (event, socket) => {
     return false;
   }
 
-  // Update token and router data (if missing).
-  event.token = getToken();
-  if (
-    event.router_data === undefined ||
-    Object.keys(event.router_data).length === 0
-  ) {
-    event.router_data = (({ pathname, query, asPath }) => ({
-      pathname,
-      query,
-      asPath,
-    }))(Router);
-  }
-
-  // Send the event to the server.
+  // Send the event to the server, the backend processes a batch of events at once.
   if (socket) {
+    const events = batch ? [event, ...takeEventBatch()] : [event];
+    for (const batch_event of events) {
+      // Update token and router data (if missing).
+      batch_event.token = getToken();
+      if (
+        batch_event.router_data === undefined ||
+        Object.keys(batch_event.router_data).length === 0
+      ) {
+        batch_event.router_data = (({ pathname, query, asPath }) => ({
+          pathname,
+          query,
+          asPath,
+        }))(Router);
+      }
+    }
+    const data = events.length === 1 ? event : events;
     socket.emit(
       "event",
-      JSON.stringify(event, (k, v) => (v === undefined ? null : v))
+      socketProtocol === "msgpack"
+        ? msgpackEncode(data)
+        : JSON.stringify(data, (k, v) => (v === undefined ? null : v)),
+      // The backend acknowledges the events once all their updates are sent,
+      // unlike the updates of background tasks and uploads.
+      () => {
+        events_processing = Math.max(events_processing - 1, 0);
+        processEvent(socket);
+      }
     );
     return true;
   }
@@ -320,7 +460,27 @@ export const queueEvents = async (events, socket) => {
 };
 
 /**
- * Process an event off the event queue.
+ * Check whether the next event in the queue can be processed now.
+ * @returns True if no event is processing, or if the next event and all the
+ * events processing are read-only.
+ */
+const canProcessNextEvent = () => {
+  if (event_queue.length === 0) {
+    return false;
+  }
+  if (events_processing === 0) {
+    return true;
+  }
+  return (
+    read_only_processing &&
+    events_processing < MAX_READ_ONLY_EVENTS_PROCESSING &&
+    !event_queue[0].handler &&
+    readOnlyEvents.has(event_queue[0].name)
+  );
+};
+
+/**
+ * Process events off the event queue.
  * @param socket The socket object to send the event on.
  */
 export const processEvent = async (socket) => {
@@ -329,31 +489,37 @@ export const processEvent = async (socket) => {
     return;
   }
 
-  // Only proceed if we're not already processing an event.
-  if (event_queue.length === 0 || event_processing) {
+  // Only proceed if the next event can be processed with the events already processing.
+  if (!canProcessNextEvent()) {
     return;
   }
 
-  // Set processing to true to block other events from being processed.
-  event_processing = true;
-
   // Apply the next event in the queue.
   const event = event_queue.shift();
 
+  // Block other events from being processed, unless they are read-only too.
+  read_only_processing =
+    (events_processing === 0 || read_only_processing) &&
+    !event.handler &&
+    readOnlyEvents.has(event.name);
+  events_processing += 1;
+
   let eventSent = false;
   // Process events with handlers via REST and all others via websockets.
   if (event.handler) {
     eventSent = await applyRestEvent(event, socket);
   } else {
-    eventSent = await applyEvent(event, socket);
+    // Events queued behind an event which is not read-only are processed with it.
+    eventSent = await applyEvent(event, socket, !read_only_processing);
   }
-  // If no event was sent, set processing to false.
+  // If no event was sent, it is not processing.
   if (!eventSent) {
-    event_processing = false;
-    // recursively call processEvent to drain the queue, since there is
-    // no state update to trigger the useEffect event loop.
-    await processEvent(socket);
+    events_processing -= 1;
   }
+  // recursively call processEvent to drain the queue, since there is
+  // no state update to trigger the useEffect event loop when no event
+  // was sent, and more read-only events may be sent along with this one.
+  await processEvent(socket);
 };
 
 /**
@@ -379,6 +545,10 @@ export const connect = async (
     path: endpoint["pathname"],
     transports: transports,
     autoUnref: false,
+    query: {
+      protocol: socketProtocol,
+      compression: supported_compressions.join(","),
+    },
   });
 
   function checkVisibility() {
@@ -409,23 +579,33 @@ export const connect = async (
     setConnectErrors((connectErrors) => [connectErrors.slice(-9), error]);
   });
 
-  // When the socket disconnects reset the event_processing flag
+  // When the socket disconnects reset the processing events
   socket.current.on("disconnect", () => {
-    event_processing = false;
+    events_processing = 0;
     window.removeEventListener("pagehide", pagehideHandler);
   });
 
+  // Updates are applied in order, even when some must be decompressed first.
+  let pending_update = Promise.resolve();
+
   // On each received message, queue the updates and events.
   socket.current.on("event", (message) => {
-    const update = JSON5.parse(message);
-    for (const substate in update.delta) {
-      dispatch[substate](update.delta[substate]);
-    }
-    applyClientStorageDelta(client_storage, update.delta);
-    event_processing = !update.final;
-    if (update.events) {
-      queueEvents(update.events, socket);
-    }
+    pending_update = pending_update
+      .then(async () => {
+        // Updates are sent as MessagePack or strict JSON bytes, possibly
+        // compressed, or as a string if the backend cannot encode them.
+        const update =
+          typeof message === "string"
+            ? JSON5.parse(message)
+            : await decodeUpdate(new Uint8Array(message));
+        for (const substate in update.delta) {
+          dispatch[substate](update.delta[substate]);
+        }
+        applyClientStorageDelta(client_storage, update.delta);
+        // Process the next events, there may be no delta to trigger the event loop.
+        queueEvents(update.events ?? [], socket);
+      })
+      .catch((e) => console.error("Failed to apply state update", e));
   });
 
   document.addEventListener("visibilitychange", checkVisibility);
@@ -741,7 +921,7 @@ export const useEventLoop = (
       }
       (async () => {
         // Process all outstanding events.
-        while (event_queue.length > 0 && !event_processing) {
+        while (canProcessNextEvent()) {
           await processEvent(socket.current);
         }
       })();
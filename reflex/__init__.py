@@ -299,10 +299,13 @@ _MAPPING: dict = {
         "console_log",
         "download",
         "prevent_default",
+        "read_only",
         "redirect",
         "remove_cookie",
         "remove_local_storage",
         "remove_session_storage",
+        "run_in_process",
+        "run_in_thread",
         "set_clipboard",
         "set_focus",
         "scroll_to",
@@ -319,6 +322,8 @@ _MAPPING: dict = {
         "LocalStorage",
         "SessionStorage",
         "ComponentState",
+        "DataSourceState",
+        "DataWindow",
         "State",
     ],
     "style": ["Style", "toggle_color_mode"],
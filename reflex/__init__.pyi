@@ -161,10 +161,13 @@ from .event import clear_session_storage as clear_session_storage
 from .event import console_log as console_log
 from .event import download as download
 from .event import prevent_default as prevent_default
+from .event import read_only as read_only
 from .event import redirect as redirect
 from .event import remove_cookie as remove_cookie
 from .event import remove_local_storage as remove_local_storage
 from .event import remove_session_storage as remove_session_storage
+from .event import run_in_process as run_in_process
+from .event import run_in_thread as run_in_thread
 from .event import scroll_to as scroll_to
 from .event import set_clipboard as set_clipboard
 from .event import set_focus as set_focus
@@ -180,6 +183,8 @@ from .model import session as session
 from .page import page as page
 from .state import ComponentState as ComponentState
 from .state import Cookie as Cookie
+from .state import DataSourceState as DataSourceState
+from .state import DataWindow as DataWindow
 from .state import LocalStorage as LocalStorage
 from .state import SessionStorage as SessionStorage
 from .state import State as State
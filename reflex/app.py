@@ -7,13 +7,18 @@ import concurrent.futures
 import contextlib
 import copy
 import functools
+import heapq
 import inspect
 import io
+import itertools
+import json
 import multiprocessing
 import os
 import platform
 import sys
 import traceback
+import urllib.parse
+import zlib
 from datetime import datetime
 from pathlib import Path
 from typing import (
@@ -79,6 +84,7 @@ from reflex.state import (
     RouterData,
     State,
     StateManager,
+    StateManagerMemory,
     StateUpdate,
     _substate_key,
     code_uses_state_contexts,
@@ -243,6 +249,9 @@ class App(MiddlewareMixin, LifespanMixin, Base):
     # Background tasks that are currently running. PRIVATE.
     background_tasks: Set[asyncio.Task] = set()
 
+    # Schedules the background tasks within the concurrency limits.
+    _background_task_scheduler: Optional[BackgroundTaskScheduler] = None
+
     # Frontend Error Handler Function
     frontend_exception_handler: Callable[[Exception], None] = (
         default_frontend_exception_handler
@@ -322,6 +331,16 @@ class App(MiddlewareMixin, LifespanMixin, Base):
 
         # Set up the state manager.
         self._state_manager = StateManager.create(state=self.state)
+        self._background_task_scheduler = BackgroundTaskScheduler(
+            max_tasks=config.background_task_max_concurrency,
+            max_tasks_per_token=config.background_task_max_concurrency_per_client,
+        )
+        if isinstance(self._state_manager, StateManagerMemory) and (
+            self._state_manager.token_expiration is not None
+            or self._state_manager.spill_dir is not None
+        ):
+            # Evict the expired (and spilled) states while the app is running.
+            self.register_lifespan_task(self._state_manager.sweep)
 
         # Set up the Socket.IO AsyncServer.
         if not self.sio:
@@ -695,7 +714,13 @@ class App(MiddlewareMixin, LifespanMixin, Base):
             and i != ""
             and any(tag.install for tag in tags)
         }
-        frontend_packages = get_config().frontend_packages
+        config = get_config()
+        # The decoders of the optional encodings of the event websocket.
+        if config.socket_protocol == constants.SocketProtocol.MSGPACK:
+            page_imports.add(constants.PackageJson.MSGPACK_DEPENDENCY)
+        if config.socket_compression == constants.SocketCompression.ZSTD:
+            page_imports.add(constants.PackageJson.ZSTD_DEPENDENCY)
+        frontend_packages = config.frontend_packages
         _frontend_packages = []
         for package in frontend_packages:
             if package in (get_config().tailwind or {}).get("plugins", []):  # type: ignore
@@ -1091,7 +1116,7 @@ class App(MiddlewareMixin, LifespanMixin, Base):
         async with self.state_manager.modify_state(token) as state:
             # No other event handler can modify the state while in this context.
             yield state
-            delta = state.get_delta()
+            delta = state._get_delta(defer_json=True)
             if delta:
                 # When the state is modified reset dirty status and emit the delta to the frontend.
                 state._clean()
@@ -1100,6 +1125,56 @@ class App(MiddlewareMixin, LifespanMixin, Base):
                     sid=state.router.session.session_id,
                 )
 
+    def _get_event_handler(self, event: Event) -> EventHandler | None:
+        """Get the event handler of the state class for an event.
+
+        Args:
+            event: The event to get the handler for.
+
+        Returns:
+            The event handler, or None if the event has no handler.
+        """
+        if self.state is None:
+            return None
+        state_path, _, name = event.name.rpartition(".")
+        try:
+            return self.state.get_class_substate(state_path).event_handlers.get(name)
+        except ValueError:
+            return None
+
+    def _is_read_only_event(self, event: Event) -> bool:
+        """Check whether an event is handled by a read-only event handler.
+
+        Args:
+            event: The event to check.
+
+        Returns:
+            Whether the event handler is marked as read-only.
+        """
+        handler = self._get_event_handler(event)
+        return handler is not None and handler.is_read_only
+
+    def _coalesce_events(self, events: List[Event]) -> List[Event]:
+        """Drop the calls of the setter of a var which are followed by another call.
+
+        Only the value of the last call of consecutive calls of a setter is set.
+
+        Args:
+            events: The events to coalesce, in order.
+
+        Returns:
+            The remaining events, in order.
+        """
+        coalesced = []
+        for event, next_event in zip(events, events[1:]):
+            if event.name == next_event.name:
+                handler = self._get_event_handler(event)
+                if handler is not None and handler.is_setter:
+                    continue
+            coalesced.append(event)
+        coalesced.append(events[-1])
+        return coalesced
+
     def _process_background(
         self, state: BaseState, event: Event
     ) -> asyncio.Task | None:
@@ -1138,7 +1213,14 @@ class App(MiddlewareMixin, LifespanMixin, Base):
                     sid=state.router.session.session_id,
                 )
 
-        task = asyncio.create_task(_coro())
+        if self._background_task_scheduler is None:
+            task = asyncio.create_task(_coro())
+        else:
+            task = self._background_task_scheduler.schedule(
+                token=event.token,
+                coro=_coro(),
+                priority=handler.background_priority,
+            )
         self.background_tasks.add(task)
         # Clean up task from background_tasks set when complete.
         task.add_done_callback(self.background_tasks.discard)
@@ -1251,56 +1333,78 @@ async def process(
         headers: The client headers.
         client_ip: The client_ip.
 
+    Yields:
+        The state updates after processing the event.
+    """
+    async for update in process_events(app, [event], sid, headers, client_ip):
+        yield update
+
+
+async def process_events(
+    app: App, events: List[Event], sid: str, headers: Dict, client_ip: str
+) -> AsyncIterator[StateUpdate]:
+    """Process a batch of events for the same token.
+
+    Consecutive calls of the setter of a var are coalesced into the last one,
+    and all events are processed with a single acquisition of the state. The
+    updates of the events are merged into a single final update, only updates
+    yielded while an event is processing are sent separately.
+
+    Args:
+        app: The app to process the events for.
+        events: The events to process, in order.
+        sid: The Socket.IO session id.
+        headers: The client headers.
+        client_ip: The client_ip.
+
     Raises:
-        Exception: If a reflex specific error occurs during processing the event.
+        ValueError: If the events are not all for the same token.
+        Exception: If a reflex specific error occurs during processing the events.
 
     Yields:
-        The state updates after processing the event.
+        The state updates after processing the events.
     """
     from reflex.utils import telemetry
 
+    if any(event.token != events[0].token for event in events):
+        raise ValueError("All events of a batch must be for the same token.")
+
     try:
-        # Add request data to the state.
-        router_data = event.router_data
-        router_data.update(
-            {
-                constants.RouteVar.QUERY: format.format_query_params(event.router_data),
-                constants.RouteVar.CLIENT_TOKEN: event.token,
-                constants.RouteVar.SESSION_ID: sid,
-                constants.RouteVar.HEADERS: headers,
-                constants.RouteVar.CLIENT_IP: client_ip,
-            }
-        )
+        events = app._coalesce_events(events)
+        for event in events:
+            # Add request data to the state.
+            event.router_data.update(
+                {
+                    constants.RouteVar.QUERY: format.format_query_params(
+                        event.router_data
+                    ),
+                    constants.RouteVar.CLIENT_TOKEN: event.token,
+                    constants.RouteVar.SESSION_ID: sid,
+                    constants.RouteVar.HEADERS: headers,
+                    constants.RouteVar.CLIENT_IP: client_ip,
+                }
+            )
+        substate_token = events[0].substate_token
+
+        if all(app._is_read_only_event(event) for event in events):
+            # Share the state with other read-only events for the session.
+            async with app.state_manager.read_state(substate_token) as state:
+                # Updating the router data requires exclusive access.
+                read_only = all(
+                    state.router_data == event.router_data for event in events
+                )
+                if read_only:
+                    async for update in _process_state(app, state, events):
+                        yield update
+            if read_only:
+                return
+
         # Get the state for the session exclusively.
-        async with app.state_manager.modify_state(event.substate_token) as state:
-            # re-assign only when the value is different
-            if state.router_data != router_data:
-                # assignment will recurse into substates and force recalculation of
-                # dependent ComputedVar (dynamic route variables)
-                state.router_data = router_data
-                state.router = RouterData(router_data)
-
-            # Preprocess the event.
-            update = await app._preprocess(state, event)
-
-            # If there was an update, yield it.
-            if update is not None:
+        async with app.state_manager.modify_state(substate_token) as state:
+            async for update in _process_state(
+                app, state, events, update_router_data=True
+            ):
                 yield update
-
-            # Only process the event if there is no update.
-            else:
-                if app._process_background(state, event) is not None:
-                    # `final=True` allows the frontend send more events immediately.
-                    yield StateUpdate(final=True)
-                    return
-
-                # Process the event synchronously.
-                async for update in state._process(event):
-                    # Postprocess the event.
-                    update = await app._postprocess(state, event, update)
-
-                    # Yield the update.
-                    yield update
     except Exception as ex:
         telemetry.send_error(ex, context="backend")
 
@@ -1308,6 +1412,135 @@ async def process(
         raise
 
 
+async def _process_state(
+    app: App, state: BaseState, events: List[Event], update_router_data: bool = False
+) -> AsyncIterator[StateUpdate]:
+    """Process a batch of events with the state for the session.
+
+    Args:
+        app: The app to process the events for.
+        state: The state for the session.
+        events: The events to process, in order.
+        update_router_data: Whether to update the router data of the state for each event.
+
+    Yields:
+        The state updates after processing the events.
+    """
+    merged_update = None
+    for i, event in enumerate(events):
+        # re-assign only when the value is different
+        if update_router_data and state.router_data != event.router_data:
+            # assignment will recurse into substates and force recalculation of
+            # dependent ComputedVar (dynamic route variables)
+            state.router_data = event.router_data
+            state.router = RouterData(event.router_data)
+
+        if i > 0 and app.state is not None:
+            # Fetch the substates the previous events did not need.
+            await state.get_state(
+                app.state.get_class_substate(event.name.rpartition(".")[0])
+            )
+
+        async for update in _process_state_event(app, state, event):
+            if merged_update is not None:
+                merged = _merge_updates(merged_update, update)
+                if merged is None:
+                    # Send the updates merged so far first.
+                    yield merged_update.copy(update={"final": False})
+                else:
+                    update = merged
+                merged_update = None
+            if update.final and i < len(events) - 1:
+                # Hold the update back to merge it with the updates of the next events.
+                merged_update = update
+            else:
+                yield update
+    if merged_update is not None:
+        yield merged_update
+
+
+def _merge_updates(update: StateUpdate, next_update: StateUpdate) -> StateUpdate | None:
+    """Merge two consecutive state updates.
+
+    Vars sent as patches are only merged with the patches of the same var.
+
+    Args:
+        update: The earlier update.
+        next_update: The later update.
+
+    Returns:
+        The merged update, or None if the updates cannot be merged.
+    """
+    delta = {substate: dict(subdelta) for substate, subdelta in update.delta.items()}
+    for substate, next_subdelta in next_update.delta.items():
+        subdelta = delta.setdefault(substate, {})
+        for var_name, value in next_subdelta.items():
+            if _is_patch(value) and var_name in subdelta:
+                if not _is_patch(subdelta[var_name]):
+                    # The patch applies to a value the frontend has not received yet.
+                    return None
+                value = {
+                    constants.CompileVars.PATCH: [
+                        *subdelta[var_name][constants.CompileVars.PATCH],
+                        *value[constants.CompileVars.PATCH],
+                    ]
+                }
+            subdelta[var_name] = value
+    return StateUpdate(
+        delta=delta,
+        events=[*update.events, *next_update.events],
+        final=next_update.final,
+    )
+
+
+def _is_patch(value: Any) -> bool:
+    """Check whether a value in a delta is sent as patch operations.
+
+    Args:
+        value: The formatted value.
+
+    Returns:
+        Whether the value is a patch.
+    """
+    return isinstance(value, dict) and constants.CompileVars.PATCH in value
+
+
+async def _process_state_event(
+    app: App, state: BaseState, event: Event
+) -> AsyncIterator[StateUpdate]:
+    """Process an event with the state for the session.
+
+    Args:
+        app: The app to process the event for.
+        state: The state for the session.
+        event: The event to process.
+
+    Yields:
+        The state updates after processing the event.
+    """
+    # Preprocess the event.
+    update = await app._preprocess(state, event)
+
+    # If there was an update, yield it.
+    if update is not None:
+        yield update
+        return
+
+    # Only process the event if there is no update.
+    if app._process_background(state, event) is not None:
+        # `final=True` allows the frontend send more events immediately.
+        yield StateUpdate(final=True)
+        return
+
+    # Process the event synchronously.
+    async for update in state._process(event):
+        # Postprocess the event.
+        update = await app._postprocess(state, event, update)
+
+        # Yield the update.
+        yield update
+
+
 async def ping() -> str:
     """Test API endpoint.
 
@@ -1437,6 +1670,268 @@ def upload(app: App):
     return upload_file
 
 
+def _get_update_compressor(
+    compression: constants.SocketCompression,
+) -> Callable[[bytes], bytes]:
+    """Get the function compressing state updates with an algorithm.
+
+    Args:
+        compression: The compression algorithm.
+
+    Returns:
+        The compression function.
+
+    Raises:
+        ImportError: If the package for the compression algorithm is not installed.
+    """
+    if compression == constants.SocketCompression.ZSTD:
+        try:
+            import zstandard
+        except ImportError as ie:
+            raise ImportError(
+                "Please install the `zstandard` package to use zstd socket compression."
+            ) from ie
+        return zstandard.ZstdCompressor().compress
+    return zlib.compress
+
+
+class UpdateMetrics(Base):
+    """Size metrics of the state updates sent over the event websocket."""
+
+    # The number of updates sent.
+    count: int = 0
+
+    # The number of updates sent compressed.
+    compressed_count: int = 0
+
+    # The total size of the encoded updates, in bytes (UTF-8 for updates sent as strings).
+    encoded_bytes: int = 0
+
+    # The total size of the updates as sent, after compression, in bytes.
+    sent_bytes: int = 0
+
+    # The size of the largest encoded update, in bytes.
+    max_encoded_bytes: int = 0
+
+    def record(self, encoded_bytes: int, sent_bytes: int, compressed: bool):
+        """Record the sizes of a sent update.
+
+        Args:
+            encoded_bytes: The size of the encoded update.
+            sent_bytes: The size of the update as sent.
+            compressed: Whether the update was compressed.
+        """
+        self.count += 1
+        self.compressed_count += compressed
+        self.encoded_bytes += encoded_bytes
+        self.sent_bytes += sent_bytes
+        self.max_encoded_bytes = max(self.max_encoded_bytes, encoded_bytes)
+
+
+class BackgroundTaskMetrics(Base):
+    """Metrics of the background tasks scheduled by a backend worker."""
+
+    # The number of background tasks waiting to start.
+    queued: int = 0
+
+    # The number of background tasks running.
+    running: int = 0
+
+    # The largest number of background tasks waiting to start at once.
+    max_queued: int = 0
+
+    # The total number of background tasks started.
+    started: int = 0
+
+    # The total number of background tasks cancelled before they finished.
+    cancelled: int = 0
+
+
+class BackgroundTaskScheduler:
+    """Run background tasks with concurrency limits, in order of priority.
+
+    A background task waits to start while max_tasks tasks are running, or
+    while max_tasks_per_token tasks are running for its client. Waiting tasks
+    with a higher priority start first, tasks with the same priority start in
+    the order they were scheduled.
+    """
+
+    def __init__(
+        self, max_tasks: int | None = None, max_tasks_per_token: int | None = None
+    ):
+        """Create a scheduler.
+
+        Args:
+            max_tasks: The maximum number of running tasks (None for no limit).
+            max_tasks_per_token: The maximum number of running tasks for a client (None for no limit).
+        """
+        self.max_tasks = max_tasks
+        self.max_tasks_per_token = max_tasks_per_token
+        self.metrics = BackgroundTaskMetrics()
+        # The number of running tasks for each client.
+        self._running: dict[str, int] = {}
+        # The waiting tasks, as (-priority, sequence number, token, start future).
+        self._queue: list[tuple[int, int, str, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        # The scheduled tasks for each client, waiting or running.
+        self._token_tasks: dict[str, set[asyncio.Task]] = {}
+
+    def schedule(
+        self, token: str, coro: Coroutine[Any, Any, Any], priority: int = 0
+    ) -> asyncio.Task:
+        """Schedule a background task.
+
+        Args:
+            token: The client token the task runs for.
+            coro: The coroutine of the task.
+            priority: The priority of the task.
+
+        Returns:
+            The task, which waits for its turn to run the coroutine.
+        """
+        task = asyncio.create_task(self._run(token, coro, priority))
+        token_tasks = self._token_tasks.setdefault(token, set())
+        token_tasks.add(task)
+        task.add_done_callback(functools.partial(self._discard, token))
+        return task
+
+    def cancel(self, token: str) -> int:
+        """Cancel the waiting and running background tasks of a client.
+
+        Args:
+            token: The client token.
+
+        Returns:
+            The number of cancelled tasks.
+        """
+        tasks = self._token_tasks.get(token, ())
+        for task in tasks:
+            task.cancel()
+        return len(tasks)
+
+    async def _run(self, token: str, coro: Coroutine[Any, Any, Any], priority: int):
+        """Run the coroutine of a task once it may start.
+
+        Args:
+            token: The client token the task runs for.
+            coro: The coroutine of the task.
+            priority: The priority of the task.
+
+        Raises:
+            CancelledError: If the task is cancelled.
+        """
+        try:
+            if not self._can_start(token):
+                start = asyncio.get_running_loop().create_future()
+                heapq.heappush(
+                    self._queue, (-priority, next(self._sequence), token, start)
+                )
+                self._update_queued(1)
+                try:
+                    await start
+                except asyncio.CancelledError:
+                    if start.cancelled():
+                        # The task was cancelled while waiting.
+                        self._update_queued(-1)
+                    else:
+                        # The task was cancelled after it was allowed to start.
+                        self._release(token)
+                    raise
+            else:
+                self._acquire(token)
+        except asyncio.CancelledError:
+            self.metrics.cancelled += 1
+            # The coroutine never ran.
+            coro.close()
+            raise
+        try:
+            await coro
+        except asyncio.CancelledError:
+            self.metrics.cancelled += 1
+            raise
+        finally:
+            self._release(token)
+
+    def _can_start(self, token: str) -> bool:
+        """Check whether a task for a client can start now.
+
+        Args:
+            token: The client token.
+
+        Returns:
+            Whether the running tasks are below the limits.
+        """
+        return (self.max_tasks is None or self.metrics.running < self.max_tasks) and (
+            self.max_tasks_per_token is None
+            or self._running.get(token, 0) < self.max_tasks_per_token
+        )
+
+    def _acquire(self, token: str):
+        """Count a task as running.
+
+        Args:
+            token: The client token of the task.
+        """
+        self._running[token] = self._running.get(token, 0) + 1
+        self.metrics.running += 1
+        self.metrics.started += 1
+
+    def _release(self, token: str):
+        """Count a task as done, and start the waiting tasks which may run now.
+
+        Args:
+            token: The client token of the task.
+        """
+        self._running[token] -= 1
+        if not self._running[token]:
+            del self._running[token]
+        self.metrics.running -= 1
+        self._start_waiting()
+
+    def _start_waiting(self):
+        """Start the waiting tasks which may run, in order of priority."""
+        blocked = []
+        while self._queue and (
+            self.max_tasks is None or self.metrics.running < self.max_tasks
+        ):
+            item = heapq.heappop(self._queue)
+            token, start = item[2], item[3]
+            if start.done():
+                # The task was cancelled while waiting.
+                continue
+            if not self._can_start(token):
+                # The client is at its limit, later tasks of other clients may start.
+                blocked.append(item)
+                continue
+            self._acquire(token)
+            self._update_queued(-1)
+            start.set_result(None)
+        for item in blocked:
+            heapq.heappush(self._queue, item)
+
+    def _update_queued(self, change: int):
+        """Update the number of waiting tasks.
+
+        Args:
+            change: The change of the number of waiting tasks.
+        """
+        self.metrics.queued += change
+        self.metrics.max_queued = max(self.metrics.max_queued, self.metrics.queued)
+
+    def _discard(self, token: str, task: asyncio.Task):
+        """Forget a finished task.
+
+        Args:
+            token: The client token of the task.
+            task: The finished task.
+        """
+        token_tasks = self._token_tasks.get(token)
+        if token_tasks is not None:
+            token_tasks.discard(task)
+            if not token_tasks:
+                del self._token_tasks[token]
+
+
 class EventNamespace(AsyncNamespace):
     """The event namespace."""
 
@@ -1449,6 +1944,15 @@ class EventNamespace(AsyncNamespace):
     # Keep a mapping between client token and socket ID.
     sid_to_token: dict[str, str] = {}
 
+    # The protocol negotiated with each socket, if not JSON.
+    sid_to_protocol: dict[str, constants.SocketProtocol] = {}
+
+    # The compression function negotiated with each socket, if any.
+    sid_to_compressor: dict[str, Callable[[bytes], bytes]] = {}
+
+    # The locks keeping the updates of the sockets with compression in order.
+    sid_to_emit_lock: dict[str, asyncio.Lock] = {}
+
     def __init__(self, namespace: str, app: App):
         """Initialize the event namespace.
 
@@ -1458,50 +1962,154 @@ class EventNamespace(AsyncNamespace):
         """
         super().__init__(namespace)
         self.app = app
+        config = get_config()
+        self.protocol = constants.SocketProtocol(config.socket_protocol)
+        if self.protocol == constants.SocketProtocol.MSGPACK:
+            # Fail on startup if the package is missing.
+            format.get_msgpack()
+        self.compression = (
+            constants.SocketCompression(config.socket_compression)
+            if config.socket_compression is not None
+            else None
+        )
+        self.compressor = (
+            _get_update_compressor(self.compression)
+            if self.compression is not None
+            else None
+        )
+        self.compression_threshold = config.socket_compression_threshold
+        self.metrics = UpdateMetrics()
+        self.cancel_background_tasks_on_disconnect = (
+            config.background_task_cancel_on_disconnect
+        )
 
     def on_connect(self, sid, environ):
         """Event for when the websocket is connected.
 
+        The client offers a protocol and the compressions it supports in the
+        query string, MessagePack and the compression are used if they are
+        also enabled in the config.
+
         Args:
             sid: The Socket.IO session id.
             environ: The request information, including HTTP headers.
         """
-        pass
+        query = urllib.parse.parse_qs(environ.get("QUERY_STRING", ""))
+        if (
+            self.protocol == constants.SocketProtocol.MSGPACK
+            and self.protocol.value in query.get("protocol", [])
+        ):
+            self.sid_to_protocol[sid] = self.protocol
+        if (
+            self.compressor is not None
+            and self.compression is not None
+            and self.compression.value
+            in ",".join(query.get("compression", [])).split(",")
+        ):
+            self.sid_to_compressor[sid] = self.compressor
 
     def on_disconnect(self, sid):
         """Event for when the websocket disconnects.
 
+        The background tasks of the client are cancelled if enabled in the config.
+
         Args:
             sid: The Socket.IO session id.
         """
+        self.sid_to_protocol.pop(sid, None)
+        self.sid_to_compressor.pop(sid, None)
+        self.sid_to_emit_lock.pop(sid, None)
         disconnect_token = self.sid_to_token.pop(sid, None)
         if disconnect_token:
             self.token_to_sid.pop(disconnect_token, None)
+            scheduler = self.app._background_task_scheduler
+            if self.cancel_background_tasks_on_disconnect and scheduler is not None:
+                cancelled = scheduler.cancel(disconnect_token)
+                if cancelled:
+                    console.debug(
+                        f"Cancelled {cancelled} background tasks of a disconnected client"
+                    )
 
     async def emit_update(self, update: StateUpdate, sid: str) -> None:
         """Emit an update to the client.
 
+        Updates larger than the threshold are compressed in a thread if the client
+        supports it, and their sizes are recorded in the metrics of the namespace.
+
         Args:
             update: The state update to send.
             sid: The Socket.IO session id.
         """
+        payload = update.encode(
+            self.sid_to_protocol.get(sid, constants.SocketProtocol.JSON)
+        )
+        compressor = self.sid_to_compressor.get(sid)
+        if compressor is None:
+            # Updates sent as strings are sent as UTF-8.
+            size = len(payload.encode() if isinstance(payload, str) else payload)
+            self.metrics.record(size, size, False)
+            console.debug(f"Sending update of {size} bytes")
+            await self._emit_update_payload(payload, sid)
+            return
+
+        # Updates emitted while a previous one is compressed wait for it.
+        lock = self.sid_to_emit_lock.get(sid)
+        if lock is None:
+            lock = self.sid_to_emit_lock[sid] = asyncio.Lock()
+        async with lock:
+            data = payload.encode() if isinstance(payload, str) else payload
+            encoded_size = len(data)
+            compressed = encoded_size >= self.compression_threshold
+            sent_size = encoded_size
+            if compressed:
+                payload = await asyncio.get_running_loop().run_in_executor(
+                    None, compressor, data
+                )
+                sent_size = len(payload)
+            self.metrics.record(encoded_size, sent_size, compressed)
+            console.debug(
+                f"Sending update of {encoded_size} bytes"
+                + (f" compressed to {sent_size} bytes" if compressed else "")
+            )
+            await self._emit_update_payload(payload, sid)
+
+    async def _emit_update_payload(self, payload: str | bytes, sid: str) -> None:
+        """Emit the encoded payload of an update to the client.
+
+        Args:
+            payload: The encoded update.
+            sid: The Socket.IO session id.
+        """
         # Creating a task prevents the update from being blocked behind other coroutines.
         await asyncio.create_task(
-            self.emit(str(constants.SocketEvent.EVENT), update.json(), to=sid)
+            self.emit(str(constants.SocketEvent.EVENT), payload, to=sid)
         )
 
     async def on_event(self, sid, data):
         """Event for receiving front-end websocket events.
 
+        The events are acknowledged once this returns, after all their updates
+        are emitted, so the frontend knows when to send the next events.
+
         Args:
             sid: The Socket.IO session id.
             data: The event data.
         """
-        # Get the event.
-        event = Event.parse_raw(data)
+        # Get the events, sent as MessagePack bytes or as a JSON string.
+        payload = (
+            format.msgpack_decode(data) if isinstance(data, bytes) else json.loads(data)
+        )
+        # Events queued in the frontend are sent in a batch.
+        events = [
+            Event.parse_obj(event)
+            for event in (payload if isinstance(payload, list) else [payload])
+        ]
+        if not events:
+            return
+        token = events[0].token
 
-        self.token_to_sid[event.token] = sid
-        self.sid_to_token[sid] = event.token
+        self.token_to_sid[token] = sid
+        self.sid_to_token[sid] = token
 
         # Get the event environment.
         assert self.app.sio is not None
@@ -1521,7 +2129,7 @@ class EventNamespace(AsyncNamespace):
             client_ip = environ.get("REMOTE_ADDR", "0.0.0.0")
 
         # Process the events.
-        async for update in process(self.app, event, sid, headers, client_ip):
+        async for update in process_events(self.app, events, sid, headers, client_ip):
             # Emit the update from processing the event.
             await self.emit_update(update=update, sid=sid)
 
@@ -84,6 +84,9 @@ def _compile_contexts(state: Optional[Type[BaseState]], theme: Component | None)
         appearance = SYSTEM_COLOR_MODE
 
     last_compiled_time = str(datetime.now())
+    socket_compression = get_config().socket_compression
+    if socket_compression is not None:
+        socket_compression = constants.SocketCompression(socket_compression).value
     return (
         templates.CONTEXT.render(
             initial_state=utils.compile_state(state),
@@ -92,12 +95,22 @@ def _compile_contexts(state: Optional[Type[BaseState]], theme: Component | None)
             is_dev_mode=not is_prod_mode(),
             last_compiled_time=last_compiled_time,
             default_color_mode=appearance,
+            socket_protocol=constants.SocketProtocol(
+                get_config().socket_protocol
+            ).value,
+            socket_compression=socket_compression,
+            read_only_events=utils.compile_read_only_events(state),
         )
         if state
         else templates.CONTEXT.render(
             is_dev_mode=not is_prod_mode(),
             default_color_mode=appearance,
             last_compiled_time=last_compiled_time,
+            socket_protocol=constants.SocketProtocol(
+                get_config().socket_protocol
+            ).value,
+            socket_compression=socket_compression,
+            read_only_events=[],
         )
     )
 
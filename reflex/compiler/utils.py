@@ -156,6 +156,25 @@ def compile_state(state: Type[BaseState]) -> dict:
     return format.format_state(initial_state)
 
 
+def compile_read_only_events(state: Type[BaseState]) -> list[str]:
+    """Compile the names of the events handled by read-only event handlers.
+
+    Args:
+        state: The app state object.
+
+    Returns:
+        The event names, for the state and all of its substates.
+    """
+    read_only_events = [
+        format.format_event_handler(handler)
+        for handler in state.event_handlers.values()
+        if handler.is_read_only
+    ]
+    for substate in state.get_substates():
+        read_only_events.extend(compile_read_only_events(substate))
+    return read_only_events
+
+
 def _compile_client_storage_field(
     field: ModelField,
 ) -> tuple[
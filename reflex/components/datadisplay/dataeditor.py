@@ -9,10 +9,11 @@ from reflex.base import Base
 from reflex.components.component import Component, NoSSRComponent
 from reflex.components.literals import LiteralRowMarker
 from reflex.event import EventHandler
+from reflex.state import DataWindow
 from reflex.utils import console, format, types
 from reflex.utils.imports import ImportDict, ImportVar
 from reflex.utils.serializers import serializer
-from reflex.vars import Var, get_unique_variable_name
+from reflex.vars import BaseVar, Var, get_unique_variable_name
 
 
 # TODO: Fix the serialization issue for custom types.
@@ -136,8 +137,8 @@ class DataEditor(NoSSRComponent):
     # Headers of the columns for the data grid.
     columns: Var[List[Dict[str, Any]]]
 
-    # The data.
-    data: Var[List[List[Any]]]
+    # The data. Either a list of lists, a pandas dataframe or the window of a data source.
+    data: Var[Any]
 
     # The name of the callback used to find the data to display.
     get_cell_content: Var[str]
@@ -268,6 +269,9 @@ class DataEditor(NoSSRComponent):
     # Fired when a column is resized.
     on_column_resize: EventHandler[lambda col, width: [col, width]]
 
+    # Fired when the visible region changes, with the first column and row and the number of columns and rows.
+    on_visible_region_changed: EventHandler[lambda region: [region]]
+
     def add_imports(self) -> ImportDict:
         """Add imports for the component.
 
@@ -277,8 +281,14 @@ class DataEditor(NoSSRComponent):
         return {
             "": f"{format.format_library_name(self.library)}/dist/index.css",
             self.library: "GridCellKind",
-            "/utils/helpers/dataeditor.js": ImportVar(
-                tag="formatDataEditorCells", is_default=False, install=False
+            "/utils/helpers/dataeditor.js": [
+                ImportVar(tag="formatDataEditorCells", is_default=False, install=False),
+                ImportVar(tag="formatDataFrameCell", is_default=False, install=False),
+                ImportVar(tag="formatDataWindowCell", is_default=False, install=False),
+                ImportVar(tag="getDataFrameColumns", is_default=False, install=False),
+            ],
+            "/utils/helpers/dataframe.js": ImportVar(
+                tag="dataFrameLength", is_default=False, install=False
             ),
         }
 
@@ -302,9 +312,18 @@ class DataEditor(NoSSRComponent):
         columns_path = f"{self.columns._var_full_name}"
         data_path = f"{self.data._var_full_name}"
 
+        # Dataframes are read directly from the serialized columns or rows, and
+        # windows of data sources relative to their offset.
+        if types.is_dataframe(self.data._var_type):
+            format_cells = "formatDataFrameCell"
+        elif types._issubclass(self.data._var_type, DataWindow):
+            format_cells = "formatDataWindowCell"
+        else:
+            format_cells = "formatDataEditorCells"
+
         code.extend(
             [
-                f"    return formatDataEditorCells(col, row, {columns_path}, {data_path});",
+                f"    return {format_cells}(col, row, {columns_path}, {data_path});",
                 "  }",
             ]
         )
@@ -331,8 +350,27 @@ class DataEditor(NoSSRComponent):
         data = props.get("data", [])
         rows = props.get("rows", None)
 
+        if isinstance(data, Var) and types.is_dataframe(data._var_type):
+            if rows is None:
+                props["rows"] = BaseVar(
+                    _var_name=f"dataFrameLength({data._var_full_name})",
+                    _var_type=int,
+                    _var_data=data._var_data,
+                )
+            if not isinstance(columns, Var) and not len(columns):
+                props["columns"] = BaseVar(
+                    _var_name=f"getDataFrameColumns({data._var_full_name})",
+                    _var_type=List[Dict[str, Any]],
+                    _var_data=data._var_data,
+                )
+
+        # The rows of a data source are loaded as the visible region changes.
+        elif isinstance(data, Var) and types._issubclass(data._var_type, DataWindow):
+            if rows is None:
+                props["rows"] = data.total
+
         # If rows is not provided, determine from data.
-        if rows is None:
+        elif rows is None:
             props["rows"] = data.length() if isinstance(data, Var) else len(data)
 
         if not isinstance(columns, Var) and len(columns):
@@ -90,7 +90,7 @@ class DataEditor(NoSSRComponent):
         columns: Optional[
             Union[Var[List[Dict[str, Any]]], List[Dict[str, Any]]]
         ] = None,
-        data: Optional[Union[Var[List[List[Any]]], List[List[Any]]]] = None,
+        data: Optional[Union[Var[Any], Any]] = None,
         get_cell_content: Optional[Union[Var[str], str]] = None,
         get_cell_for_selection: Optional[Union[Var[bool], bool]] = None,
         on_paste: Optional[Union[Var[bool], bool]] = None,
@@ -228,6 +228,9 @@ class DataEditor(NoSSRComponent):
         on_unmount: Optional[
             Union[EventHandler, EventSpec, list, Callable, BaseVar]
         ] = None,
+        on_visible_region_changed: Optional[
+            Union[EventHandler, EventSpec, list, Callable, BaseVar]
+        ] = None,
         **props,
     ) -> "DataEditor":
         """Create the DataEditor component.
@@ -236,7 +239,7 @@ class DataEditor(NoSSRComponent):
             *children: The children of the data editor.
             rows: Number of rows.
             columns: Headers of the columns for the data grid.
-            data: The data.
+            data: The data. Either a list of lists, a pandas dataframe or the window of a data source.
             get_cell_content: The name of the callback used to find the data to display.
             get_cell_for_selection: Allow selection for copying.
             on_paste: Allow paste.
@@ -6,9 +6,9 @@ from typing import Any, Dict, List, Union
 
 from reflex.components.component import Component
 from reflex.components.tags import Tag
+from reflex.state import DataWindow
 from reflex.utils import types
-from reflex.utils.imports import ImportDict
-from reflex.utils.serializers import serialize
+from reflex.utils.imports import ImportDict, ImportVar
 from reflex.vars import BaseVar, ComputedVar, Var
 
 
@@ -58,11 +58,20 @@ class DataTable(Gridjs):
             The datatable component.
 
         Raises:
-            ValueError: If a pandas dataframe is passed in and columns are also provided.
+            ValueError: If a pandas dataframe is passed in and columns are also provided,
+                or if the data is the window of a data source.
         """
         data = props.get("data")
         columns = props.get("columns")
 
+        # gridjs pages, sorts and searches the rows it is given, so it cannot
+        # request the other rows of a data source from the backend.
+        if isinstance(data, Var) and types._issubclass(data._var_type, DataWindow):
+            raise ValueError(
+                "The window of a data source cannot be displayed by the data_table "
+                "component. Use the data_editor component instead."
+            )
+
         # The annotation should be provided if data is a computed var. We need this to know how to
         # render pandas dataframes.
         if isinstance(data, ComputedVar) and data._var_type == Any:
@@ -109,7 +118,12 @@ class DataTable(Gridjs):
         Returns:
             The import dict for the component.
         """
-        return {"": "gridjs/dist/theme/mermaid.css"}
+        return {
+            "": "gridjs/dist/theme/mermaid.css",
+            "/utils/helpers/dataframe.js": ImportVar(
+                tag="dataFrameRows", is_default=False, install=False
+            ),
+        }
 
     def _render(self) -> Tag:
         if isinstance(self.data, Var) and types.is_dataframe(self.data._var_type):
@@ -120,17 +134,16 @@ class DataTable(Gridjs):
                 _var_data=self.data._var_data,
             )
             self.data = BaseVar(
-                _var_name=f"{self.data._var_name}.data",
+                _var_name=f"dataFrameRows({self.data._var_full_name})",
                 _var_type=List[List[Any]],
-                _var_full_name_needs_state_prefix=True,
                 _var_data=self.data._var_data,
             )
         if types.is_dataframe(type(self.data)):
+            from reflex.utils.serializers import format_dataframe_values
+
             # If given a pandas df break up the data and columns
-            data = serialize(self.data)
-            assert isinstance(data, dict), "Serialized dataframe should be a dict."
-            self.columns = Var.create_safe(data["columns"])
-            self.data = Var.create_safe(data["data"])
+            self.columns = Var.create_safe(self.data.columns.tolist())
+            self.data = Var.create_safe(format_dataframe_values(self.data))
 
         # Render the table.
         return super()._render()
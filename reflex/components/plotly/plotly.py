@@ -249,7 +249,14 @@ const extractPoints = (points) => {
             # Mark the conditional Var as a Template to avoid type mismatch
             responsive_template = responsive_template.to(Template)
         props.setdefault("template", responsive_template)
-        return super().create(*children, **props)
+        comp = super().create(*children, **props)
+
+        from reflex.config import get_config
+
+        if get_config().plotly_typed_arrays:
+            # Typed arrays in figures are decoded by plotly.js 2.28 and later.
+            comp.lib_dependencies = ["plotly.js@2.35.2"]
+        return comp
 
     def _exclude_props(self) -> set[str]:
         # These props are handled specially in the _render function
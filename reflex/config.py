@@ -219,12 +219,84 @@ class Config(Base):
     # Number of gunicorn workers from user
     gunicorn_workers: Optional[int] = None
 
-    # Maximum expiration lock time for redis state manager
+    # The state manager to use (None selects redis when redis_url is set and memory otherwise)
+    state_manager_mode: Optional[constants.StateManagerMode] = None
+
+    # Maximum expiration lock time for the redis state manager (superseded by state_lock_expiration)
     redis_lock_expiration: int = constants.Expiration.LOCK
 
-    # Token expiration time for redis state manager
+    # Token expiration time for the redis state manager (superseded by state_token_expiration)
     redis_token_expiration: int = constants.Expiration.TOKEN
 
+    # Maximum expiration lock time (ms) for the redis and disk state managers (defaults to redis_lock_expiration)
+    state_lock_expiration: Optional[int] = None
+
+    # Token expiration time (s) for the redis and disk state managers and for the states spilled by the memory
+    # state manager (defaults to redis_token_expiration)
+    state_token_expiration: Optional[int] = None
+
+    # The serializer used to encode states persisted by the redis state manager
+    state_serializer: constants.StateSerializer = constants.StateSerializer.PICKLE
+
+    # Optional compression of persisted states (requires the `zstandard` or `lz4` package)
+    state_compression: Optional[constants.StateCompression] = None
+
+    # Maximum number of deserialized states cached per worker in front of redis (0 disables the cache)
+    redis_state_cache_size: int = 0
+
+    # How states are stored in redis (hash only writes the modified vars of a state)
+    redis_state_layout: constants.StateLayout = constants.StateLayout.STRING
+
+    # Whether the redis keys of a token share a {hash tag}, required on Redis Cluster
+    # (changes the key names, so states stored without it are not read)
+    redis_cluster_hash_tags: bool = False
+
+    # Seconds of inactivity after which the memory state manager evicts a state (None keeps states forever)
+    memory_state_expiration: Optional[int] = None
+
+    # Maximum number of states kept by the memory state manager, the least recently used are evicted first
+    memory_state_max_entries: Optional[int] = None
+
+    # Directory where the memory state manager spills states evicted for exceeding the maximum, to restore them later
+    # (spilled states are deleted after memory_state_expiration, or state_token_expiration if it is not set)
+    memory_state_spill_dir: Optional[str] = None
+
+    # The database file of the disk state manager (defaults to .web/states/states.db)
+    disk_state_path: Optional[str] = None
+
+    # How pandas dataframes are sent to the frontend (columns is faster for large frames, but changes their serialized shape)
+    dataframe_format: constants.DataFrameFormat = constants.DataFrameFormat.ROWS
+
+    # The encoding of the messages of the event websocket (msgpack requires the `msgpack` package)
+    socket_protocol: constants.SocketProtocol = constants.SocketProtocol.JSON
+
+    # Compression of large messages of the event websocket, for clients supporting it (zstd requires the `zstandard` package)
+    socket_compression: Optional[constants.SocketCompression] = None
+
+    # Minimum size in bytes of the state updates compressed with the socket compression
+    socket_compression_threshold: int = 16 * 1024
+
+    # Whether numeric arrays of plotly figures in state updates are sent as typed arrays (base64 binary, installs plotly.js 2.35.2 instead of 2.22.0)
+    plotly_typed_arrays: bool = False
+
+    # The maximum number of background tasks running at once in a backend worker (None for no limit)
+    background_task_max_concurrency: Optional[int] = None
+
+    # The maximum number of background tasks running at once for a client (None for no limit)
+    background_task_max_concurrency_per_client: Optional[int] = None
+
+    # Whether to cancel the background tasks of a client when its websocket disconnects
+    background_task_cancel_on_disconnect: bool = False
+
+    # Whether all synchronous event handlers (except var setters) run in a thread pool instead of on the event loop
+    sync_event_handlers_in_thread: bool = False
+
+    # The maximum number of threads running synchronous event handlers (None for the default of the thread pool)
+    sync_event_handler_max_threads: Optional[int] = None
+
+    # The maximum number of worker processes running event handlers marked with rx.run_in_process (None for the number of CPUs)
+    process_event_handler_max_workers: Optional[int] = None
+
     # Attributes that were explicitly set by the user.
     _non_default_attributes: Set[str] = pydantic.PrivateAttr(set())
 
@@ -299,6 +371,26 @@ class Config(Base):
 
         return updated_values
 
+    def get_state_lock_expiration(self) -> int:
+        """Get the maximum expiration lock time of the state managers.
+
+        Returns:
+            The state_lock_expiration, or redis_lock_expiration if it is not set.
+        """
+        if self.state_lock_expiration is not None:
+            return self.state_lock_expiration
+        return self.redis_lock_expiration
+
+    def get_state_token_expiration(self) -> int:
+        """Get the token expiration time of the state managers.
+
+        Returns:
+            The state_token_expiration, or redis_token_expiration if it is not set.
+        """
+        if self.state_token_expiration is not None:
+            return self.state_token_expiration
+        return self.redis_token_expiration
+
     def get_event_namespace(self) -> str:
         """Get the path that the backend Websocket server lists on.
 
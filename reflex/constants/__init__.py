@@ -37,10 +37,17 @@ from .compiler import (
 from .config import (
     ALEMBIC_CONFIG,
     Config,
+    DataFrameFormat,
     DefaultPorts,
     Expiration,
     GitIgnore,
     RequirementsTxt,
+    SocketCompression,
+    SocketProtocol,
+    StateCompression,
+    StateLayout,
+    StateManagerMode,
+    StateSerializer,
 )
 from .custom_components import (
     CustomComponents,
@@ -73,6 +80,7 @@ __ALL__ = [
     COOKIES,
     ComponentName,
     CustomComponents,
+    DataFrameFormat,
     DefaultPage,
     DefaultPorts,
     Dirs,
@@ -114,7 +122,13 @@ __ALL__ = [
     ROUTE_NOT_FOUND,
     SETTER_PREFIX,
     SKIP_COMPILE_ENV_VAR,
+    SocketCompression,
     SocketEvent,
+    SocketProtocol,
+    StateCompression,
+    StateLayout,
+    StateManagerMode,
+    StateSerializer,
     Tailwind,
     Templates,
     CompileVars,
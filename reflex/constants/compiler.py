@@ -73,6 +73,8 @@ class CompileVars(SimpleNamespace):
     FRONTEND_EXCEPTION_STATE_FULL = (
         f"reflex___state____state.{FRONTEND_EXCEPTION_STATE}"
     )
+    # The key marking a delta value as a list of patch operations on the previous value.
+    PATCH = "__reflex_patch"
 
 
 class PageNames(SimpleNamespace):
@@ -1,6 +1,7 @@
 """Config constants."""
 
 import os
+from enum import Enum
 from types import SimpleNamespace
 
 from reflex.constants.base import Dirs, Reflex
@@ -33,6 +34,71 @@ class Expiration(SimpleNamespace):
     PING = 120
 
 
+class StateSerializer(str, Enum):
+    """The serializers used to encode persisted states."""
+
+    # Only the vars of the state, with the stdlib pickle module.
+    PICKLE = "pickle"
+    # The whole state instance, with dill (legacy format).
+    DILL = "dill"
+
+
+class StateCompression(str, Enum):
+    """The compression algorithms used for persisted states."""
+
+    # Requires the `zstandard` package.
+    ZSTD = "zstd"
+    # Requires the `lz4` package.
+    LZ4 = "lz4"
+
+
+class StateLayout(str, Enum):
+    """The layouts of states persisted in redis."""
+
+    # Each substate is a single value.
+    STRING = "string"
+    # Each substate is a hash with a field per var, so only modified vars are written.
+    HASH = "hash"
+
+
+class StateManagerMode(str, Enum):
+    """The state managers that can be selected for an app."""
+
+    # States are kept in the memory of the worker process.
+    MEMORY = "memory"
+    # States are persisted in a local database shared by the worker processes of the host.
+    DISK = "disk"
+    # States are persisted in redis, shared by all workers.
+    REDIS = "redis"
+
+
+class DataFrameFormat(str, Enum):
+    """The formats of pandas dataframes sent to the frontend."""
+
+    # A list of values per column, with the column types and the number of rows.
+    COLUMNS = "columns"
+    # A list of rows.
+    ROWS = "rows"
+
+
+class SocketProtocol(str, Enum):
+    """The encodings of the messages exchanged over the event websocket."""
+
+    # JSON text, or JSON bytes for state updates when orjson is installed.
+    JSON = "json"
+    # MessagePack binary messages, for clients offering it (requires the `msgpack` package).
+    MSGPACK = "msgpack"
+
+
+class SocketCompression(str, Enum):
+    """The compression algorithms for large messages of the event websocket."""
+
+    # zlib deflate, decompressed natively by browsers.
+    DEFLATE = "deflate"
+    # Requires the `zstandard` package.
+    ZSTD = "zstd"
+
+
 class GitIgnore(SimpleNamespace):
     """Gitignore constants."""
 
@@ -123,6 +123,10 @@ class PackageJson(SimpleNamespace):
         "socket.io-client": "4.6.1",
         "universal-cookie": "4.0.4",
     }
+    # The decoder of the msgpack socket protocol, installed only if it is enabled.
+    MSGPACK_DEPENDENCY = "@msgpack/msgpack@2.8.0"
+    # The decoder of the zstd socket compression, installed only if it is enabled.
+    ZSTD_DEPENDENCY = "fzstd@0.1.1"
     DEV_DEPENDENCIES = {
         "autoprefixer": "10.4.14",
         "postcss": "8.4.31",
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import functools
 import inspect
 import urllib.parse
 from base64 import b64encode
@@ -56,12 +57,18 @@ class Event(Base):
 
 BACKGROUND_TASK_MARKER = "_reflex_background_task"
 
+BACKGROUND_TASK_PRIORITY = "_reflex_background_task_priority"
 
-def background(fn):
+
+def background(fn=None, *, priority: int = 0):
     """Decorator to mark event handler as running in the background.
 
+    Used as `@rx.background`, or as `@rx.background(priority=1)` to set the
+    priority of the background task.
+
     Args:
         fn: The function to decorate.
+        priority: When background tasks are waiting to start, those with a higher priority are started first.
 
     Returns:
         The same function, but with a marker set.
@@ -70,9 +77,103 @@ def background(fn):
     Raises:
         TypeError: If the function is not a coroutine function or async generator.
     """
+    if fn is None:
+        return functools.partial(background, priority=priority)
     if not inspect.iscoroutinefunction(fn) and not inspect.isasyncgenfunction(fn):
         raise TypeError("Background task must be async function or generator.")
     setattr(fn, BACKGROUND_TASK_MARKER, True)
+    setattr(fn, BACKGROUND_TASK_PRIORITY, priority)
+    return fn
+
+
+READ_ONLY_MARKER = "_reflex_read_only"
+
+SETTER_MARKER = "_reflex_setter"
+
+RUN_IN_THREAD_MARKER = "_reflex_run_in_thread"
+
+RUN_IN_PROCESS_MARKER = "_reflex_run_in_process"
+
+
+def read_only(fn):
+    """Decorator to mark event handler as only reading the state.
+
+    Read-only event handlers for the same client run concurrently, and the
+    state is not written back after processing them. The memory state manager
+    shares the state between them under a shared lock. The redis and disk state
+    managers hold the exclusive lock of the client only while fetching the
+    state, so fetching waits for any writer, but processing does not block
+    other events.
+    Modifying the state in a read-only event handler raises an ImmutableStateError.
+
+    Args:
+        fn: The function to decorate.
+
+    Returns:
+        The same function, but with a marker set.
+    """
+    setattr(fn, READ_ONLY_MARKER, True)
+    return fn
+
+
+def run_in_thread(fn):
+    """Decorator to mark a synchronous event handler as running in a thread pool.
+
+    The handler, or each step of a generator handler, runs in a worker thread
+    while the lock for the state is held, so blocking calls in it do not block
+    the event loop. Read-only event handlers share the state with other readers,
+    so they run on the event loop even when marked.
+
+    Args:
+        fn: The function to decorate.
+
+    Returns:
+        The same function, but with a marker set.
+
+    Raises:
+        TypeError: If the function is a coroutine function or async generator.
+    """
+    if inspect.iscoroutinefunction(fn) or inspect.isasyncgenfunction(fn):
+        raise TypeError("Only synchronous event handlers can run in a thread.")
+    setattr(fn, RUN_IN_THREAD_MARKER, True)
+    return fn
+
+
+def run_in_process(fn=None, *, priority: int = 0):
+    """Decorator to mark a synchronous event handler as running in a worker process.
+
+    The handler runs in the background, like `@rx.background`, in a process pool.
+    It gets a snapshot of the vars of its state instead of the state, so computed
+    vars, other states and the database session of the app are not available.
+    The vars assigned by the handler are set on the state afterwards, and the
+    delta is sent to the client. Changes made to vars in place are not kept.
+
+    The function, its arguments, the vars and the returned events must be
+    serializable with dill.
+
+    Args:
+        fn: The function to decorate.
+        priority: When background tasks are waiting to start, those with a higher priority are started first.
+
+    Returns:
+        The same function, but with markers set.
+
+    Raises:
+        TypeError: If the function is async or a generator.
+    """
+    if fn is None:
+        return functools.partial(run_in_process, priority=priority)
+    if (
+        inspect.iscoroutinefunction(fn)
+        or inspect.isasyncgenfunction(fn)
+        or inspect.isgeneratorfunction(fn)
+    ):
+        raise TypeError(
+            "Only synchronous event handlers, which are not generators, can run in a process."
+        )
+    setattr(fn, BACKGROUND_TASK_MARKER, True)
+    setattr(fn, BACKGROUND_TASK_PRIORITY, priority)
+    setattr(fn, RUN_IN_PROCESS_MARKER, True)
     return fn
 
 
@@ -168,6 +269,53 @@ class EventHandler(EventActionsMixin):
         """
         return getattr(self.fn, BACKGROUND_TASK_MARKER, False)
 
+    @property
+    def background_priority(self) -> int:
+        """The priority of the event handler as a background task.
+
+        Returns:
+            The priority set with the background decorator.
+        """
+        return getattr(self.fn, BACKGROUND_TASK_PRIORITY, 0)
+
+    @property
+    def is_read_only(self) -> bool:
+        """Whether the event handler only reads the state.
+
+        Background tasks never hold the lock for the state, so they are not read-only.
+
+        Returns:
+            True if the event handler is marked as read-only.
+        """
+        return getattr(self.fn, READ_ONLY_MARKER, False) and not self.is_background
+
+    @property
+    def is_setter(self) -> bool:
+        """Whether the event handler is the generated setter of a var.
+
+        Returns:
+            True if the event handler only sets the value of a var.
+        """
+        return getattr(self.fn, SETTER_MARKER, False)
+
+    @property
+    def runs_in_thread(self) -> bool:
+        """Whether the event handler is marked to run in a thread pool.
+
+        Returns:
+            True if the event handler is marked with run_in_thread.
+        """
+        return getattr(self.fn, RUN_IN_THREAD_MARKER, False)
+
+    @property
+    def runs_in_process(self) -> bool:
+        """Whether the event handler is marked to run in a worker process.
+
+        Returns:
+            True if the event handler is marked with run_in_process.
+        """
+        return getattr(self.fn, RUN_IN_PROCESS_MARKER, False)
+
     def __call__(self, *args: Any) -> EventSpec:
         """Pass arguments to the handler to get an event spec.
 
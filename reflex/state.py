@@ -4,13 +4,25 @@ from __future__ import annotations
 
 import asyncio
 import contextlib
+import contextvars
 import copy
+import dataclasses
 import functools
+import hashlib
 import inspect
+import itertools
+import multiprocessing
 import os
+import pickle
+import sqlite3
+import struct
+import threading
+import time
 import uuid
 from abc import ABC, abstractmethod
-from collections import defaultdict
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
 from types import FunctionType, MethodType
 from typing import (
     TYPE_CHECKING,
@@ -18,11 +30,16 @@ from typing import (
     AsyncIterator,
     Callable,
     ClassVar,
+    Coroutine,
+    Deque,
     Dict,
+    FrozenSet,
+    Generator,
     List,
     Optional,
     Sequence,
     Set,
+    Tuple,
     Type,
     Union,
     cast,
@@ -40,19 +57,30 @@ except ModuleNotFoundError:
 
 import wrapt
 from redis.asyncio import Redis
+from redis.commands.core import AsyncScript
 from redis.exceptions import ResponseError
 
 from reflex import constants
 from reflex.base import Base
 from reflex.event import (
     BACKGROUND_TASK_MARKER,
+    BACKGROUND_TASK_PRIORITY,
+    READ_ONLY_MARKER,
+    RUN_IN_PROCESS_MARKER,
+    RUN_IN_THREAD_MARKER,
+    SETTER_MARKER,
     Event,
     EventHandler,
     EventSpec,
     fix_events,
 )
 from reflex.utils import console, format, prerequisites, types
-from reflex.utils.exceptions import ImmutableStateError, LockExpiredError
+from reflex.utils.exceptions import (
+    ImmutableStateError,
+    InvalidStateManagerMode,
+    LockExpiredError,
+    StateSerializationError,
+)
 from reflex.utils.exec import is_testing_env
 from reflex.utils.serializers import SerializedType, serialize, serializer
 from reflex.utils.types import override
@@ -68,6 +96,98 @@ var = computed_var
 
 # If the state is this large, it's considered a performance issue.
 TOO_LARGE_SERIALIZED_STATE = 100 * 1024  # 100kb
+# Only vars with at least this many items are sent as patch operations in a delta.
+PATCH_MIN_LENGTH = 64
+
+# The kinds of state attributes dispatched by BaseState.__getattribute__ and __setattr__.
+_INHERITED_VAR_ATTRIBUTE = 1
+_EVENT_HANDLER_ATTRIBUTE = 2
+_BASE_VAR_ATTRIBUTE = 3
+_BACKEND_VAR_ATTRIBUTE = 4
+_PLAIN_ATTRIBUTE = 5
+
+# The private attributes of a state caching per-instance objects, never copied or persisted.
+_INSTANCE_CACHE_ATTRS = frozenset(
+    {
+        "_bound_event_handlers",
+        "_mutable_proxies",
+        "_mutable_proxy_states",
+        "_var_patches",
+        "_var_patch_epochs",
+    }
+)
+
+
+@dataclasses.dataclass(frozen=True)
+class _DirtyPropagationGraph:
+    """How a modified var of a state class propagates to computed vars and substates."""
+
+    # The computed vars transitively depending on each var, in topological order.
+    computed_vars: Dict[str, Tuple[str, ...]]
+
+    # The (var, substate name) pairs to mark dirty in substates for each var.
+    substates: Dict[str, Tuple[Tuple[str, str], ...]]
+
+    # The computed vars with an update interval.
+    interval_computed_vars: Tuple[str, ...]
+
+
+@dataclasses.dataclass(frozen=True)
+class _PatchValue:
+    """A mutable value in a patch operation, with its formatting when it was recorded."""
+
+    # The value, which may be changed without a patch operation after it was recorded.
+    value: Any
+
+    # The formatted value when the operation was recorded.
+    formatted: Any
+
+    def is_current(self) -> bool:
+        """Check whether the value was not changed since the operation was recorded.
+
+        Returns:
+            True if the formatted value is still up to date.
+        """
+        try:
+            return format.format_state(self.value) == self.formatted
+        except TypeError:
+            return False
+
+
+def _resolve_patch_ops(ops: list[list[Any]]) -> list[list[Any]] | None:
+    """Replace the mutable values in patch operations with their formatted values.
+
+    Args:
+        ops: The recorded patch operations.
+
+    Returns:
+        The operations to send, or None if a mutable value was changed since its
+        operation was recorded, so the full value of the var must be sent.
+    """
+
+    def resolve(value: Any) -> Any:
+        if isinstance(value, _PatchValue):
+            if not value.is_current():
+                raise ValueError("The patch value is stale.")
+            return value.formatted
+        if isinstance(value, float):
+            return format.format_float(value)
+        return value
+
+    try:
+        return [
+            [
+                [resolve(item) for item in arg]
+                if isinstance(arg, list)
+                else {key: resolve(item) for key, item in arg.items()}
+                if isinstance(arg, dict)
+                else resolve(arg)
+                for arg in op
+            ]
+            for op in ops
+        ]
+    except ValueError:
+        return None
 
 
 class HeaderData(Base):
@@ -197,10 +317,31 @@ def _no_chain_background_task(
             raise RuntimeError(message)
 
         return _no_chain_background_task_gen
+    if getattr(fn, RUN_IN_PROCESS_MARKER, False):
+
+        def _no_chain_background_task_fn(*args, **kwargs):
+            raise RuntimeError(message)
+
+        return _no_chain_background_task_fn
 
     raise TypeError(f"{fn} is marked as a background task, but is not async.")
 
 
+def _get_patch_epoch(state: BaseState, var_name: str) -> int:
+    """Get the number of structural changes made to a mutable var of a state.
+
+    Changes are only counted for the vars whose epoch was taken.
+
+    Args:
+        state: The state instance.
+        var_name: The name of the var.
+
+    Returns:
+        The number of changes which may have moved values nested in the var.
+    """
+    return state._var_patch_epochs.setdefault(var_name, 0)
+
+
 def _substate_key(
     token: str,
     state_cls_or_name: BaseState | Type[BaseState] | str | Sequence[str],
@@ -236,6 +377,206 @@ def _split_substate_key(substate_key: str) -> tuple[str, str]:
     return token, state_name
 
 
+@functools.lru_cache(maxsize=None)
+def _get_event_handler_executor() -> ThreadPoolExecutor:
+    """Get the thread pool running synchronous event handlers.
+
+    Returns:
+        The thread pool, bounded by the config.
+    """
+    return ThreadPoolExecutor(
+        max_workers=get_config().sync_event_handler_max_threads,
+        thread_name_prefix="reflex_event_handler",
+    )
+
+
+def _runs_in_thread(handler: EventHandler) -> bool:
+    """Check whether a synchronous event handler runs in the thread pool.
+
+    Args:
+        handler: The event handler.
+
+    Returns:
+        Whether the handler is marked to run in a thread, or all handlers do.
+    """
+    # Read-only handlers share the state with concurrent readers, whose deltas
+    # are computed on the event loop, so they always run on the event loop.
+    if handler.is_read_only:
+        return False
+    if handler.runs_in_thread:
+        return True
+    # Var setters never block, so they always run on the event loop.
+    return not handler.is_setter and get_config().sync_event_handlers_in_thread
+
+
+async def _run_in_thread(fn: Callable, *args: Any, **kwargs: Any) -> Any:
+    """Run a function in the thread pool for synchronous event handlers.
+
+    The function runs in a copy of the current context. The caller waits for
+    the function to finish, even when cancelled, so the state is never used by
+    the thread and the event loop at the same time.
+
+    Args:
+        fn: The function to run.
+        *args: The positional arguments of the function.
+        **kwargs: The keyword arguments of the function.
+
+    Returns:
+        The return value of the function.
+    """
+    future = asyncio.get_running_loop().run_in_executor(
+        _get_event_handler_executor(),
+        functools.partial(contextvars.copy_context().run, fn, *args, **kwargs),
+    )
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        # The thread cannot be interrupted, wait for it before releasing the state.
+        await asyncio.wait([future])
+        raise
+
+
+def _next_event(events: Generator) -> tuple[bool, Any]:
+    """Get the next value of a generator event handler.
+
+    Args:
+        events: The generator.
+
+    Returns:
+        Whether the generator is exhausted, and the next value or its return value.
+    """
+    try:
+        return False, next(events)
+    except StopIteration as si:
+        return True, si.value
+
+
+@functools.lru_cache(maxsize=None)
+def _get_event_handler_process_pool() -> ProcessPoolExecutor:
+    """Get the process pool running event handlers marked with run_in_process.
+
+    The worker processes are spawned rather than forked, so they do not inherit
+    the event loop, threads and connections of the backend.
+
+    Returns:
+        The process pool, bounded by the config.
+    """
+    return ProcessPoolExecutor(
+        max_workers=get_config().process_event_handler_max_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+class _ProcessStateSnapshot:
+    """The vars of a state, passed as `self` to an event handler running in a process."""
+
+    def __init__(self, state_name: str, values: dict[str, Any]):
+        """Create a snapshot.
+
+        Args:
+            state_name: The full name of the state.
+            values: The values of the vars of the state.
+        """
+        self.__dict__.update(
+            _reflex_state_name=state_name, _reflex_values=values, _reflex_updates={}
+        )
+
+    def __getattr__(self, name: str) -> Any:
+        """Get the value of a var.
+
+        Args:
+            name: The name of the var.
+
+        Returns:
+            The value of the var.
+
+        Raises:
+            AttributeError: If the state has no such var.
+        """
+        values = self.__dict__.get("_reflex_values", {})
+        if name in values:
+            return values[name]
+        raise AttributeError(
+            f"{name!r} is not a var of {self.__dict__.get('_reflex_state_name')}, "
+            "only base vars and backend vars are available in a process."
+        )
+
+    def __setattr__(self, name: str, value: Any):
+        """Set the value of a var, to be set on the state afterwards.
+
+        Args:
+            name: The name of the var.
+            value: The new value of the var.
+
+        Raises:
+            AttributeError: If the state has no such var.
+        """
+        if name not in self._reflex_values:
+            raise AttributeError(
+                f"{name!r} is not a var of {self._reflex_state_name}, "
+                "only base vars and backend vars can be set in a process."
+            )
+        self._reflex_values[name] = value
+        self._reflex_updates[name] = value
+
+
+def _call_in_process(call: bytes) -> bytes:
+    """Call an event handler in a worker process.
+
+    Args:
+        call: The function, the state snapshot and the payload, serialized with dill.
+
+    Returns:
+        The assigned vars and the returned events, serialized with dill.
+    """
+    fn, snapshot, payload = dill.loads(call)
+    events = fn(snapshot, **payload)
+    return dill.dumps((snapshot._reflex_updates, events))
+
+
+async def _run_in_process(
+    handler: EventHandler, state: BaseState | StateProxy, payload: dict
+) -> Any:
+    """Run an event handler in a worker process on a snapshot of its state.
+
+    The lock for the state is only held while taking the snapshot and while
+    setting the assigned vars, which sends the delta to the client.
+
+    Args:
+        handler: The event handler.
+        state: The proxy of the state of the handler.
+        payload: The event payload.
+
+    Returns:
+        The events returned by the handler.
+    """
+    async with state:
+        substate = state.__wrapped__
+        values = {}
+        for name in (*substate.base_vars, *substate.backend_vars):
+            value = getattr(substate, name)
+            values[name] = (
+                value.__wrapped__ if isinstance(value, MutableProxy) else value
+            )
+        # Serialize while holding the lock, so the snapshot is consistent.
+        call = dill.dumps(
+            (
+                handler.fn,
+                _ProcessStateSnapshot(substate.get_full_name(), values),
+                payload,
+            )
+        )
+    result = await asyncio.get_running_loop().run_in_executor(
+        _get_event_handler_process_pool(), _call_in_process, call
+    )
+    updates, events = dill.loads(result)
+    if updates:
+        async with state:
+            for name, value in updates.items():
+                setattr(state, name, value)
+    return events
+
+
 class EventHandlerSetVar(EventHandler):
     """A special event handler to wrap setvar functionality."""
 
@@ -331,6 +672,32 @@ class BaseState(Base, ABC, extra=pydantic.Extra.allow):
     # Set of substates which always need to be recomputed
     _always_dirty_substates: ClassVar[Set[str]] = set()
 
+    # Incremented whenever a state class is added or the var dependencies change.
+    _class_tree_generation: ClassVar[int] = 0
+
+    # The generation and the substate classes by full name (set on root states only).
+    _class_substate_index: ClassVar[
+        Optional[Tuple[int, Dict[str, Type[BaseState]]]]
+    ] = None
+
+    # The generation and the substate classes found by get_class_substate by path.
+    _class_substate_lookups: ClassVar[
+        Optional[Tuple[int, Dict[Union[str, Tuple[str, ...]], Type[BaseState]]]]
+    ] = None
+
+    # The generation and the substates which could be affected by dirty vars in this state.
+    _potentially_dirty_substates_cache: ClassVar[
+        Optional[Tuple[int, FrozenSet[Type[BaseState]]]]
+    ] = None
+
+    # The generation and the kind of each var and event handler attribute by name.
+    _attribute_kinds: ClassVar[Optional[Tuple[int, Dict[str, int]]]] = None
+
+    # The generation and the compiled dirty propagation graph of the state class.
+    _dirty_propagation_graph: ClassVar[Optional[Tuple[int, _DirtyPropagationGraph]]] = (
+        None
+    )
+
     # The parent state.
     parent_state: Optional[BaseState] = None
 
@@ -355,6 +722,33 @@ class BaseState(Base, ABC, extra=pydantic.Extra.allow):
     # Whether the state has ever been touched since instantiation.
     _was_touched: bool = False
 
+    # The version of this state instance in the state manager, if known.
+    _persisted_version: Optional[str] = None
+
+    # The vars modified since the state was persisted, or None if all vars must be persisted.
+    _unpersisted_vars: Optional[Set[str]] = None
+
+    # The event handlers bound to this instance, by name.
+    _bound_event_handlers: Dict[str, Callable] = pydantic.PrivateAttr(
+        default_factory=dict
+    )
+
+    # The proxies of the mutable values accessed since the state was cleaned.
+    _mutable_proxies: Dict[Tuple[str, int], Any] = pydantic.PrivateAttr(
+        default_factory=dict
+    )
+
+    # The substates with cached proxies, dropped when this (root) state is cleaned.
+    _mutable_proxy_states: List[BaseState] = pydantic.PrivateAttr(default_factory=list)
+
+    # The patch operations applied to mutable base vars since the state was cleaned.
+    _var_patches: Dict[str, Optional[List[List[Any]]]] = pydantic.PrivateAttr(
+        default_factory=dict
+    )
+
+    # The number of structural changes made to the mutable vars with paths taken into them.
+    _var_patch_epochs: Dict[str, int] = pydantic.PrivateAttr(default_factory=dict)
+
     # Whether this state class is a mixin and should not be instantiated.
     _mixin: ClassVar[bool] = False
 
@@ -601,6 +995,17 @@ class BaseState(Base, ABC, extra=pydantic.Extra.allow):
         newfn.__annotations__ = fn.__annotations__
         if mark := getattr(fn, BACKGROUND_TASK_MARKER, None):
             setattr(newfn, BACKGROUND_TASK_MARKER, mark)
+            setattr(
+                newfn,
+                BACKGROUND_TASK_PRIORITY,
+                getattr(fn, BACKGROUND_TASK_PRIORITY, 0),
+            )
+        if mark := getattr(fn, READ_ONLY_MARKER, None):
+            setattr(newfn, READ_ONLY_MARKER, mark)
+        if mark := getattr(fn, RUN_IN_THREAD_MARKER, None):
+            setattr(newfn, RUN_IN_THREAD_MARKER, mark)
+        if mark := getattr(fn, RUN_IN_PROCESS_MARKER, None):
+            setattr(newfn, RUN_IN_PROCESS_MARKER, mark)
         return newfn
 
     @staticmethod
@@ -648,6 +1053,9 @@ class BaseState(Base, ABC, extra=pydantic.Extra.allow):
         Additional updates tracking dicts for vars and substates that always
         need to be recomputed.
         """
+        # The cached substate index and dependencies are outdated now.
+        BaseState._class_tree_generation += 1
+
         # Initialize per-class var dependency tracking.
         cls._computed_var_dependencies = defaultdict(set)
         cls._substate_var_dependencies = defaultdict(set)
@@ -800,10 +1208,12 @@ class BaseState(Base, ABC, extra=pydantic.Extra.allow):
         return name
 
     @classmethod
-    @functools.lru_cache()
     def get_class_substate(cls, path: Sequence[str] | str) -> Type[BaseState]:
         """Get the class substate.
 
+        The substate is looked up by full name in the index of the state tree,
+        and the result is memoized per path until the state tree changes.
+
         Args:
             path: The path to the substate.
 
@@ -813,6 +1223,17 @@ class BaseState(Base, ABC, extra=pydantic.Extra.allow):
         Raises:
             ValueError: If the substate is not found.
         """
+        key = path if isinstance(path, str) else tuple(path)
+        lookups = cls.__dict__.get("_class_substate_lookups")
+        if lookups is None or lookups[0] != BaseState._class_tree_generation:
+            lookups = cls._class_substate_lookups = (
+                BaseState._class_tree_generation,
+                {},
+            )
+        substate = lookups[1].get(key)
+        if substate is not None:
+            return substate
+
         if isinstance(path, str):
             path = tuple(path.split("."))
 
@@ -822,10 +1243,52 @@ class BaseState(Base, ABC, extra=pydantic.Extra.allow):
             if len(path) == 1:
                 return cls
             path = path[1:]
-        for substate in cls.get_substates():
-            if path[0] == substate.get_name():
-                return substate.get_class_substate(path[1:])
-        raise ValueError(f"Invalid path: {path}")
+        full_name = ".".join((cls.get_full_name(), *path))
+        substate = cls._get_class_substate_index().get(full_name)
+        if substate is None:
+            # The substates may have been replaced without defining a new class.
+            substate = cls._get_class_substate_index(rebuild=True).get(full_name)
+        if substate is None:
+            raise ValueError(f"Invalid path: {path}")
+        lookups[1][key] = substate
+        return substate
+
+    @classmethod
+    def _get_class_substate_index(
+        cls, rebuild: bool = False
+    ) -> Dict[str, Type[BaseState]]:
+        """Get the index of the state tree this class belongs to.
+
+        The index is built on first use and rebuilt after the state tree changed.
+
+        Args:
+            rebuild: Whether to rebuild the index even if the state tree did not change.
+
+        Returns:
+            The state classes of the tree by full name.
+        """
+        root_state = cls
+        while (parent_state := root_state.get_parent_state()) is not None:
+            root_state = parent_state
+        index = root_state.__dict__.get("_class_substate_index")
+        if (
+            not rebuild
+            and index is not None
+            and index[0] == BaseState._class_tree_generation
+        ):
+            return index[1]
+
+        substates = {}
+        pending = [root_state]
+        while pending:
+            state_cls = pending.pop()
+            substates[state_cls.get_full_name()] = state_cls
+            pending.extend(state_cls.class_subclasses)
+        root_state._class_substate_index = (
+            BaseState._class_tree_generation,
+            substates,
+        )
+        return substates
 
     @classmethod
     def get_class_var(cls, path: Sequence[str]) -> Any:
@@ -944,7 +1407,9 @@ class BaseState(Base, ABC, extra=pydantic.Extra.allow):
         """
         setter_name = prop.get_setter_name(include_state=False)
         if setter_name not in cls.__dict__:
-            event_handler = cls._create_event_handler(prop.get_setter())
+            setter = prop.get_setter()
+            setattr(setter, SETTER_MARKER, True)
+            event_handler = cls._create_event_handler(setter)
             cls.event_handlers[setter_name] = event_handler
             setattr(cls, setter_name, event_handler)
 
@@ -1020,6 +1485,91 @@ class BaseState(Base, ABC, extra=pydantic.Extra.allow):
             # Reinitialize dependency tracking dicts.
             cls._init_var_dependency_dicts()
 
+    @classmethod
+    def _get_var_formatters(
+        cls, defer_json: bool = False
+    ) -> Dict[str, format.StateFormatter]:
+        """Get the functions formatting the values of the frontend vars of the state.
+
+        The formatters are compiled from the var types and cached until the
+        state tree changes.
+
+        Args:
+            defer_json: Whether values with a JSON encoder are left as is, to be
+                encoded straight to JSON with the state update.
+
+        Returns:
+            The formatters by var name.
+        """
+        var_formatters = cls.__dict__.get("_var_formatters")
+        if (
+            var_formatters is not None
+            and var_formatters[0] == BaseState._class_tree_generation
+        ):
+            return var_formatters[1][defer_json]
+
+        formatters, deferred_formatters = {}, {}
+        for name, var in {**cls.base_vars, **cls.computed_vars}.items():
+            try:
+                formatters[name] = format.get_state_formatter(var._var_type)
+                deferred_formatters[name] = format.get_state_formatter(
+                    var._var_type, defer_json=True
+                )
+            except TypeError:
+                # The type cannot be cached, so format the values generically.
+                formatters[name] = deferred_formatters[name] = format.format_state
+        cls._var_formatters = (
+            BaseState._class_tree_generation,
+            (formatters, deferred_formatters),
+        )
+        return deferred_formatters if defer_json else formatters
+
+    @classmethod
+    def _get_attribute_kinds(cls) -> Dict[str, int]:
+        """Get the kind of each var and event handler attribute of the state.
+
+        The table is cached until the state tree changes.
+
+        Returns:
+            The attribute kinds by name.
+        """
+        attribute_kinds = cls.__dict__.get("_attribute_kinds")
+        if (
+            attribute_kinds is not None
+            and attribute_kinds[0] == BaseState._class_tree_generation
+        ):
+            return attribute_kinds[1]
+
+        # Methods, internal attributes and computed vars are returned as is.
+        kinds = dict.fromkeys(BaseState.__annotations__, _PLAIN_ATTRIBUTE)
+        kinds["__dict__"] = _PLAIN_ATTRIBUTE
+        for klass in reversed(cls.__mro__):
+            kinds.update(
+                (name, _PLAIN_ATTRIBUTE)
+                for name, value in vars(klass).items()
+                if isinstance(
+                    value, (FunctionType, classmethod, staticmethod, property)
+                )
+            )
+        kinds.update(dict.fromkeys(cls.computed_vars, _PLAIN_ATTRIBUTE))
+        kinds.update(dict.fromkeys(cls.base_vars, _BASE_VAR_ATTRIBUTE))
+        kinds.update(dict.fromkeys(cls.backend_vars, _BACKEND_VAR_ATTRIBUTE))
+        kinds.update(dict.fromkeys(cls.event_handlers, _EVENT_HANDLER_ATTRIBUTE))
+        # Inherited vars take precedence, as they are also fields of the subclass.
+        # For now, handle router_data updates as a special case.
+        kinds.update(
+            dict.fromkeys(
+                (
+                    *cls.inherited_vars,
+                    *cls.inherited_backend_vars,
+                    constants.ROUTER_DATA,
+                ),
+                _INHERITED_VAR_ATTRIBUTE,
+            )
+        )
+        cls._attribute_kinds = (BaseState._class_tree_generation, kinds)
+        return kinds
+
     def __getattribute__(self, name: str) -> Any:
         """Get the state var.
 
@@ -1032,31 +1582,34 @@ class BaseState(Base, ABC, extra=pydantic.Extra.allow):
             The value of the var.
         """
         # If the state hasn't been initialized yet, return the default value.
-        if not super().__getattribute__("__dict__"):
+        instance_dict = super().__getattribute__("__dict__")
+        if not instance_dict:
             return super().__getattribute__(name)
 
-        inherited_vars = {
-            **super().__getattribute__("inherited_vars"),
-            **super().__getattribute__("inherited_backend_vars"),
-        }
-
-        # For now, handle router_data updates as a special case.
-        if name in inherited_vars or name == constants.ROUTER_DATA:
+        attribute_kind = type(self)._get_attribute_kinds().get(name)
+        if attribute_kind == _PLAIN_ATTRIBUTE:
+            return super().__getattribute__(name)
+        if attribute_kind == _INHERITED_VAR_ATTRIBUTE:
             parent_state = super().__getattribute__("parent_state")
             if parent_state is not None:
                 return getattr(parent_state, name)
-
-        # Allow event handlers to be called on the instance directly.
-        event_handlers = super().__getattribute__("event_handlers")
-        if name in event_handlers:
-            handler = event_handlers[name]
-            if handler.is_background:
-                fn = _no_chain_background_task(type(self), name, handler.fn)
-            else:
-                fn = functools.partial(handler.fn, self)
-            fn.__module__ = handler.fn.__module__  # type: ignore
-            fn.__qualname__ = handler.fn.__qualname__  # type: ignore
+        elif attribute_kind == _EVENT_HANDLER_ATTRIBUTE:
+            # Allow event handlers to be called on the instance directly.
+            bound_event_handlers = super().__getattribute__("_bound_event_handlers")
+            fn = bound_event_handlers.get(name)
+            if fn is None:
+                fn = BaseState._bind_event_handler(self, bound_event_handlers, name)
             return fn
+        elif attribute_kind is not None:
+            backend_vars = super().__getattribute__("_backend_vars")
+            if name in backend_vars:
+                value = backend_vars[name]
+            else:
+                value = super().__getattribute__(name)
+            if isinstance(value, MutableProxy.__mutable_types__):
+                # track changes in mutable containers (list, dict, set, etc)
+                return BaseState._get_mutable_proxy(self, instance_dict, name, value)
+            return value
 
         backend_vars = super().__getattribute__("_backend_vars")
         if name in backend_vars:
@@ -1075,10 +1628,78 @@ class BaseState(Base, ABC, extra=pydantic.Extra.allow):
             name in super().__getattribute__("base_vars") or name in backend_vars
         ):
             # track changes in mutable containers (list, dict, set, etc)
-            return MutableProxy(wrapped=value, state=self, field_name=name)
+            return BaseState._get_mutable_proxy(self, instance_dict, name, value)
 
         return value
 
+    def _get_mutable_proxy(
+        self,
+        instance_dict: dict[str, Any],
+        field_name: str,
+        value: Any,
+        path: Optional[Tuple[Union[str, int], ...]] = (),
+        patch_epoch: Optional[int] = None,
+    ) -> MutableProxy:
+        """Get the proxy tracking changes of a mutable value of a field.
+
+        The proxies are cached on the instance until the state is cleaned, so
+        repeated access to a value during an event reuses the same proxy.
+
+        Args:
+            instance_dict: The __dict__ of the instance.
+            field_name: The name of the field the value belongs to.
+            value: The mutable value.
+            path: The path of the value in the field value, or None if unknown.
+            patch_epoch: The patch epoch of the field when the path was taken.
+
+        Returns:
+            The proxy for the value.
+        """
+        mutable_proxies = self._mutable_proxies
+        if not mutable_proxies:
+            root_state = self._get_root_state()
+            if root_state is not self:
+                # The root state drops the cache when cleaned after the event.
+                root_state._mutable_proxy_states.append(self)
+        # The cached proxy keeps the value alive, so its id cannot be reused.
+        key = (field_name, id(value))
+        proxy = mutable_proxies.get(key)
+        if (
+            proxy is None
+            or proxy._self_path != path
+            or proxy._self_patch_epoch != patch_epoch
+        ):
+            proxy = mutable_proxies[key] = MutableProxy(
+                wrapped=value,
+                state=self,
+                field_name=field_name,
+                path=path,
+                patch_epoch=patch_epoch,
+            )
+        return proxy
+
+    def _bind_event_handler(
+        self, bound_event_handlers: dict[str, Callable], name: str
+    ) -> Callable:
+        """Get an event handler of the state as a callable function.
+
+        Args:
+            bound_event_handlers: The cache of the functions bound to the instance.
+            name: The name of the event handler.
+
+        Returns:
+            The function calling the event handler for this instance.
+        """
+        handler = type(self).event_handlers[name]
+        if handler.is_background:
+            fn = _no_chain_background_task(type(self), name, handler.fn)
+        else:
+            fn = functools.partial(handler.fn, self)
+        fn.__module__ = handler.fn.__module__  # type: ignore
+        fn.__qualname__ = handler.fn.__qualname__  # type: ignore
+        bound_event_handlers[name] = fn
+        return fn
+
     def __setattr__(self, name: str, value: Any):
         """Set the attribute.
 
@@ -1092,30 +1713,37 @@ class BaseState(Base, ABC, extra=pydantic.Extra.allow):
             # unwrap proxy objects when assigning back to the state
             value = value.__wrapped__
 
+        attribute_kind = type(self)._get_attribute_kinds().get(name)
+
         # Set the var on the parent state.
-        inherited_vars = {**self.inherited_vars, **self.inherited_backend_vars}
-        if name in inherited_vars:
+        if attribute_kind == _INHERITED_VAR_ATTRIBUTE and name != constants.ROUTER_DATA:
             setattr(self.parent_state, name, value)
             return
 
-        if name in self.backend_vars:
+        if attribute_kind == _BACKEND_VAR_ATTRIBUTE:
             self._backend_vars.__setitem__(name, value)
             self.dirty_vars.add(name)
-            self._mark_dirty()
+            self._mark_dirty(name)
             return
 
         # Set the attribute.
         super().__setattr__(name, value)
 
+        if attribute_kind == _BASE_VAR_ATTRIBUTE and (
+            name in self._var_patches or name in self._var_patch_epochs
+        ):
+            # The new value replaces any patches recorded for the var.
+            self._record_patch(name, None)
+
         # Add the var to the dirty list.
         if name in self.vars or name in self._computed_var_dependencies:
             self.dirty_vars.add(name)
-            self._mark_dirty()
+            self._mark_dirty(name)
 
         # For now, handle router_data updates as a special case
         if name == constants.ROUTER_DATA:
             self.dirty_vars.add(name)
-            self._mark_dirty()
+            self._mark_dirty(name)
 
     def reset(self):
         """Reset all the base vars to their default values."""
@@ -1174,52 +1802,6 @@ class BaseState(Base, ABC, extra=pydantic.Extra.allow):
             raise ValueError(f"Invalid path: {path}")
         return self.substates[path[0]].get_substate(path[1:])
 
-    @classmethod
-    def _get_common_ancestor(cls, other: Type[BaseState]) -> str:
-        """Find the name of the nearest common ancestor shared by this and the other state.
-
-        Args:
-            other: The other state.
-
-        Returns:
-            Full name of the nearest common ancestor.
-        """
-        common_ancestor_parts = []
-        for part1, part2 in zip(
-            cls.get_full_name().split("."),
-            other.get_full_name().split("."),
-        ):
-            if part1 != part2:
-                break
-            common_ancestor_parts.append(part1)
-        return ".".join(common_ancestor_parts)
-
-    @classmethod
-    def _determine_missing_parent_states(
-        cls, target_state_cls: Type[BaseState]
-    ) -> tuple[str, list[str]]:
-        """Determine the missing parent states between the target_state_cls and common ancestor of this state.
-
-        Args:
-            target_state_cls: The class of the state to find missing parent states for.
-
-        Returns:
-            The name of the common ancestor and the list of missing parent states.
-        """
-        common_ancestor_name = cls._get_common_ancestor(target_state_cls)
-        common_ancestor_parts = common_ancestor_name.split(".")
-        target_state_parts = tuple(target_state_cls.get_full_name().split("."))
-        relative_target_state_parts = target_state_parts[len(common_ancestor_parts) :]
-
-        # Determine which parent states to fetch from the common ancestor down to the target_state_cls.
-        fetch_parent_states = [common_ancestor_name]
-        for relative_parent_state_name in relative_target_state_parts:
-            fetch_parent_states.append(
-                ".".join((fetch_parent_states[-1], relative_parent_state_name))
-            )
-
-        return common_ancestor_name, fetch_parent_states[1:-1]
-
     def _get_parent_states(self) -> list[tuple[str, BaseState]]:
         """Get all parent state instances up to the root of the state tree.
 
@@ -1244,95 +1826,44 @@ class BaseState(Base, ABC, extra=pydantic.Extra.allow):
             parent_state = parent_state.parent_state
         return parent_state
 
-    async def _populate_parent_states(self, target_state_cls: Type[BaseState]):
-        """Populate substates in the tree between the target_state_cls and common ancestor of this state.
+    def _get_state_from_cache(self, state_cls: Type[BaseState]) -> BaseState:
+        """Get a state instance from the cache.
+
+        Args:
+            state_cls: The class of the state.
+
+        Returns:
+            The instance of state_cls associated with this state's client_token.
+        """
+        root_state = self._get_root_state()
+        return root_state.get_substate(state_cls.get_full_name().split("."))
+
+    async def _get_persisted_state(self, state_cls: Type[BaseState]) -> BaseState:
+        """Get a state instance from the persistent state manager.
 
         Args:
-            target_state_cls: The class of the state to populate parent states for.
+            state_cls: The class of the state.
 
         Returns:
-            The parent state instance of target_state_cls.
+            The instance of state_cls associated with this state's client_token.
 
         Raises:
-            RuntimeError: If redis is not used in this backend process.
+            RuntimeError: If no persistent state manager is used in this backend process.
         """
         state_manager = get_state_manager()
-        if not isinstance(state_manager, StateManagerRedis):
+        if not isinstance(state_manager, StateManagerPersistent):
             raise RuntimeError(
-                f"Cannot populate parent states of {target_state_cls.get_full_name()} without redis. "
+                f"Requested state {state_cls.get_full_name()} is not cached and cannot be accessed without a persistent state manager. "
                 "(All states should already be available -- this is likely a bug).",
             )
 
-        # Find the missing parent states up to the common ancestor.
-        (
-            common_ancestor_name,
-            missing_parent_states,
-        ) = self._determine_missing_parent_states(target_state_cls)
-
-        # Fetch all missing parent states and link them up to the common ancestor.
-        parent_states_tuple = self._get_parent_states()
-        root_state = parent_states_tuple[-1][1]
-        parent_states_by_name = dict(parent_states_tuple)
-        parent_state = parent_states_by_name[common_ancestor_name]
-        for parent_state_name in missing_parent_states:
-            try:
-                parent_state = root_state.get_substate(parent_state_name.split("."))
-                # The requested state is already cached, do NOT fetch it again.
-                continue
-            except ValueError:
-                # The requested state is missing, fetch from redis.
-                pass
-            parent_state = await state_manager.get_state(
-                token=_substate_key(
-                    self.router.session.client_token, parent_state_name
-                ),
-                top_level=False,
-                get_substates=False,
-                parent_state=parent_state,
-            )
-
-        # Return the direct parent of target_state_cls for subsequent linking.
-        return parent_state
-
-    def _get_state_from_cache(self, state_cls: Type[BaseState]) -> BaseState:
-        """Get a state instance from the cache.
-
-        Args:
-            state_cls: The class of the state.
-
-        Returns:
-            The instance of state_cls associated with this state's client_token.
-        """
-        root_state = self._get_root_state()
-        return root_state.get_substate(state_cls.get_full_name().split("."))
-
-    async def _get_state_from_redis(self, state_cls: Type[BaseState]) -> BaseState:
-        """Get a state instance from redis.
-
-        Args:
-            state_cls: The class of the state.
-
-        Returns:
-            The instance of state_cls associated with this state's client_token.
-
-        Raises:
-            RuntimeError: If redis is not used in this backend process.
-        """
-        # Fetch all missing parent states from redis.
-        parent_state_of_state_cls = await self._populate_parent_states(state_cls)
-
-        # Then get the target state and all its substates.
-        state_manager = get_state_manager()
-        if not isinstance(state_manager, StateManagerRedis):
-            raise RuntimeError(
-                f"Requested state {state_cls.get_full_name()} is not cached and cannot be accessed without redis. "
-                "(All states should already be available -- this is likely a bug).",
-            )
+        # Fetch the target state, all its substates and any missing parent states
+        # in one round trip, linking them into the existing state tree.
         return await state_manager.get_state(
             token=_substate_key(self.router.session.client_token, state_cls),
             top_level=False,
             get_substates=True,
-            parent_state=parent_state_of_state_cls,
+            for_state_instance=self,
         )
 
     async def get_state(self, state_cls: Type[BaseState]) -> BaseState:
@@ -1352,8 +1883,8 @@ class BaseState(Base, ABC, extra=pydantic.Extra.allow):
         except ValueError:
             pass
 
-        # Slow case - fetch missing parent states from redis.
-        return await self._get_state_from_redis(state_cls)
+        # Slow case - fetch missing parent states from the state manager.
+        return await self._get_persisted_state(state_cls)
 
     def _get_event_handler(
         self, event: Event
@@ -1383,6 +1914,9 @@ class BaseState(Base, ABC, extra=pydantic.Extra.allow):
         # For background tasks, proxy the state
         if handler.is_background:
             substate = StateProxy(substate)
+        # For read-only event handlers, block writes to the state
+        elif handler.is_read_only:
+            substate = ReadOnlyStateProxy(substate)
 
         return substate, handler
 
@@ -1463,7 +1997,7 @@ class BaseState(Base, ABC, extra=pydantic.Extra.allow):
 
         try:
             # Get the delta after processing the event.
-            delta = state.get_delta()
+            delta = state._get_delta(defer_json=True)
             state._clean()
 
             return StateUpdate(
@@ -1515,10 +2049,20 @@ class BaseState(Base, ABC, extra=pydantic.Extra.allow):
 
         # Wrap the function in a try/except block.
         try:
+            run_in_thread = False
             # Handle async functions.
             if asyncio.iscoroutinefunction(fn.func):
                 events = await fn(**payload)
 
+            # Handle regular functions in a worker process.
+            elif handler.runs_in_process:
+                events = await _run_in_process(handler, state, payload)
+
+            # Handle regular functions in the thread pool.
+            elif _runs_in_thread(handler):
+                run_in_thread = True
+                events = await _run_in_thread(fn, **payload)
+
             # Handle regular functions.
             else:
                 events = fn(**payload)
@@ -1528,6 +2072,17 @@ class BaseState(Base, ABC, extra=pydantic.Extra.allow):
                     yield state._as_state_update(handler, event, final=False)
                 yield state._as_state_update(handler, events=None, final=True)
 
+            # Handle regular generators in the thread pool, one step at a time.
+            elif inspect.isgenerator(events) and run_in_thread:
+                while True:
+                    done, event = await _run_in_thread(_next_event, events)
+                    if done and event is None:
+                        break
+                    yield state._as_state_update(handler, event, final=False)
+                    if done:
+                        break
+                yield state._as_state_update(handler, events=None, final=True)
+
             # Handle regular generators.
             elif inspect.isgenerator(events):
                 try:
@@ -1558,29 +2113,54 @@ class BaseState(Base, ABC, extra=pydantic.Extra.allow):
                 final=True,
             )
 
-    def _mark_dirty_computed_vars(self) -> None:
-        """Mark ComputedVars that need to be recalculated based on dirty_vars."""
-        dirty_vars = self.dirty_vars
-        while dirty_vars:
-            calc_vars, dirty_vars = dirty_vars, set()
-            for cvar in self._dirty_computed_vars(from_vars=calc_vars):
-                self.dirty_vars.add(cvar)
-                dirty_vars.add(cvar)
-                actual_var = self.computed_vars.get(cvar)
-                if actual_var is not None:
-                    actual_var.mark_dirty(instance=self)
+    @classmethod
+    def _get_dirty_propagation_graph(cls) -> _DirtyPropagationGraph:
+        """Get the compiled dirty propagation graph of the state class.
 
-    def _expired_computed_vars(self) -> set[str]:
-        """Determine ComputedVars that need to be recalculated based on the expiration time.
+        The graph is cached until the state tree changes.
 
         Returns:
-            Set of computed vars to include in the delta.
+            The dirty propagation graph.
         """
-        return set(
-            cvar
-            for cvar in self.computed_vars
-            if self.computed_vars[cvar].needs_update(instance=self)
+        graph = cls.__dict__.get("_dirty_propagation_graph")
+        if graph is not None and graph[0] == BaseState._class_tree_generation:
+            return graph[1]
+
+        dependencies = cls._computed_var_dependencies
+        substate_dependencies = cls._substate_var_dependencies
+
+        def _visit(var: str, visited: set[str], order: list[str]):
+            for cvar in dependencies.get(var, ()):
+                if cvar not in visited:
+                    visited.add(cvar)
+                    _visit(cvar, visited, order)
+                    order.append(cvar)
+
+        computed_vars = {}
+        substates = {}
+        for var in {*dependencies, *substate_dependencies}:
+            order = []
+            _visit(var, set(), order)
+            # Dependencies come before the computed vars depending on them.
+            computed_vars[var] = tuple(reversed(order))
+            substates[var] = tuple(
+                (dependent_var, substate_name)
+                for dependent_var in (var, *computed_vars[var])
+                for substate_name in sorted(
+                    substate_dependencies.get(dependent_var, ())
+                )
+            )
+        graph = _DirtyPropagationGraph(
+            computed_vars={var: cvars for var, cvars in computed_vars.items() if cvars},
+            substates={var: pairs for var, pairs in substates.items() if pairs},
+            interval_computed_vars=tuple(
+                name
+                for name, cvar in cls.computed_vars.items()
+                if cvar._update_interval is not None
+            ),
         )
+        cls._dirty_propagation_graph = (BaseState._class_tree_generation, graph)
+        return graph
 
     def _dirty_computed_vars(
         self, from_vars: set[str] | None = None, include_backend: bool = True
@@ -1602,12 +2182,18 @@ class BaseState(Base, ABC, extra=pydantic.Extra.allow):
         )
 
     @classmethod
-    def _potentially_dirty_substates(cls) -> set[Type[BaseState]]:
+    def _potentially_dirty_substates(cls) -> FrozenSet[Type[BaseState]]:
         """Determine substates which could be affected by dirty vars in this state.
 
+        The result is cached until the state tree changes.
+
         Returns:
             Set of State classes that may need to be fetched to recalc computed vars.
         """
+        cached = cls.__dict__.get("_potentially_dirty_substates_cache")
+        if cached is not None and cached[0] == BaseState._class_tree_generation:
+            return cached[1]
+
         # _always_dirty_substates need to be fetched to recalc computed vars.
         fetch_substates = set(
             cls.get_class_substate((cls.get_name(), *substate_name.split(".")))
@@ -1620,11 +2206,27 @@ class BaseState(Base, ABC, extra=pydantic.Extra.allow):
                     for substate_name in dependent_substates
                 )
             )
-        return fetch_substates
+        cls._potentially_dirty_substates_cache = (
+            BaseState._class_tree_generation,
+            frozenset(fetch_substates),
+        )
+        return cls._potentially_dirty_substates_cache[1]
 
     def get_delta(self) -> Delta:
         """Get the delta for the state.
 
+        Returns:
+            The delta for the state.
+        """
+        return self._get_delta()
+
+    def _get_delta(self, defer_json: bool = False) -> Delta:
+        """Get the delta for the state.
+
+        Args:
+            defer_json: Whether values with a JSON encoder, like plotly figures,
+                are left as is, to be encoded straight to JSON with the state update.
+
         Returns:
             The delta for the state.
         """
@@ -1653,21 +2255,25 @@ class BaseState(Base, ABC, extra=pydantic.Extra.allow):
             if not types.is_backend_base_variable(prop, type(self))
         }
         if len(subdelta) > 0:
-            delta[self.get_full_name()] = subdelta
+            delta[self.get_full_name()] = self._format_delta(subdelta, defer_json)
 
         # Recursively find the substate deltas.
         substates = self.substates
         for substate in self.dirty_substates.union(self._always_dirty_substates):
-            delta.update(substates[substate].get_delta())
-
-        # Format the delta.
-        delta = format.format_state(delta)
+            delta.update(substates[substate]._get_delta(defer_json))
 
         # Return the delta.
         return delta
 
-    def _mark_dirty(self):
-        """Mark the substate and all parent states as dirty."""
+    def _mark_dirty(self, var_name: str | None = None):
+        """Mark the substate and all parent states as dirty.
+
+        Changes are propagated along the compiled dirty propagation graph, so the
+        cost only depends on the computed vars and substates affected by them.
+
+        Args:
+            var_name: The modified var, to only propagate its changes (all dirty vars by default).
+        """
         state_name = self.get_name()
         if (
             self.parent_state is not None
@@ -1676,26 +2282,128 @@ class BaseState(Base, ABC, extra=pydantic.Extra.allow):
             self.parent_state.dirty_substates.add(self.get_name())
             self.parent_state._mark_dirty()
 
+        graph = self._get_dirty_propagation_graph()
+        computed_vars = self.computed_vars
+        dirty_vars = self.dirty_vars
+
         # Append expired computed vars to dirty_vars to trigger recalculation
-        self.dirty_vars.update(self._expired_computed_vars())
+        changed_vars = [
+            cvar
+            for cvar in graph.interval_computed_vars
+            if computed_vars[cvar].needs_update(instance=self)
+        ]
+        dirty_vars.update(changed_vars)
+        if var_name is None:
+            changed_vars.extend(dirty_vars)
+        else:
+            changed_vars.append(var_name)
 
         # have to mark computed vars dirty to allow access to newly computed
         # values within the same ComputedVar function
-        self._mark_dirty_computed_vars()
-        self._mark_dirty_substates()
+        for var in changed_vars:
+            for cvar in graph.computed_vars.get(var, ()):
+                dirty_vars.add(cvar)
+                actual_var = computed_vars.get(cvar)
+                if actual_var is not None:
+                    actual_var.mark_dirty(instance=self)
 
-    def _mark_dirty_substates(self):
-        """Propagate dirty var / computed var status into substates."""
+        # Propagate dirty var / computed var status into substates.
         substates = self.substates
-        for var in self.dirty_vars:
-            for substate_name in self._substate_var_dependencies[var]:
+        for var in changed_vars:
+            for dependent_var, substate_name in graph.substates.get(var, ()):
                 self.dirty_substates.add(substate_name)
                 substate = substates[substate_name]
-                substate.dirty_vars.add(var)
-                substate._mark_dirty()
+                substate.dirty_vars.add(dependent_var)
+                substate._mark_dirty(dependent_var)
+
+    def _record_patch(
+        self, var_name: str, ops: list[list[Any]] | None, structural: bool = True
+    ):
+        """Record the patch operations applied to a mutable base var.
+
+        If all changes to the var are known, the delta contains the operations
+        instead of the full value of the var.
+
+        Args:
+            var_name: The name of the modified var.
+            ops: The patch operations, or None if the full value must be sent.
+            structural: Whether the paths of values nested in the var may have changed.
+        """
+        epochs = self._var_patch_epochs
+        if structural and var_name in epochs:
+            epochs[var_name] += 1
+        var_patches = self._var_patches
+        if ops is None or (var_name not in var_patches and var_name in self.dirty_vars):
+            # The var was changed in an unknown way since the last delta.
+            var_patches[var_name] = None
+        elif (recorded_ops := var_patches.setdefault(var_name, [])) is not None:
+            recorded_ops.extend(ops)
+
+    def _format_delta(
+        self, subdelta: dict[str, Any], defer_json: bool = False
+    ) -> dict[str, Any]:
+        """Format the values of the vars of this state in a delta.
+
+        Values are formatted with the formatter compiled for the type of their var.
+        Large vars with recorded patches are sent as the patch operations if
+        they are smaller than the value.
+
+        Args:
+            subdelta: The delta of the vars of this state.
+            defer_json: Whether values with a JSON encoder are left as is.
+
+        Returns:
+            The formatted delta.
+        """
+        var_patches = self._var_patches
+        var_formatters = self._get_var_formatters(defer_json)
+        for var_name, value in subdelta.items():
+            if isinstance(value, MutableProxy):
+                value = value.__wrapped__
+            ops = var_patches.get(var_name)
+            if (
+                ops is not None
+                and len(ops) < len(value)
+                and len(value) >= PATCH_MIN_LENGTH
+                and (ops := _resolve_patch_ops(ops)) is not None
+            ):
+                subdelta[var_name] = {constants.CompileVars.PATCH: ops}
+            else:
+                subdelta[var_name] = var_formatters.get(var_name, format.format_state)(
+                    value, var_name
+                )
+        return subdelta
+
+    def _mark_var_dirty(self, var_name: str):
+        """Mark a var changed in place as dirty.
+
+        Propagating the change is skipped when the var is already dirty and has
+        no dependents, as repeated changes of a mutable var are common.
+
+        Args:
+            var_name: The name of the changed var.
+        """
+        dirty_vars = self.dirty_vars
+        if var_name in dirty_vars:
+            graph = self._get_dirty_propagation_graph()
+            parent_state = self.parent_state
+            if (
+                not graph.interval_computed_vars
+                and var_name not in graph.computed_vars
+                and var_name not in graph.substates
+                and (
+                    parent_state is None
+                    or self.get_name() in parent_state.dirty_substates
+                )
+            ):
+                return
+        dirty_vars.add(var_name)
+        self._mark_dirty(var_name)
 
     def _update_was_touched(self):
-        """Update the _was_touched flag based on dirty_vars."""
+        """Update the _was_touched flag and the unpersisted vars based on dirty_vars."""
+        if self.dirty_vars and self._unpersisted_vars is not None:
+            self._unpersisted_vars.update(self.dirty_vars)
         if self.dirty_vars and not self._was_touched:
             for var in self.dirty_vars:
                 if var in self.base_vars or var in self._backend_vars:
@@ -1730,6 +2438,11 @@ class BaseState(Base, ABC, extra=pydantic.Extra.allow):
         # Clean this state.
         self.dirty_vars = set()
         self.dirty_substates = set()
+        object.__setattr__(self, "_var_patches", {})
+        for state in self._mutable_proxy_states:
+            object.__setattr__(state, "_mutable_proxies", {})
+        object.__setattr__(self, "_mutable_proxies", {})
+        object.__setattr__(self, "_mutable_proxy_states", [])
 
     def get_value(self, key: str) -> Any:
         """Get the value of a field (without proxying).
@@ -1843,8 +2556,54 @@ class BaseState(Base, ABC, extra=pydantic.Extra.allow):
         state["__dict__"]["parent_state"] = None
         state["__dict__"]["substates"] = {}
         state["__dict__"].pop("_was_touched", None)
+        state["__dict__"].pop("_persisted_version", None)
+        state["__dict__"].pop("_unpersisted_vars", None)
+        # The caches of the instance are never serialized.
+        state["__private_attribute_values__"] = {
+            name: value
+            for name, value in state["__private_attribute_values__"].items()
+            if name not in _INSTANCE_CACHE_ATTRS
+        }
+        return state
+
+    def __setstate__(self, state: dict[str, Any]):
+        """Set the state from redis deserialization.
+
+        The caches of the instance start out empty.
+
+        Args:
+            state: The state dict, as returned by __getstate__.
+        """
+        super().__setstate__(state)
+        self._reset_instance_caches()
+
+    def _copy_and_set_values(
+        self, values: dict[str, Any], fields_set: set[str], *, deep: bool
+    ) -> BaseState:
+        """Create a copy of the state with the given values (used by pydantic's copy).
+
+        The copy gets its own empty caches, instead of sharing those of this instance.
+
+        Args:
+            values: The field values of the copy.
+            fields_set: The fields explicitly set on the copy.
+            deep: Whether to deep copy the values.
+
+        Returns:
+            The copy of the state.
+        """
+        state = super()._copy_and_set_values(values, fields_set, deep=deep)
+        state._reset_instance_caches()
         return state
 
+    def _reset_instance_caches(self):
+        """Give the instance its own empty caches."""
+        object.__setattr__(self, "_bound_event_handlers", {})
+        object.__setattr__(self, "_mutable_proxies", {})
+        object.__setattr__(self, "_mutable_proxy_states", [])
+        object.__setattr__(self, "_var_patches", {})
+        object.__setattr__(self, "_var_patch_epochs", {})
+
 
 EventHandlerSetVar.update_forward_refs()
 
@@ -2010,6 +2769,191 @@ class ComponentState(State, mixin=True):
         return component
 
 
+class DataWindow(Base):
+    """A window of the rows of a data source, sent to the frontend."""
+
+    # The index of the first row of the window.
+    offset: int = 0
+
+    # The rows of the window.
+    rows: List[Any] = []
+
+    # The total number of rows of the data source.
+    total: int = 0
+
+
+class DataSourceState(State, mixin=True):
+    """Base class for states serving the rows of a large table window by window.
+
+    Only the rows around the visible region of a data editor are kept in the
+    state and sent to the frontend, the data editor requests other rows as the
+    user scrolls through it. Loaded blocks of rows are cached per client and
+    query in the memory of the backend process, outside of the state.
+
+    Subclass this class, together with State, and implement `_load_rows`.
+    Pass the `window` var as the data of a data editor, along with the
+    `load_region` event handler for `on_visible_region_changed`. The data
+    editor is the only component displaying a window: data tables page, sort
+    and search the rows they are given in the browser.
+
+    ```python
+    class Orders(rx.DataSourceState, rx.State):
+        def _load_rows(self, offset, limit):
+            rows = db.fetch_orders(offset, limit, order_by=self.query.get("sort"))
+            return rows, db.count_orders()
+
+    rx.data_editor(
+        data=Orders.window,
+        columns=columns,
+        on_visible_region_changed=Orders.load_region,
+    )
+    ```
+    """
+
+    # The number of rows loaded at once.
+    window_size: ClassVar[int] = 200
+
+    # The maximum number of blocks of rows cached per state.
+    max_cached_windows: ClassVar[int] = 16
+
+    # The maximum number of states (per client and query) with cached blocks in the process.
+    max_cached_sources: ClassVar[int] = 256
+
+    # The window of rows to display.
+    window: DataWindow = DataWindow()
+
+    # The query of the data source, such as the sort order or the filters.
+    query: Dict[str, Any] = {}
+
+    # The cached blocks of rows and total counts, by offset, for each state and query.
+    # They are not persisted with the state, so they are lost when another process
+    # handles the next event of the client.
+    _window_caches: ClassVar[
+        Dict[Tuple[str, str], Dict[int, Tuple[List[Any], int]]]
+    ] = {}
+
+    def _load_rows(self, offset: int, limit: int) -> Tuple[List[Any], int]:
+        """Load rows of the data source for the current query.
+
+        Args:
+            offset: The index of the first row to load.
+            limit: The maximum number of rows to load.
+
+        Raises:
+            NotImplementedError: if the subclass does not override this method.
+        """
+        raise NotImplementedError(
+            f"{type(self).__name__} must implement _load_rows to return the rows and the total count."
+        )
+
+    def _get_windows_key(self) -> Tuple[str, str]:
+        """Get the key of the cached blocks of this state for the current query.
+
+        Returns:
+            The substate key and the serialized query.
+        """
+        return (
+            _substate_key(self.router.session.client_token, self),
+            format.json_dumps(self.query),
+        )
+
+    def _get_windows(self) -> Dict[int, Tuple[List[Any], int]]:
+        """Get the cached blocks of this state for the current query.
+
+        Returns:
+            The cached blocks of rows and total counts, by offset.
+        """
+        window_caches = DataSourceState._window_caches
+        key = self._get_windows_key()
+        windows = window_caches.pop(key, None)
+        if windows is None:
+            windows = {}
+            while window_caches and len(window_caches) >= self.max_cached_sources:
+                del window_caches[next(iter(window_caches))]
+        # Keep the most recently used states last.
+        window_caches[key] = windows
+        return windows
+
+    def _get_block(self, offset: int) -> Tuple[List[Any], int]:
+        """Get a block of rows, from the cache if it was already loaded.
+
+        Args:
+            offset: The index of the first row of the block.
+
+        Returns:
+            The rows of the block and the total number of rows.
+        """
+        windows = self._get_windows()
+        block = windows.pop(offset, None)
+        if block is None:
+            rows, total = self._load_rows(offset, self.window_size)
+            block = (list(rows), total)
+            while len(windows) >= self.max_cached_windows:
+                del windows[next(iter(windows))]
+        # Keep the most recently used blocks last.
+        windows[offset] = block
+        return block
+
+    def _set_window(self, start: int, end: int):
+        """Load the rows between two indices into the window, unless already loaded.
+
+        Args:
+            start: The index of the first row needed.
+            end: The index after the last row needed.
+        """
+        window = self.window
+        if (
+            window.offset <= start
+            and end <= window.offset + len(window.rows)
+            and window.rows
+        ):
+            return
+        size = self.window_size
+        offset = start - start % size
+        rows, total = [], 0
+        for block_offset in range(offset, max(end, offset + 1), size):
+            block_rows, total = self._get_block(block_offset)
+            rows.extend(block_rows)
+            if len(block_rows) < size:
+                break
+        self.window = DataWindow(offset=offset, rows=rows, total=total)
+
+    def load_region(self, region: Dict[str, int]):
+        """Load the rows of the visible region of a data editor.
+
+        Args:
+            region: The visible region, with the index of the first row `y` and the number of rows `height`.
+        """
+        start = max(int(region.get("y", 0)), 0)
+        self._set_window(start, start + max(int(region.get("height", 0)), 1))
+
+    def load_page(self, page: int):
+        """Load the rows of a page of `window_size` rows.
+
+        Args:
+            page: The index of the page.
+        """
+        start = max(int(page), 0) * self.window_size
+        self._set_window(start, start + self.window_size)
+
+    def apply_query(self, query: Dict[str, Any]):
+        """Change the query of the data source and reload the first rows.
+
+        Args:
+            query: The new query.
+        """
+        self.query = query
+        self.window = DataWindow()
+        self.refresh()
+
+    def refresh(self):
+        """Clear the cached rows and reload the current window."""
+        DataSourceState._window_caches.pop(self._get_windows_key(), None)
+        offset = self.window.offset
+        self.window = DataWindow(offset=offset)
+        self._set_window(offset, offset + self.window_size)
+
+
 class StateProxy(wrapt.ObjectProxy):
     """Proxy of a state instance to control mutability of vars for a background task.
 
@@ -2059,6 +3003,17 @@ class StateProxy(wrapt.ObjectProxy):
         self._self_actx_lock_holder = None
         self._self_parent_state_proxy = parent_state_proxy
 
+    def _get_immutable_error(self) -> ImmutableStateError:
+        """Get the error raised when the state is modified while it is not mutable.
+
+        Returns:
+            The error to raise.
+        """
+        return ImmutableStateError(
+            "Background task StateProxy is immutable outside of a context "
+            "manager. Use `async with self` to modify state."
+        )
+
     def _is_mutable(self) -> bool:
         """Check if the state is mutable.
 
@@ -2171,10 +3126,7 @@ class StateProxy(wrapt.ObjectProxy):
             ImmutableStateError: If the state is not in mutable mode.
         """
         if name in ["substates", "parent_state"] and not self._is_mutable():
-            raise ImmutableStateError(
-                "Background task StateProxy is immutable outside of a context "
-                "manager. Use `async with self` to modify state."
-            )
+            raise self._get_immutable_error()
         value = super().__getattr__(name)
         if not name.startswith("_self_") and isinstance(value, MutableProxy):
             # ensure mutations to these containers are blocked unless proxy is _mutable
@@ -2217,10 +3169,7 @@ class StateProxy(wrapt.ObjectProxy):
             super().__setattr__(name, value)
             return
 
-        raise ImmutableStateError(
-            "Background task StateProxy is immutable outside of a context "
-            "manager. Use `async with self` to modify state."
-        )
+        raise self._get_immutable_error()
 
     def get_substate(self, path: Sequence[str]) -> BaseState:
         """Only allow substate access with lock held.
@@ -2235,10 +3184,7 @@ class StateProxy(wrapt.ObjectProxy):
             ImmutableStateError: If the state is not in mutable mode.
         """
         if not self._is_mutable():
-            raise ImmutableStateError(
-                "Background task StateProxy is immutable outside of a context "
-                "manager. Use `async with self` to modify state."
-            )
+            raise self._get_immutable_error()
         return self.__wrapped__.get_substate(path)
 
     async def get_state(self, state_cls: Type[BaseState]) -> BaseState:
@@ -2254,10 +3200,7 @@ class StateProxy(wrapt.ObjectProxy):
             ImmutableStateError: If the state is not in mutable mode.
         """
         if not self._is_mutable():
-            raise ImmutableStateError(
-                "Background task StateProxy is immutable outside of a context "
-                "manager. Use `async with self` to modify state."
-            )
+            raise self._get_immutable_error()
         return type(self)(
             await self.__wrapped__.get_state(state_cls), parent_state_proxy=self
         )
@@ -2279,6 +3222,68 @@ class StateProxy(wrapt.ObjectProxy):
             self._self_mutable = False
 
 
+class ReadOnlyStateProxy(StateProxy):
+    """Proxy of a state instance for a read-only event handler.
+
+    Read-only event handlers share access to the state with each other, so
+    writes to the state (and its mutable vars) raise an ImmutableStateError.
+    Other states can be read with `get_state`, but the state cannot be made
+    mutable with `async with self`.
+    """
+
+    def __init__(self, state_instance: BaseState):
+        """Create a read-only proxy for a state instance.
+
+        Args:
+            state_instance: The state instance to proxy.
+        """
+        wrapt.ObjectProxy.__init__(self, state_instance)
+        self._self_substate_path = tuple(state_instance.get_full_name().split("."))
+        self._self_mutable = False
+        self._self_parent_state_proxy = None
+
+    def _get_immutable_error(self) -> ImmutableStateError:
+        """Get the error raised when the state is modified.
+
+        Returns:
+            The error to raise.
+        """
+        return ImmutableStateError(
+            f"The state {self._self_substate_path[-1]} cannot be modified by a "
+            "read-only event handler. Remove `@rx.read_only` to modify state."
+        )
+
+    async def __aenter__(self) -> StateProxy:
+        """Read-only event handlers cannot modify the state.
+
+        Raises:
+            ImmutableStateError: always, because the state is not written back.
+        """
+        raise self._get_immutable_error()
+
+    def get_substate(self, path: Sequence[str]) -> BaseState:
+        """Get a read-only proxy of a substate.
+
+        Args:
+            path: The path to the substate.
+
+        Returns:
+            The substate.
+        """
+        return type(self)(self.__wrapped__.get_substate(path))  # type: ignore
+
+    async def get_state(self, state_cls: Type[BaseState]) -> BaseState:
+        """Get a read-only proxy of the instance of a state associated with this token.
+
+        Args:
+            state_cls: The class of the state.
+
+        Returns:
+            The state.
+        """
+        return type(self)(await self.__wrapped__.get_state(state_cls))  # type: ignore
+
+
 class StateUpdate(Base):
     """A state update sent to the frontend."""
 
@@ -2291,6 +3296,53 @@ class StateUpdate(Base):
     # Whether this is the final state update for the event.
     final: bool = True
 
+    def _get_formatted(self) -> dict[str, Any]:
+        """Get the state update as formatted state.
+
+        The delta is already formatted, so it is used directly instead of
+        being converted to a dict first.
+
+        Returns:
+            The state update as a dict.
+        """
+        return {
+            "delta": self.delta,
+            "events": [event.dict() for event in self.events],
+            "final": self.final,
+        }
+
+    def json(self) -> str:
+        """Convert the state update to a json string.
+
+        Returns:
+            The state update as a json string.
+        """
+        return format.json_dumps_state(self._get_formatted())
+
+    def encode(
+        self, protocol: constants.SocketProtocol = constants.SocketProtocol.JSON
+    ) -> str | bytes:
+        """Encode the state update as the payload of a socket message.
+
+        If orjson is installed, the update is encoded in a single pass to JSON
+        bytes, which Socket.IO sends as a binary attachment instead of escaping
+        them into the message. Updates with NaN or infinite floats, which strict
+        JSON cannot represent, are sent as a json string parsed with JSON5.
+
+        Args:
+            protocol: The protocol negotiated with the client.
+
+        Returns:
+            The state update as MessagePack or JSON bytes, or as a json string.
+        """
+        formatted = self._get_formatted()
+        if protocol == constants.SocketProtocol.MSGPACK:
+            return format.msgpack_encode_state(formatted)
+        encoded = format.json_encode_state(formatted)
+        if encoded is not None:
+            return encoded
+        return format.json_dumps_state(formatted)
+
 
 class StateManager(Base, ABC):
     """A class to manage many client states."""
@@ -2306,19 +3358,46 @@ class StateManager(Base, ABC):
             state: The state class to use.
 
         Returns:
-            The state manager (either memory or redis).
+            The state manager (memory, disk or redis).
+
+        Raises:
+            InvalidStateManagerMode: If the redis state manager is selected without redis.
         """
-        redis = prerequisites.get_redis()
+        config = get_config()
+        mode = config.state_manager_mode
+        redis = (
+            prerequisites.get_redis()
+            if mode in (None, constants.StateManagerMode.REDIS)
+            else None
+        )
+        if redis is None and mode == constants.StateManagerMode.REDIS:
+            raise InvalidStateManagerMode(
+                "The redis state manager requires `redis_url` to be set in rxconfig.py."
+            )
         if redis is not None:
             # make sure expiration values are obtained only from the config object on creation
-            config = get_config()
             return StateManagerRedis(
                 state=state,
                 redis=redis,
-                token_expiration=config.redis_token_expiration,
-                lock_expiration=config.redis_lock_expiration,
+                token_expiration=config.get_state_token_expiration(),
+                lock_expiration=config.get_state_lock_expiration(),
+                cache_size=config.redis_state_cache_size,
+                layout=config.redis_state_layout,
+            )
+        if mode == constants.StateManagerMode.DISK:
+            return StateManagerDisk(
+                state=state,
+                path=_default_disk_state_path(),
+                token_expiration=config.get_state_token_expiration(),
+                lock_expiration=config.get_state_lock_expiration(),
             )
-        return StateManagerMemory(state=state)
+        return StateManagerMemory(
+            state=state,
+            token_expiration=config.memory_state_expiration,
+            max_states=config.memory_state_max_entries,
+            spill_dir=config.memory_state_spill_dir,
+            spill_expiration=config.get_state_token_expiration(),
+        )
 
     @abstractmethod
     async def get_state(self, token: str) -> BaseState:
@@ -2355,19 +3434,80 @@ class StateManager(Base, ABC):
         """
         yield self.state()
 
+    @contextlib.asynccontextmanager
+    async def read_state(self, token: str) -> AsyncIterator[BaseState]:
+        """Read the state for a token, without writing it back.
+
+        The state must not be modified. State managers may let readers of a token
+        run concurrently, with a shared lock or by holding the exclusive lock
+        only while fetching the state. By default, the exclusive lock is held.
+
+        Args:
+            token: The token to read the state for.
+
+        Yields:
+            The state for the token.
+        """
+        async with self.modify_state(token) as state:
+            yield state
+
 
 class StateManagerMemory(StateManager):
-    """A state manager that stores states in memory."""
+    """A state manager that stores states in memory.
+
+    States can be evicted after token_expiration seconds without access and
+    when more than max_states are kept (least recently used first). States
+    evicted for exceeding max_states are spilled to spill_dir, if set, and
+    restored on their next access. Spilling and restoring run in the default
+    executor, and states which cannot be encoded are evicted without being
+    spilled. Expired states and spilled states are
+    evicted by sweep, which the app runs for its lifespan when an expiration
+    or a spill directory is configured.
+    """
 
     # The mapping of client ids to states.
     states: Dict[str, BaseState] = {}
 
+    # Seconds without access after which a state is evicted (None keeps states forever).
+    token_expiration: Optional[int] = None
+
+    # The maximum number of states to keep (None for no limit).
+    max_states: Optional[int] = None
+
+    # The directory for states evicted for exceeding max_states (None discards them).
+    spill_dir: Optional[Path] = None
+
+    # Seconds without access after which a spilled state is deleted, if token_expiration is not set.
+    spill_expiration: int = constants.Expiration.TOKEN
+
     # The mutex ensures the dict of mutexes is updated exclusively
     _state_manager_lock = asyncio.Lock()
 
     # The dict of mutexes for each client
     _states_locks: Dict[str, asyncio.Lock] = pydantic.PrivateAttr({})
 
+    # The last access time of each client (monotonic), least recently used first.
+    _last_access: OrderedDict[str, float] = pydantic.PrivateAttr(
+        default_factory=OrderedDict
+    )
+
+    # The number of pending modify_state calls for each client, these are never evicted.
+    _states_in_use: Dict[str, int] = pydantic.PrivateAttr(default_factory=dict)
+
+    # The number of read_state calls sharing the state of each client.
+    _states_readers: Dict[str, int] = pydantic.PrivateAttr(default_factory=dict)
+
+    # The events set when the last reader of a client's state is done, for waiting writers.
+    _states_readers_done: Dict[str, asyncio.Event] = pydantic.PrivateAttr(
+        default_factory=dict
+    )
+
+    # The pending spill or restore of the state of each client, run one after the other.
+    _spill_tasks: Dict[str, asyncio.Task] = pydantic.PrivateAttr(default_factory=dict)
+
+    # The longest interval between two sweeps (s).
+    _max_sweep_interval: ClassVar[float] = 60.0
+
     class Config:
         """The Pydantic config."""
 
@@ -2388,7 +3528,14 @@ class StateManagerMemory(StateManager):
         # Memory state manager ignores the substate suffix and always returns the top-level state.
         token = _split_substate_key(token)[0]
         if token not in self.states:
-            self.states[token] = self.state(_reflex_internal_init=True)
+            if self.spill_dir is not None or token in self._spill_tasks:
+                await self._restore_state(token)
+            if token not in self.states:
+                self.states[token] = self.state(_reflex_internal_init=True)
+        self._last_access[token] = time.monotonic()
+        self._last_access.move_to_end(token)
+        if self.max_states is not None and len(self.states) > self.max_states:
+            self._evict_least_recently_used(keep=token)
         return self.states[token]
 
     @override
@@ -2414,15 +3561,270 @@ class StateManagerMemory(StateManager):
         """
         # Memory state manager ignores the substate suffix and always returns the top-level state.
         token = _split_substate_key(token)[0]
+        async with self._use_state(token), self._states_locks[token]:
+            # Readers which got the state before this writer must be done first.
+            while self._states_readers.get(token):
+                await self._states_readers_done.setdefault(
+                    token, asyncio.Event()
+                ).wait()
+            state = await self.get_state(token)
+            yield state
+            await self.set_state(token, state)
+
+    @override
+    @contextlib.asynccontextmanager
+    async def read_state(self, token: str) -> AsyncIterator[BaseState]:
+        """Read the state for a token while holding a shared lock.
+
+        Readers share the state with each other, but not with a writer. Readers
+        and writers get the state in the order they ask for it.
+
+        Args:
+            token: The token to read the state for.
+
+        Yields:
+            The state for the token.
+        """
+        # Memory state manager ignores the substate suffix and always returns the top-level state.
+        token = _split_substate_key(token)[0]
+        async with self._use_state(token):
+            # Wait for the writers which asked for the state first.
+            async with self._states_locks[token]:
+                state = await self.get_state(token)
+                self._states_readers[token] = self._states_readers.get(token, 0) + 1
+            try:
+                yield state
+            finally:
+                self._states_readers[token] -= 1
+                if not self._states_readers[token]:
+                    del self._states_readers[token]
+                    readers_done = self._states_readers_done.pop(token, None)
+                    if readers_done is not None:
+                        readers_done.set()
+
+    @contextlib.asynccontextmanager
+    async def _use_state(self, token: str) -> AsyncIterator[None]:
+        """Mark the state of a client as in use, so it and its lock are not evicted.
+
+        Args:
+            token: The client token.
+
+        Yields:
+            While the state is in use.
+        """
         if token not in self._states_locks:
             async with self._state_manager_lock:
                 if token not in self._states_locks:
                     self._states_locks[token] = asyncio.Lock()
 
-        async with self._states_locks[token]:
-            state = await self.get_state(token)
-            yield state
-            await self.set_state(token, state)
+        self._states_in_use[token] = self._states_in_use.get(token, 0) + 1
+        try:
+            yield
+        finally:
+            self._states_in_use[token] -= 1
+            if not self._states_in_use[token]:
+                del self._states_in_use[token]
+
+    async def sweep(self):
+        """Periodically evict the states that expired, for the lifespan of the app."""
+        interval = min(
+            self.token_expiration or self._max_sweep_interval,
+            self._max_sweep_interval,
+        )
+        while True:
+            await asyncio.sleep(interval)
+            self.evict_expired_states()
+
+    def evict_expired_states(self):
+        """Evict the states that were not accessed within token_expiration.
+
+        Spilled states are deleted after token_expiration, or spill_expiration if
+        it is not set, so the spill directory does not grow without bound.
+        """
+        if self.token_expiration is not None:
+            now = time.monotonic()
+            for token, last_access in list(self._last_access.items()):
+                if now - last_access < self.token_expiration:
+                    # The remaining states were accessed more recently.
+                    break
+                self._evict(token)
+
+        if self.spill_dir is not None and self.spill_dir.is_dir():
+            expired = time.time() - (self.token_expiration or self.spill_expiration)
+            for spill_path in self.spill_dir.glob("*.state"):
+                with contextlib.suppress(FileNotFoundError):
+                    if spill_path.stat().st_mtime < expired:
+                        spill_path.unlink()
+
+    def _evict_least_recently_used(self, keep: str):
+        """Evict the least recently used states until at most max_states are kept.
+
+        Args:
+            keep: The token of the state being accessed, which is never evicted.
+        """
+        for token in list(self._last_access):
+            if self.max_states is None or len(self.states) <= self.max_states:
+                break
+            if token == keep or token in self._states_in_use:
+                continue
+            state = self.states.get(token)
+            self._evict(token)
+            if self.spill_dir is not None and state is not None:
+                self._run_spill_task(token, self._spill_state(token, state))
+
+    def _evict(self, token: str):
+        """Evict the state of a token, unless it is being modified.
+
+        Args:
+            token: The token to evict the state for.
+        """
+        if token in self._states_in_use:
+            return
+        self.states.pop(token, None)
+        self._states_locks.pop(token, None)
+        self._last_access.pop(token, None)
+
+    def _get_spill_path(self, token: str) -> Path:
+        """Get the file a spilled state is stored in.
+
+        Args:
+            token: The token of the state.
+
+        Returns:
+            The path of the spilled state.
+        """
+        # Tokens come from the client, so never use them as file names directly.
+        return cast(Path, self.spill_dir) / (
+            hashlib.sha256(token.encode()).hexdigest() + ".state"
+        )
+
+    def _run_spill_task(self, token: str, coro: Coroutine) -> asyncio.Task:
+        """Run a spill or restore of the state of a token after the pending one.
+
+        Args:
+            token: The token of the state.
+            coro: The spill or restore to run.
+
+        Returns:
+            The task running the spill or restore.
+        """
+        previous = self._spill_tasks.get(token)
+
+        async def _run():
+            try:
+                if previous is not None:
+                    await asyncio.wait([previous])
+                return await coro
+            finally:
+                if self._spill_tasks.get(token) is task:
+                    del self._spill_tasks[token]
+
+        task = self._spill_tasks[token] = asyncio.create_task(_run())
+        return task
+
+    async def _spill_state(self, token: str, state: BaseState):
+        """Write the evicted state tree of a token to the spill directory.
+
+        Args:
+            token: The token of the state.
+            state: The evicted state.
+        """
+        await asyncio.get_running_loop().run_in_executor(
+            None, self._write_spilled_state, token, state
+        )
+
+    def _write_spilled_state(self, token: str, state: BaseState):
+        """Encode and write a state tree to the spill directory.
+
+        States which cannot be encoded or written are discarded with a warning.
+
+        Args:
+            token: The token of the state.
+            state: The state to write.
+        """
+        codec = _default_state_codec()
+        try:
+            encoded_states = {}
+            pending = [state]
+            while pending:
+                substate = pending.pop()
+                encoded_states[substate.get_full_name()] = codec.encode(substate)
+                pending.extend(substate.substates.values())
+
+            spill_path = self._get_spill_path(token)
+            spill_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = spill_path.with_suffix(".tmp")
+            tmp_path.write_bytes(pickle.dumps(encoded_states))
+            tmp_path.replace(spill_path)
+        except (pickle.PicklingError, TypeError, AttributeError, OSError) as e:
+            console.warn(f"Discarding evicted state instead of spilling it: {e}")
+
+    async def _restore_state(self, token: str):
+        """Restore the spilled state tree of a token into the states, if any.
+
+        Args:
+            token: The token of the state.
+        """
+        # Wait in the task, even if the caller is cancelled, so a restored state is kept.
+        await asyncio.shield(self._run_spill_task(token, self._load_state(token)))
+
+    async def _load_state(self, token: str):
+        """Read the spilled state tree of a token into the states.
+
+        Args:
+            token: The token of the state.
+        """
+        if token in self.states or self.spill_dir is None:
+            # Restored by a previous call in the meantime.
+            return
+        state = await asyncio.get_running_loop().run_in_executor(
+            None, self._read_spilled_state, token
+        )
+        if state is not None and token not in self.states:
+            self.states[token] = state
+
+    def _read_spilled_state(self, token: str) -> BaseState | None:
+        """Read (and remove) the spilled state tree of a token.
+
+        Args:
+            token: The token of the state.
+
+        Returns:
+            The restored state, or None if no state was spilled for the token.
+        """
+        spill_path = self._get_spill_path(token)
+        try:
+            encoded_states = pickle.loads(spill_path.read_bytes())
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError, OSError) as e:
+            console.warn(f"Discarding spilled state: {e}")
+            return None
+        finally:
+            with contextlib.suppress(OSError):
+                spill_path.unlink(missing_ok=True)
+
+        codec = _default_state_codec()
+        flat_state_tree: dict[str, BaseState] = {}
+        pending: list[tuple[Type[BaseState], BaseState | None]] = [(self.state, None)]
+        while pending:
+            state_cls, parent_state = pending.pop()
+            state = None
+            data = encoded_states.get(state_cls.get_full_name())
+            if data is not None:
+                try:
+                    state = codec.decode(data, state_cls)
+                except StateSerializationError as sse:
+                    console.warn(f"Discarding spilled state: {sse}")
+            if state is None:
+                # Substates added since the state was spilled start from their defaults.
+                state = state_cls(init_substates=False, _reflex_internal_init=True)
+            if parent_state is not None:
+                parent_state.substates[state.get_name()] = state
+                state.parent_state = parent_state
+            flat_state_tree[state.get_full_name()] = state
+            pending.extend((substate, state) for substate in state_cls.get_substates())
+        return flat_state_tree[self.state.get_full_name()]
 
 
 # Workaround https://github.com/cloudpipe/cloudpickle/issues/408 for dynamic pydantic classes
@@ -2450,210 +3852,1717 @@ def _default_lock_expiration() -> int:
     Returns:
         The default lock expiration time.
     """
-    return get_config().redis_lock_expiration
+    return get_config().get_state_lock_expiration()
+
+
+def _default_token_expiration() -> int:
+    """Get the default token expiration time.
+
+    Returns:
+        The default token expiration time.
+    """
+    return get_config().get_state_token_expiration()
+
+
+def _default_cache_size() -> int:
+    """Get the default size of the per-worker state cache.
+
+    Returns:
+        The default state cache size.
+    """
+    return get_config().redis_state_cache_size
+
+
+def _default_state_layout() -> constants.StateLayout:
+    """Get the default layout of states persisted in redis.
+
+    Returns:
+        The default state layout.
+    """
+    return get_config().redis_state_layout
+
+
+def _default_cluster_hash_tags() -> bool:
+    """Get whether the redis keys of a token share a hash tag by default.
+
+    Returns:
+        Whether to use cluster hash tags.
+    """
+    return get_config().redis_cluster_hash_tags
+
+
+def _default_disk_state_path() -> Path:
+    """Get the default path of the database used by the disk state manager.
+
+    Returns:
+        The default database path.
+    """
+    disk_state_path = get_config().disk_state_path
+    if disk_state_path is not None:
+        return Path(disk_state_path)
+    return prerequisites.get_web_dir() / constants.Dirs.STATES / "states.db"
+
+
+def _import_compression_module(compression: constants.StateCompression) -> Any:
+    """Import the module implementing a state compression algorithm.
+
+    Args:
+        compression: The compression algorithm.
+
+    Returns:
+        The module with `compress` and `decompress` functions.
+
+    Raises:
+        ImportError: If the package for the compression algorithm is not installed.
+    """
+    package = "zstandard" if compression == constants.StateCompression.ZSTD else "lz4"
+    try:
+        if compression == constants.StateCompression.ZSTD:
+            import zstandard
+
+            return zstandard
+        import lz4.frame
+
+        return lz4.frame
+    except ImportError as ie:
+        raise ImportError(
+            f"Please install the `{package}` package to use {compression} state compression."
+        ) from ie
+
+
+@functools.lru_cache(maxsize=None)
+def _state_schema_fingerprint(state_cls: Type[BaseState]) -> bytes:
+    """Get a fingerprint of the vars defined on a state class.
+
+    Args:
+        state_cls: The state class.
+
+    Returns:
+        A short digest that changes whenever the vars of the class change.
+    """
+    schema = (
+        state_cls.get_full_name(),
+        sorted(
+            (name, repr(var._var_type)) for name, var in state_cls.base_vars.items()
+        ),
+        sorted(state_cls.backend_vars),
+        sorted(state_cls.computed_vars),
+    )
+    return hashlib.blake2b(repr(schema).encode(), digest_size=8).digest()
+
+
+class StateCodec(ABC):
+    """Encode and decode state instances persisted by a state manager."""
+
+    @abstractmethod
+    def encode(self, state: BaseState) -> bytes:
+        """Encode a single state instance (parent states and substates are excluded).
+
+        Args:
+            state: The state to encode.
+
+        Returns:
+            The encoded state.
+        """
+        pass
+
+    @abstractmethod
+    def decode(self, data: bytes, state_cls: Type[BaseState]) -> BaseState:
+        """Decode a state instance.
+
+        Args:
+            data: The encoded state.
+            state_cls: The class of the encoded state.
+
+        Returns:
+            The decoded state, without parent state or substates.
+        """
+        pass
+
+    def encode_fields(
+        self, state: BaseState, var_names: set[str] | None = None
+    ) -> tuple[dict[str, bytes], list[str]]:
+        """Encode the vars of a state instance as separate fields.
+
+        Args:
+            state: The state to encode.
+            var_names: The names of the vars to encode, all vars if None.
+
+        Raises:
+            NotImplementedError: If the codec does not support separately encoded fields.
+        """
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support the hash state layout."
+        )
+
+    def decode_fields(
+        self, encoded: dict[bytes, bytes], state_cls: Type[BaseState]
+    ) -> BaseState:
+        """Decode a state instance from separately encoded fields.
+
+        Args:
+            encoded: The encoded fields.
+            state_cls: The class of the encoded state.
+
+        Raises:
+            NotImplementedError: If the codec does not support separately encoded fields.
+        """
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support the hash state layout."
+        )
+
+
+class PickleStateCodec(StateCodec):
+    """Encode only the vars of a state with pickle, behind a versioned header.
+
+    Base vars, backend vars and computed var caches are written instead of the
+    whole instance. The header records the serializer, the compression and a
+    fingerprint of the state schema, so entries written before a deploy that
+    changed the vars of a state are migrated instead of failing to load.
+    Entries in the legacy dill format are still decoded.
+    """
+
+    # Magic, format version, serializer id, compression id and schema fingerprint.
+    _header: ClassVar[struct.Struct] = struct.Struct("!2sBBB8s")
+    _magic: ClassVar[bytes] = b"RX"
+    _format_version: ClassVar[int] = 1
+
+    # With separately encoded fields, the header is stored in its own field
+    # and each field starts with its serializer id and compression id.
+    _fields_header: ClassVar[struct.Struct] = struct.Struct("!2sB8s")
+    _field_header: ClassVar[struct.Struct] = struct.Struct("!BB")
+
+    # Payloads are pickled with dill when the stdlib pickle cannot handle a value.
+    _serializer_ids: ClassVar[Dict[str, int]] = {"pickle": 0, "dill": 1}
+
+    _compression_ids: ClassVar[Dict[Optional[str], int]] = {
+        None: 0,
+        constants.StateCompression.ZSTD: 1,
+        constants.StateCompression.LZ4: 2,
+    }
+
+    def __init__(
+        self,
+        compression: constants.StateCompression | str | None = None,
+        compression_threshold: int = 1024,
+    ):
+        """Create a pickle state codec.
+
+        Args:
+            compression: The compression algorithm for the encoded vars.
+            compression_threshold: Encoded vars smaller than this (in bytes) are not compressed.
+        """
+        self.compression = (
+            constants.StateCompression(compression) if compression else None
+        )
+        self.compression_threshold = compression_threshold
+        if self.compression is not None:
+            # Fail early if the compression package is missing.
+            _import_compression_module(self.compression)
+
+    def _dumps(self, value: Any) -> tuple[int, int, bytes]:
+        """Pickle and optionally compress a value.
+
+        Args:
+            value: The value to pickle.
+
+        Returns:
+            The serializer id, the compression id and the pickled value.
+        """
+        try:
+            serializer = "pickle"
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            # Local classes, lambdas and the like are only supported by dill.
+            serializer = "dill"
+            data = dill.dumps(value, byref=True)
+
+        compression = None
+        if self.compression is not None and len(data) >= self.compression_threshold:
+            compression = self.compression
+            data = _import_compression_module(compression).compress(data)
+        return (
+            self._serializer_ids[serializer],
+            self._compression_ids[compression],
+            data,
+        )
+
+    def _loads(self, serializer_id: int, compression_id: int, data: Any) -> Any:
+        """Decompress and unpickle a value.
+
+        Args:
+            serializer_id: The id of the serializer used to pickle the value.
+            compression_id: The id of the compression used for the value.
+            data: The pickled value (a bytes-like object).
+
+        Returns:
+            The value.
+        """
+        for compression, _id in self._compression_ids.items():
+            if compression is not None and _id == compression_id:
+                data = _import_compression_module(compression).decompress(data)
+        if serializer_id == self._serializer_ids["pickle"]:
+            return pickle.loads(data)
+        return dill.loads(data)
+
+    def encode(self, state: BaseState) -> bytes:
+        """Encode the vars of a state instance.
+
+        Args:
+            state: The state to encode.
+
+        Returns:
+            The encoded state.
+        """
+        state_dict = state.__getstate__()
+        fields = state_dict["__dict__"]
+        payload = (
+            {
+                name: fields[name]
+                for name in (
+                    *state.base_vars,
+                    constants.ROUTER_DATA,
+                    "dirty_vars",
+                    "dirty_substates",
+                )
+                if name in fields
+            },
+            fields.get("_backend_vars", {}),
+            {
+                attr: fields[attr]
+                for cvar in state.computed_vars.values()
+                for attr in (cvar._cache_attr, cvar._last_updated_attr)
+                if attr in fields
+            },
+            state_dict.get("__private_attribute_values__", {}),
+        )
+        serializer_id, compression_id, data = self._dumps(payload)
+        return (
+            self._header.pack(
+                self._magic,
+                self._format_version,
+                serializer_id,
+                compression_id,
+                _state_schema_fingerprint(type(state)),
+            )
+            + data
+        )
+
+    def decode(self, data: bytes, state_cls: Type[BaseState]) -> BaseState:
+        """Decode a state instance.
+
+        Args:
+            data: The encoded state.
+            state_cls: The class of the encoded state.
+
+        Returns:
+            The decoded state, without parent state or substates.
+        """
+        if data[: len(self._magic)] != self._magic:
+            # Entries in the legacy format are whole dill pickled instances.
+            return dill.loads(data)
+
+        _, format_version, serializer_id, compression_id, fingerprint = (
+            self._header.unpack_from(data)
+        )
+        self._check_format_version(format_version, state_cls)
+        base_vars, backend_vars, computed_var_cache, private_attrs = self._loads(
+            serializer_id, compression_id, memoryview(data)[self._header.size :]
+        )
+        if fingerprint != _state_schema_fingerprint(state_cls):
+            return self._migrate(state_cls, base_vars, backend_vars)
+        return self._build_state(
+            state_cls, base_vars, backend_vars, computed_var_cache, private_attrs
+        )
+
+    def encode_fields(
+        self, state: BaseState, var_names: set[str] | None = None
+    ) -> tuple[dict[str, bytes], list[str]]:
+        """Encode the vars of a state instance as separate fields.
+
+        Base vars, backend vars and computed var caches each get their own
+        field, so a state can be updated by writing only the modified vars.
+
+        Args:
+            state: The state to encode.
+            var_names: The names of the vars to encode, all vars if None.
+
+        Returns:
+            The encoded fields to set and the names of the fields to delete.
+        """
+        fields = state.__dict__
+        backend_vars = fields.get("_backend_vars", {})
+        if var_names is None:
+            var_names = {
+                *state.base_vars,
+                constants.ROUTER_DATA,
+                *backend_vars,
+                *state.computed_vars,
+            }
+
+        private_attrs = state.__getstate__().get("__private_attribute_values__", {})
+        encoded = {
+            "m:schema": self._fields_header.pack(
+                self._magic,
+                self._format_version,
+                _state_schema_fingerprint(type(state)),
+            ),
+            "m:dirty": self._encode_field(
+                (fields["dirty_vars"], fields["dirty_substates"])
+            ),
+            "m:private": self._encode_field(private_attrs),
+        }
+        deleted = []
+        for name in var_names:
+            if name in state.base_vars or name == constants.ROUTER_DATA:
+                encoded[f"v:{name}"] = self._encode_field(fields[name])
+            elif name in backend_vars:
+                encoded[f"b:{name}"] = self._encode_field(backend_vars[name])
+            elif name in state.computed_vars:
+                cvar = state.computed_vars[name]
+                for attr in (cvar._cache_attr, cvar._last_updated_attr):
+                    if attr in fields:
+                        encoded[f"c:{attr}"] = self._encode_field(fields[attr])
+                    else:
+                        deleted.append(f"c:{attr}")
+        return encoded, deleted
+
+    def decode_fields(
+        self, encoded: dict[bytes, bytes], state_cls: Type[BaseState]
+    ) -> BaseState:
+        """Decode a state instance from separately encoded fields.
+
+        Modifications of the decoded state are tracked, so that only the
+        modified vars are encoded when it is written back.
+
+        Args:
+            encoded: The encoded fields.
+            state_cls: The class of the encoded state.
+
+        Returns:
+            The decoded state, without parent state or substates.
+
+        Raises:
+            StateSerializationError: If the encoded fields have an unsupported format.
+        """
+        header = encoded.get(b"m:schema")
+        if header is None:
+            raise StateSerializationError(
+                f"Missing schema for state {state_cls.get_full_name()}."
+            )
+        _, format_version, fingerprint = self._fields_header.unpack(header)
+        self._check_format_version(format_version, state_cls)
+
+        base_vars, backend_vars, computed_var_cache = {}, {}, {}
+        for field, value in encoded.items():
+            kind, _, name = field.decode().partition(":")
+            if kind == "v":
+                base_vars[name] = self._decode_field(value)
+            elif kind == "b":
+                backend_vars[name] = self._decode_field(value)
+            elif kind == "c":
+                computed_var_cache[name] = self._decode_field(value)
+        if fingerprint != _state_schema_fingerprint(state_cls):
+            return self._migrate(state_cls, base_vars, backend_vars)
+
+        (
+            base_vars["dirty_vars"],
+            base_vars["dirty_substates"],
+        ) = self._decode_field(encoded[b"m:dirty"])
+        state = self._build_state(
+            state_cls,
+            base_vars,
+            backend_vars,
+            computed_var_cache,
+            self._decode_field(encoded[b"m:private"]),
+        )
+        state._unpersisted_vars = set()
+        return state
+
+    def _encode_field(self, value: Any) -> bytes:
+        """Encode a single field value.
+
+        Args:
+            value: The value to encode.
+
+        Returns:
+            The encoded value.
+        """
+        serializer_id, compression_id, data = self._dumps(value)
+        return self._field_header.pack(serializer_id, compression_id) + data
+
+    def _decode_field(self, data: bytes) -> Any:
+        """Decode a single field value.
+
+        Args:
+            data: The encoded value.
+
+        Returns:
+            The value.
+        """
+        serializer_id, compression_id = self._field_header.unpack_from(data)
+        return self._loads(
+            serializer_id, compression_id, memoryview(data)[self._field_header.size :]
+        )
+
+    def _check_format_version(self, format_version: int, state_cls: Type[BaseState]):
+        """Check that an encoded state has a supported format version.
+
+        Args:
+            format_version: The format version of the encoded state.
+            state_cls: The class of the encoded state.
+
+        Raises:
+            StateSerializationError: If the format version is not supported.
+        """
+        if format_version != self._format_version:
+            raise StateSerializationError(
+                f"Unsupported format version {format_version} for state {state_cls.get_full_name()}."
+            )
+
+    @staticmethod
+    def _build_state(
+        state_cls: Type[BaseState],
+        base_vars: dict[str, Any],
+        backend_vars: dict[str, Any],
+        computed_var_cache: dict[str, Any],
+        private_attrs: dict[str, Any],
+    ) -> BaseState:
+        """Create a state instance from its decoded vars without validation.
+
+        Args:
+            state_cls: The class of the state.
+            base_vars: The base vars (including router data and dirty vars).
+            backend_vars: The backend vars.
+            computed_var_cache: The cached values of the computed vars.
+            private_attrs: The pydantic private attributes.
+
+        Returns:
+            The state, without parent state or substates.
+        """
+        state = state_cls.__new__(state_cls)
+        state.__setstate__(
+            {
+                "__dict__": {
+                    "parent_state": None,
+                    "substates": {},
+                    **base_vars,
+                    "_backend_vars": backend_vars,
+                    **computed_var_cache,
+                },
+                "__fields_set__": set(base_vars),
+                "__private_attribute_values__": private_attrs,
+            }
+        )
+        return state
+
+    @staticmethod
+    def _migrate(
+        state_cls: Type[BaseState],
+        base_vars: dict[str, Any],
+        backend_vars: dict[str, Any],
+    ) -> BaseState:
+        """Create a state from vars persisted with a different schema of its class.
+
+        Vars that still exist and validate against their current type are kept,
+        everything else starts from its default value. Dirty vars are dropped.
+
+        Args:
+            state_cls: The (current) class of the state.
+            base_vars: The persisted base vars.
+            backend_vars: The persisted backend vars.
+
+        Returns:
+            The migrated state.
+        """
+        state = state_cls(init_substates=False, _reflex_internal_init=True)
+        fields = state_cls.get_fields()
+        for name, value in base_vars.items():
+            if name not in state_cls.base_vars and name != constants.ROUTER_DATA:
+                # Removed vars and the dirty vars of the old schema are dropped.
+                continue
+            value, errors = fields[name].validate(value, {}, loc=name, cls=state_cls)  # type: ignore
+            if not errors:
+                state.__dict__[name] = value
+        for name, value in backend_vars.items():
+            if name in state_cls.backend_vars:
+                state._backend_vars[name] = value
+        # Persist the state with the current schema on the next write.
+        state._was_touched = True
+        return state
+
+
+class DillStateCodec(PickleStateCodec):
+    """Encode whole state instances with dill (the legacy format)."""
+
+    def encode(self, state: BaseState) -> bytes:
+        """Encode a state instance.
+
+        Args:
+            state: The state to encode.
+
+        Returns:
+            The encoded state.
+        """
+        return dill.dumps(state, byref=True)
+
+
+def _default_state_codec() -> StateCodec:
+    """Get the state codec configured for the app.
+
+    Returns:
+        The default state codec.
+    """
+    config = get_config()
+    if config.state_serializer == constants.StateSerializer.DILL:
+        return DillStateCodec()
+    return PickleStateCodec(compression=config.state_compression)
+
+
+class StateCacheInfo(Base):
+    """Statistics of the per-worker state cache of a StateManagerRedis."""
+
+    # The number of substates reused from the cache.
+    hits: int = 0
+
+    # The number of substates that had to be fetched from redis.
+    misses: int = 0
+
+    # The maximum number of cached substates.
+    max_size: int = 0
+
+    # The current number of cached substates.
+    size: int = 0
+
+
+class StateManagerPersistent(StateManager):
+    """A state manager that persists each substate separately, outside of the process.
+
+    Only the substates required to process an event are fetched, and only the
+    substates touched while processing it are written back. Access to the state
+    of a token is serialized across processes by a lock with lock_expiration.
+    """
+
+    # The token expiration time (s).
+    token_expiration: int = pydantic.Field(default_factory=_default_token_expiration)
+
+    # The maximum time to hold a lock (ms).
+    lock_expiration: int = pydantic.Field(default_factory=_default_lock_expiration)
+
+    # The codec used to encode and decode the persisted substates.
+    codec: StateCodec = pydantic.Field(default_factory=_default_state_codec)
+
+    # Only warn about each state class size once.
+    _warned_about_state_size: ClassVar[Set[str]] = set()
+
+    def _get_required_state_classes(
+        self,
+        target_state_cls: Type[BaseState],
+        subclasses: bool = False,
+        required_state_classes: set[Type[BaseState]] | None = None,
+    ) -> set[Type[BaseState]]:
+        """Recursively determine which states are required to fetch the target state.
+
+        This will always include the parent states of the target state and any
+        potentially dirty substates that depend on vars in the required states.
+
+        Args:
+            target_state_cls: The target state class being fetched.
+            subclasses: Whether to include all subclasses of the target state.
+            required_state_classes: Recursive argument tracking state classes that have already been seen.
+
+        Returns:
+            The set of state classes required to fetch the target state.
+        """
+        if required_state_classes is None:
+            required_state_classes = set()
+        # Get the substates if requested.
+        if subclasses:
+            for substate in target_state_cls.get_substates():
+                self._get_required_state_classes(
+                    substate,
+                    subclasses=True,
+                    required_state_classes=required_state_classes,
+                )
+        if target_state_cls in required_state_classes:
+            return required_state_classes
+        required_state_classes.add(target_state_cls)
+
+        # Get dependent substates.
+        for pd_substate in target_state_cls._potentially_dirty_substates():
+            self._get_required_state_classes(
+                pd_substate,
+                subclasses=False,
+                required_state_classes=required_state_classes,
+            )
+
+        # Get the parent state if it exists.
+        parent_state = target_state_cls.get_parent_state()
+        if parent_state is not None:
+            self._get_required_state_classes(
+                parent_state,
+                subclasses=False,
+                required_state_classes=required_state_classes,
+            )
+        return required_state_classes
+
+    def _get_populated_states(
+        self,
+        target_state: BaseState,
+        populated_states: dict[str, BaseState] | None = None,
+    ) -> dict[str, BaseState]:
+        """Recursively determine which states from target_state are already fetched.
+
+        Args:
+            target_state: The state to check for populated states.
+            populated_states: Recursive argument tracking states seen in previous calls.
+
+        Returns:
+            A dictionary of state full name to state instance.
+        """
+        if populated_states is None:
+            populated_states = {}
+        if target_state.get_full_name() in populated_states:
+            return populated_states
+
+        populated_states[target_state.get_full_name()] = target_state
+
+        for substate in target_state.substates.values():
+            self._get_populated_states(substate, populated_states=populated_states)
+
+        if target_state.parent_state is not None:
+            self._get_populated_states(
+                target_state.parent_state, populated_states=populated_states
+            )
+        return populated_states
+
+    @override
+    async def get_state(
+        self,
+        token: str,
+        top_level: bool = True,
+        get_substates: bool = True,
+        for_state_instance: BaseState | None = None,
+    ) -> BaseState:
+        """Get the state for a token.
+
+        All substates required to process an event for the requested state are
+        determined from the class tree up front and fetched in a single round
+        trip, then linked together in memory.
+
+        Args:
+            token: The token to get the state for.
+            top_level: If true, return an instance of the top-level state (self.state).
+            get_substates: If true, also retrieve substates.
+            for_state_instance: If provided, re-use the state tree this instance is linked into instead of fetching the already populated states again.
+
+        Returns:
+            The state for the token.
+
+        Raises:
+            RuntimeError: when the state_cls is not specified in the token
+        """
+        # Split the actual token from the fully qualified substate name.
+        client_token, state_path = _split_substate_key(token)
+        if state_path:
+            # Get the State class associated with the given path.
+            state_cls = self.state.get_class_substate(state_path)
+        else:
+            raise RuntimeError(
+                f"{type(self).__name__} requires token to be specified in the form of {{token}}_{{state_full_name}}"
+            )
+
+        # Determine which states we already have.
+        flat_state_tree: dict[str, BaseState] = (
+            self._get_populated_states(for_state_instance)
+            if for_state_instance is not None
+            else {}
+        )
+
+        # Determine which states from the tree need to be fetched. Sorting by full
+        # name guarantees that each parent is linked before its substates.
+        required_state_classes = sorted(
+            self._get_required_state_classes(state_cls, subclasses=get_substates)
+            - {type(s) for s in flat_state_tree.values()},
+            key=lambda x: x.get_full_name(),
+        )
+
+        # Fetch all of the serialized substates in one round trip.
+        fetched_states = await self._fetch_states(client_token, required_state_classes)
+
+        for required_state_cls, (version, persisted_state) in zip(
+            required_state_classes, fetched_states
+        ):
+            parent_state_name = required_state_cls.get_full_name().rpartition(".")[0]
+            required_parent_state = (
+                flat_state_tree[parent_state_name] if parent_state_name else None
+            )
+            state = None
+            if isinstance(persisted_state, BaseState):
+                # Reuse the cached substate, it is linked into the new tree below.
+                state = persisted_state
+                state.parent_state = None
+                state.substates = {}
+            elif persisted_state is not None:
+                # Deserialize the substate.
+                try:
+                    if isinstance(persisted_state, dict):
+                        state = self.codec.decode_fields(
+                            persisted_state, required_state_cls
+                        )
+                    else:
+                        state = self.codec.decode(persisted_state, required_state_cls)
+                except StateSerializationError as sse:
+                    console.warn(f"Discarding persisted state: {sse}")
+            if state is None:
+                # Key didn't exist so we have to create a new instance for this token.
+                # (but don't persist it yet).
+                state = required_state_cls(
+                    parent_state=required_parent_state,
+                    init_substates=False,
+                    _reflex_internal_init=True,
+                )
+            elif version is not None:
+                state._persisted_version = version
+            flat_state_tree[state.get_full_name()] = state
+            # Set up Bidirectional linkage between this state and its parent.
+            if required_parent_state is not None:
+                required_parent_state.substates[state.get_name()] = state
+                state.parent_state = required_parent_state
+
+        state = flat_state_tree[state_cls.get_full_name()]
+        # To retain compatibility with previous implementation, by default, we return
+        # the top-level state by chasing `parent_state` pointers up the tree.
+        if top_level:
+            return state._get_root_state()
+        return state
+
+    @abstractmethod
+    async def _fetch_states(
+        self,
+        client_token: str,
+        required_state_classes: list[Type[BaseState]],
+    ) -> list[tuple[str | None, BaseState | bytes | dict[bytes, bytes] | None]]:
+        """Fetch the persisted substates of a token.
+
+        Args:
+            client_token: The client token.
+            required_state_classes: The substate classes to fetch.
+
+        Returns:
+            The version (if known) and the reusable instance, serialized substate
+            (fields) or None (if not persisted) for each class.
+        """
+        pass
+
+    def _storage_key(
+        self, client_token: str, state: BaseState | Type[BaseState]
+    ) -> str:
+        """Get the key storing a substate.
+
+        Args:
+            client_token: The client token.
+            state: The state instance or class.
+
+        Returns:
+            The key for the substate.
+        """
+        return _substate_key(client_token, state)
+
+    def _get_keyed_states(self, token: str, state: BaseState) -> dict[str, BaseState]:
+        """Collect the given state and its known substates by storage key.
+
+        Args:
+            token: The token the state is set for.
+            state: The state to set.
+
+        Returns:
+            The state instances by storage key.
+
+        Raises:
+            RuntimeError: If the state instance doesn't match the state name in the token.
+        """
+        client_token, substate_name = _split_substate_key(token)
+        # If the substate name on the token doesn't match the instance name, it cannot have a parent.
+        if state.parent_state is not None and state.get_full_name() != substate_name:
+            raise RuntimeError(
+                f"Cannot `set_state` with mismatching token {token} and substate {state.get_full_name()}."
+            )
+        return {
+            self._storage_key(client_token, known_state): known_state
+            for known_state in self._get_known_states(state)
+        }
+
+    def _warn_if_too_large(
+        self,
+        state: BaseState,
+        pickle_state_size: int,
+    ):
+        """Print a warning when the state is too large.
+
+        Args:
+            state: The state to check.
+            pickle_state_size: The size of the pickled state.
+        """
+        state_full_name = state.get_full_name()
+        if (
+            state_full_name not in self._warned_about_state_size
+            and pickle_state_size > TOO_LARGE_SERIALIZED_STATE
+            and state.substates
+        ):
+            console.warn(
+                f"State {state_full_name} serializes to {pickle_state_size} bytes "
+                "which may present performance issues. Consider reducing the size of this state."
+            )
+            self._warned_about_state_size.add(state_full_name)
+
+    @staticmethod
+    def _get_known_states(state: BaseState) -> list[BaseState]:
+        """Recursively collect the given state and its known substates.
+
+        Args:
+            state: The state to start from.
+
+        Returns:
+            The state instances.
+        """
+        known_states = [state]
+        for substate in state.substates.values():
+            known_states.extend(StateManagerPersistent._get_known_states(substate))
+        return known_states
+
+    def _lock_expired_error(self, token: str) -> LockExpiredError:
+        """Get the error raised when the lock expired while processing an event.
+
+        Args:
+            token: The token the lock was held for.
+
+        Returns:
+            The error to raise.
+        """
+        return LockExpiredError(
+            f"Lock expired for token {token} while processing. Consider increasing "
+            f"`app.state_manager.lock_expiration` (currently {self.lock_expiration}) "
+            "or use `@rx.background` decorator for long-running tasks."
+        )
+
+    @override
+    @contextlib.asynccontextmanager
+    async def modify_state(self, token: str) -> AsyncIterator[BaseState]:
+        """Modify the state for a token while holding exclusive lock.
+
+        Args:
+            token: The token to modify the state for.
+
+        Yields:
+            The state for the token.
+        """
+        async with self._lock(token) as lock_id:
+            state = await self.get_state(token)
+            yield state
+            await self.set_state(token, state, lock_id)
+
+    @override
+    @contextlib.asynccontextmanager
+    async def read_state(self, token: str) -> AsyncIterator[BaseState]:
+        """Read the state for a token.
+
+        The lock is only held while fetching the state, so the state is
+        consistent but other events may modify the persisted state while it
+        is being read.
+
+        Args:
+            token: The token to read the state for.
+
+        Yields:
+            The state for the token.
+        """
+        async with self._lock(token):
+            state = await self.get_state(token)
+        yield state
+
+    @abstractmethod
+    @contextlib.asynccontextmanager
+    async def _lock(self, token: str) -> AsyncIterator[bytes]:
+        """Obtain the lock for a token.
+
+        Args:
+            token: The token to obtain a lock for.
+
+        Yields:
+            The ID of the lock (to be passed to set_state).
+        """
+        yield b""
+
+
+class StateManagerRedis(StateManagerPersistent):
+    """A state manager that stores states in redis.
+
+    With a cache_size, each worker keeps the most recently used substates it
+    has deserialized or written. Every write stores a new random version next
+    to the substate, and a cached substate is only reused while its version is
+    current, so the cache stays correct when events for a token are handled by
+    different workers. A cached instance is handed out to one caller at a time
+    and returned to the cache when it is written back.
+
+    With cluster_hash_tags, all keys of a token share a hash tag, so that the lua
+    scripts accessing the lock and the substates of a token together also work on
+    Redis Cluster.
+    """
+
+    # The redis client to use.
+    redis: Redis
+
+    # The maximum number of deserialized substates cached by this worker (0 disables the cache).
+    # Versions are only stored when the cache is enabled, so all workers must enable it.
+    cache_size: int = pydantic.Field(default_factory=_default_cache_size)
+
+    # How the substates are stored (the hash layout requires a codec supporting encode_fields).
+    layout: constants.StateLayout = pydantic.Field(
+        default_factory=_default_state_layout
+    )
+
+    # Whether the keys of a token start with the client token as a {hash tag}.
+    # This changes the key names, so all workers must agree on it.
+    cluster_hash_tags: bool = pydantic.Field(default_factory=_default_cluster_hash_tags)
+
+    # The keyspace subscription string when redis is waiting for lock to be released
+    _redis_notify_keyspace_events: str = (
+        "K"  # Enable keyspace notifications (target a particular key)
+        "g"  # For generic commands (DEL, EXPIRE, etc)
+        "x"  # For expired events
+        "e"  # For evicted events (i.e. maxmemory exceeded)
+    )
+
+    # The prefix of the keyspace notification channels (for db 0)
+    _redis_keyspace_prefix: ClassVar[str] = "__keyspace@0__:"
+
+    # These events indicate that a lock is no longer held
+    _redis_keyspace_lock_release_events: Set[bytes] = {
+        b"del",
+        b"expire",
+        b"expired",
+        b"evicted",
+    }
+
+    # Atomically check that the lock (KEYS[1]) is still held by ARGV[1] and
+    # write each serialized substate (KEYS[2:]) from ARGV[4:] with ARGV[2] expiration.
+    # The version ARGV[3] is stored next to each substate, unless it is empty.
+    _redis_set_state_lua: ClassVar[str] = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return false
+end
+for i = 2, #KEYS do
+    redis.call('SET', KEYS[i], ARGV[i + 2], 'EX', ARGV[2])
+    if ARGV[3] ~= '' then
+        redis.call('SET', KEYS[i] .. ':version', ARGV[3], 'EX', ARGV[2])
+    end
+end
+return true
+"""
+
+    # Like _redis_set_state_lua for the hash layout, where ARGV[4:] holds for each
+    # substate whether to replace the hash, the number of fields to set, the fields
+    # and values to set, the number of fields to delete and the fields to delete.
+    # The lock check is skipped when ARGV[1] is empty.
+    _redis_set_state_hash_lua: ClassVar[str] = """
+if ARGV[1] ~= '' and redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return false
+end
+local arg = 4
+for i = 2, #KEYS do
+    if ARGV[arg] == '1' then
+        redis.call('DEL', KEYS[i])
+    end
+    local n_set = tonumber(ARGV[arg + 1])
+    redis.call('HSET', KEYS[i], unpack(ARGV, arg + 2, arg + 1 + 2 * n_set))
+    arg = arg + 2 + 2 * n_set
+    local n_del = tonumber(ARGV[arg])
+    if n_del > 0 then
+        redis.call('HDEL', KEYS[i], unpack(ARGV, arg + 1, arg + n_del))
+    end
+    arg = arg + 1 + n_del
+    redis.call('EXPIRE', KEYS[i], ARGV[2])
+    if ARGV[3] ~= '' then
+        redis.call('SET', KEYS[i] .. ':version', ARGV[3], 'EX', ARGV[2])
+    end
+end
+return true
+"""
+
+    # Return the version of each substate (KEYS) followed by its value read with
+    # the ARGV[1] command, or false instead of the value when the version matches
+    # the cached one (ARGV[2:]). Both are false for missing substates.
+    _redis_get_state_lua: ClassVar[str] = """
+local result = {}
+for i = 1, #KEYS do
+    local version = false
+    local value = false
+    if redis.call('EXISTS', KEYS[i]) == 1 then
+        version = redis.call('GET', KEYS[i] .. ':version')
+        if not version or version ~= ARGV[i + 1] then
+            value = redis.call(ARGV[1], KEYS[i])
+        end
+    end
+    result[2 * i - 1] = version
+    result[2 * i] = value
+end
+return result
+"""
+
+    # The registered lua scripts for set_state and get_state, created on first use.
+    _redis_set_state_script: Optional[AsyncScript] = pydantic.PrivateAttr(None)
+    _redis_set_state_hash_script: Optional[AsyncScript] = pydantic.PrivateAttr(None)
+    _redis_get_state_script: Optional[AsyncScript] = pydantic.PrivateAttr(None)
+
+    # The cached substates (version and instance) by substate key, least recently used first.
+    _state_cache: OrderedDict[str, tuple[str, BaseState]] = pydantic.PrivateAttr(
+        default_factory=OrderedDict
+    )
+
+    # The number of cache hits and misses.
+    _cache_hits: int = pydantic.PrivateAttr(0)
+    _cache_misses: int = pydantic.PrivateAttr(0)
+
+    # The local waiters for each contended lock, in FIFO order.
+    _lock_waiters: Dict[bytes, Deque[asyncio.Event]] = pydantic.PrivateAttr(
+        default_factory=dict
+    )
+
+    # The task listening for lock releases and the future resolved once it is subscribed.
+    _lock_listener: Optional[asyncio.Task] = pydantic.PrivateAttr(None)
+    _lock_listener_subscribed: Optional[asyncio.Future] = pydantic.PrivateAttr(None)
+
+    @override
+    async def _fetch_states(
+        self,
+        client_token: str,
+        required_state_classes: list[Type[BaseState]],
+    ) -> list[tuple[str | None, BaseState | bytes | dict[bytes, bytes] | None]]:
+        """Fetch the persisted substates of a token from redis in one round trip.
+
+        Args:
+            client_token: The client token.
+            required_state_classes: The substate classes to fetch.
+
+        Returns:
+            The version (if known) and the cached instance, serialized substate
+            (fields) or None (if not persisted) for each class.
+        """
+        keys = [self._storage_key(client_token, cls) for cls in required_state_classes]
+        if self.cache_size > 0:
+            return await self._get_cached_states(keys)
+        redis_pipeline = self.redis.pipeline(transaction=False)
+        for key in keys:
+            if self.layout == constants.StateLayout.HASH:
+                redis_pipeline.hgetall(key)
+            else:
+                redis_pipeline.get(key)
+        return [
+            # A missing hash is returned as an empty dict.
+            (None, redis_state or None)
+            for redis_state in await redis_pipeline.execute()
+        ]
+
+    @override
+    def _storage_key(
+        self, client_token: str, state: BaseState | Type[BaseState]
+    ) -> str:
+        """Get the redis key storing a substate in the configured layout.
+
+        Args:
+            client_token: The client token.
+            state: The state instance or class.
+
+        Returns:
+            The redis key for the substate.
+        """
+        key = _substate_key(self._hash_tag(client_token), state)
+        if self.layout == constants.StateLayout.HASH:
+            # Keep hashes apart from values stored with the string layout.
+            return f"{key}:fields"
+        return key
+
+    async def _get_cached_states(
+        self, keys: list[str]
+    ) -> list[tuple[str | None, BaseState | bytes | dict[bytes, bytes] | None]]:
+        """Fetch substates from redis, skipping those with a current cached instance.
+
+        Cached instances are removed from the cache until they are written back.
+
+        Args:
+            keys: The substate keys to fetch.
+
+        Returns:
+            The version and the cached instance or serialized substate (fields) for each key.
+        """
+        cached_states = [self._state_cache.pop(key, None) for key in keys]
+        if self._redis_get_state_script is None:
+            self._redis_get_state_script = self.redis.register_script(
+                self._redis_get_state_lua
+            )
+        hash_layout = self.layout == constants.StateLayout.HASH
+        result = await self._redis_get_state_script(
+            keys=keys,
+            args=[
+                "HGETALL" if hash_layout else "GET",
+                *(cached[0] if cached else "" for cached in cached_states),
+            ],
+        )
+
+        fetched_states = []
+        for i, cached in enumerate(cached_states):
+            version = result[2 * i].decode() if result[2 * i] is not None else None
+            if cached is not None and cached[0] == version:
+                self._cache_hits += 1
+                fetched_states.append((version, cached[1]))
+            else:
+                self._cache_misses += 1
+                redis_state = result[2 * i + 1]
+                if hash_layout and redis_state is not None:
+                    redis_state = dict(zip(redis_state[::2], redis_state[1::2]))
+                fetched_states.append((version, redis_state))
+        return fetched_states
+
+    def _cache_states(self, states: dict[str, BaseState]):
+        """Return substates with a known version to the cache.
+
+        Args:
+            states: The substates by substate key.
+        """
+        for key, state in states.items():
+            if state._persisted_version is None:
+                continue
+            # Only persist the state again if it is modified by a later event.
+            state._was_touched = False
+            self._state_cache[key] = (state._persisted_version, state)
+            self._state_cache.move_to_end(key)
+        while len(self._state_cache) > self.cache_size:
+            self._state_cache.popitem(last=False)
+
+    @override
+    @contextlib.asynccontextmanager
+    async def read_state(self, token: str) -> AsyncIterator[BaseState]:
+        """Read the state for a token, returning the substates to the cache afterwards.
+
+        Args:
+            token: The token to read the state for.
+
+        Yields:
+            The state for the token.
+        """
+        async with super().read_state(token) as state:
+            yield state
+        if self.cache_size > 0:
+            # Substates cached by a writer in the meantime are more recent.
+            self._cache_states(
+                {
+                    key: known_state
+                    for key, known_state in self._get_keyed_states(token, state).items()
+                    if key not in self._state_cache
+                }
+            )
+
+    def cache_info(self) -> StateCacheInfo:
+        """Get the statistics of the per-worker state cache.
+
+        Returns:
+            The cache statistics.
+        """
+        return StateCacheInfo(
+            hits=self._cache_hits,
+            misses=self._cache_misses,
+            max_size=self.cache_size,
+            size=len(self._state_cache),
+        )
+
+    @override
+    async def set_state(
+        self,
+        token: str,
+        state: BaseState,
+        lock_id: bytes | None = None,
+    ):
+        """Set the state for a token.
+
+        When lock_id is provided, the lock check and the writes for all touched
+        substates are performed atomically in a single round trip.
+
+        Args:
+            token: The token to set the state for.
+            state: The state to set.
+            lock_id: If provided, the lock_key must be set to this value to set the state.
+
+        Raises:
+            LockExpiredError: If lock_id is provided and the lock for the token is not held by that ID.
+        """
+        known_states = self._get_keyed_states(token, state)
+        # Only the given state and known substates that were touched are persisted.
+        touched_states = {
+            key: known_state
+            for key, known_state in known_states.items()
+            if known_state._get_was_touched()
+        }
+
+        # A random version never repeats, even after the version key expired.
+        version = uuid.uuid4().hex if self.cache_size > 0 else None
+        if self.layout == constants.StateLayout.HASH:
+            written = await self._set_hash_states(
+                token, touched_states, lock_id, version
+            )
+        else:
+            written = await self._set_string_states(
+                token, touched_states, lock_id, version
+            )
+        if not written:
+            raise self._lock_expired_error(token)
+
+        for touched_state in touched_states.values():
+            touched_state._persisted_version = version
+            if self.layout == constants.StateLayout.HASH:
+                # All vars are persisted now, track the modifications from here.
+                touched_state._unpersisted_vars = set()
+        if self.cache_size > 0:
+            self._cache_states(known_states)
+
+    async def _set_string_states(
+        self,
+        token: str,
+        touched_states: dict[str, BaseState],
+        lock_id: bytes | None,
+        version: str | None,
+    ) -> bool:
+        """Write each touched substate as a single serialized value.
+
+        Args:
+            token: The token to set the state for.
+            touched_states: The touched substates by redis key.
+            lock_id: If provided, the lock_key must be set to this value to set the state.
+            version: The version to store next to the substates (None when not caching).
+
+        Returns:
+            False if the lock is not held by lock_id.
+        """
+        # Serialize the touched states (parents or substates are excluded by BaseState.__getstate__).
+        serialized_states = {}
+        for key, touched_state in touched_states.items():
+            pickle_state = self.codec.encode(touched_state)
+            self._warn_if_too_large(touched_state, len(pickle_state))
+            serialized_states[key] = pickle_state
+
+        if lock_id is None:
+            if not serialized_states:
+                return True
+            redis_pipeline = self.redis.pipeline()
+            for key, pickle_state in serialized_states.items():
+                redis_pipeline.set(key, pickle_state, ex=self.token_expiration)
+                if version is not None:
+                    redis_pipeline.set(
+                        f"{key}:version", version, ex=self.token_expiration
+                    )
+            await redis_pipeline.execute()
+            return True
+
+        # Check that we're holding the lock and persist all substates in one atomic step.
+        if self._redis_set_state_script is None:
+            self._redis_set_state_script = self.redis.register_script(
+                self._redis_set_state_lua
+            )
+        return bool(
+            await self._redis_set_state_script(
+                keys=[self._lock_key(token), *serialized_states],
+                args=[
+                    lock_id,
+                    self.token_expiration,
+                    version or "",
+                    *serialized_states.values(),
+                ],
+            )
+        )
+
+    async def _set_hash_states(
+        self,
+        token: str,
+        touched_states: dict[str, BaseState],
+        lock_id: bytes | None,
+        version: str | None,
+    ) -> bool:
+        """Write the modified vars of each touched substate as hash fields.
+
+        Substates without tracked modifications (e.g. new instances) replace the whole hash.
+
+        Args:
+            token: The token to set the state for.
+            touched_states: The touched substates by redis key.
+            lock_id: If provided, the lock_key must be set to this value to set the state.
+            version: The version to store next to the substates (None when not caching).
+
+        Returns:
+            False if the lock is not held by lock_id.
+        """
+        if lock_id is None and not touched_states:
+            return True
+
+        args = []
+        for touched_state in touched_states.values():
+            unpersisted_vars = touched_state._unpersisted_vars
+            encoded, deleted = self.codec.encode_fields(touched_state, unpersisted_vars)
+            if unpersisted_vars is None:
+                self._warn_if_too_large(
+                    touched_state, sum(len(value) for value in encoded.values())
+                )
+            args.extend(
+                (
+                    "1" if unpersisted_vars is None else "0",
+                    len(encoded),
+                    *itertools.chain.from_iterable(encoded.items()),
+                    len(deleted),
+                    *deleted,
+                )
+            )
+
+        # Check that we're holding the lock (if any) and persist all substates in one atomic step.
+        if self._redis_set_state_hash_script is None:
+            self._redis_set_state_hash_script = self.redis.register_script(
+                self._redis_set_state_hash_lua
+            )
+        return bool(
+            await self._redis_set_state_hash_script(
+                keys=[self._lock_key(token), *touched_states],
+                args=[lock_id or "", self.token_expiration, version or "", *args],
+            )
+        )
+
+    def _hash_tag(self, client_token: str) -> str:
+        """Get the prefix of the keys of a token.
+
+        On Redis Cluster, keys with the same hash tag are stored in the same
+        slot, so the lua scripts can access the lock and all substates of a token.
+
+        Args:
+            client_token: The client token.
+
+        Returns:
+            The client token as a hash tag if cluster_hash_tags is enabled, else
+            the client token.
+        """
+        if self.cluster_hash_tags:
+            return f"{{{client_token}}}"
+        return client_token
+
+    def _lock_key(self, token: str) -> bytes:
+        """Get the redis key for a token's lock.
+
+        Args:
+            token: The token to get the lock key for.
+
+        Returns:
+            The redis lock key for the token.
+        """
+        # All substates share the same lock domain, so ignore any substate path suffix.
+        client_token = _split_substate_key(token)[0]
+        return f"{self._hash_tag(client_token)}_lock".encode()
+
+    async def _try_get_lock(self, lock_key: bytes, lock_id: bytes) -> bool | None:
+        """Try to get a redis lock for a token.
+
+        Args:
+            lock_key: The redis key for the lock.
+            lock_id: The ID of the lock.
+
+        Returns:
+            True if the lock was obtained.
+        """
+        return await self.redis.set(
+            lock_key,
+            lock_id,
+            px=self.lock_expiration,
+            nx=True,  # only set if it doesn't exist
+        )
+
+    async def _wait_lock(self, lock_key: bytes, lock_id: bytes) -> None:
+        """Wait for a redis lock to be released via pubsub.
+
+        Local waiters for the same lock queue up in FIFO order and only the
+        waiter at the head of the queue tries to get the lock, woken up by the
+        shared keyspace listener when the lock is released (or when
+        lock_expiration passes without a notification).
+
+        Coroutine will not return until the lock is obtained.
+
+        Args:
+            lock_key: The redis key for the lock.
+            lock_id: The ID of the lock.
+        """
+        await self._ensure_lock_listener()
+        waiter = asyncio.Event()
+        waiters = self._lock_waiters.setdefault(lock_key, deque())
+        waiters.append(waiter)
+        try:
+            while True:
+                if waiters[0] is waiter:
+                    # Clear before trying, so a release right after a failed attempt is not missed.
+                    waiter.clear()
+                    if await self._try_get_lock(lock_key, lock_id):
+                        return
+                # The lock may also expire without a notification reaching us.
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(
+                        waiter.wait(), timeout=self.lock_expiration / 1000.0
+                    )
+        finally:
+            waiters.remove(waiter)
+            if waiters:
+                # Let the next local waiter try to get the lock.
+                waiters[0].set()
+            else:
+                self._lock_waiters.pop(lock_key, None)
+
+    async def _ensure_lock_listener(self) -> None:
+        """Start the keyspace listener for lock releases, if it is not running.
+
+        The listener is shared by all waiters of this state manager and keyspace
+        notifications are only configured when it starts.
+        """
+        listener = self._lock_listener
+        if (
+            listener is None
+            or listener.done()
+            or listener.get_loop() is not asyncio.get_running_loop()
+        ):
+            subscribed = asyncio.get_running_loop().create_future()
+            self._lock_listener = asyncio.create_task(
+                self._listen_lock_releases(subscribed)
+            )
+            self._lock_listener_subscribed = subscribed
+        await asyncio.shield(self._lock_listener_subscribed)
+
+    async def _listen_lock_releases(self, subscribed: asyncio.Future) -> None:
+        """Wake up the first local waiter of each lock that is released.
+
+        Args:
+            subscribed: Resolved once the listener is subscribed to the lock keys.
+
+        Raises:
+            ResponseError: when the keyspace config cannot be set.
+        """
+        try:
+            # Enable keyspace notifications for the lock keys, so we know when they are available.
+            try:
+                await self.redis.config_set(
+                    "notify-keyspace-events",
+                    self._redis_notify_keyspace_events,
+                )
+            except ResponseError:
+                # Some redis servers only allow out-of-band configuration, so ignore errors here.
+                ignore_config_error = os.environ.get(
+                    "REFLEX_IGNORE_REDIS_CONFIG_ERROR",
+                    None,
+                )
+                if not ignore_config_error:
+                    raise
+            async with self.redis.pubsub() as pubsub:
+                await pubsub.psubscribe(f"{self._redis_keyspace_prefix}*_lock")
+                subscribed.set_result(None)
+                async for message in pubsub.listen():
+                    if (
+                        message["type"] != "pmessage"
+                        or message["data"]
+                        not in self._redis_keyspace_lock_release_events
+                    ):
+                        continue
+                    lock_key = message["channel"][len(self._redis_keyspace_prefix) :]
+                    waiters = self._lock_waiters.get(lock_key)
+                    if waiters:
+                        waiters[0].set()
+        except Exception as e:
+            if subscribed.done():
+                raise
+            # Report errors during startup to the waiters.
+            subscribed.set_exception(e)
+        finally:
+            if not subscribed.done():
+                subscribed.cancel()
+
+    @override
+    @contextlib.asynccontextmanager
+    async def _lock(self, token: str) -> AsyncIterator[bytes]:
+        """Obtain a redis lock for a token.
+
+        Args:
+            token: The token to obtain a lock for.
+
+        Yields:
+            The ID of the lock (to be passed to set_state).
+
+        Raises:
+            LockExpiredError: If the lock has expired while processing the event.
+        """
+        lock_key = self._lock_key(token)
+        lock_id = uuid.uuid4().hex.encode()
+
+        # Queue up behind local waiters instead of overtaking them on the fast-path.
+        if self._lock_waiters.get(lock_key) or not await self._try_get_lock(
+            lock_key, lock_id
+        ):
+            # Missed the fast-path to get lock, subscribe for lock delete/expire events
+            await self._wait_lock(lock_key, lock_id)
+        state_is_locked = True
+
+        try:
+            yield lock_id
+        except LockExpiredError:
+            state_is_locked = False
+            raise
+        finally:
+            if state_is_locked:
+                # only delete our lock
+                await self.redis.delete(lock_key)
+
+    async def close(self):
+        """Explicitly close the redis connection and connection_pool.
+
+        It is necessary in testing scenarios to close between asyncio test cases
+        to avoid having lingering redis connections associated with event loops
+        that will be closed (each test case uses its own event loop).
+
+        Note: Connections will be automatically reopened when needed.
+        """
+        listener, self._lock_listener = self._lock_listener, None
+        if listener is not None and listener.get_loop() is asyncio.get_running_loop():
+            listener.cancel()
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await listener
+        await self.redis.aclose(close_connection_pool=True)
 
 
-def _default_token_expiration() -> int:
-    """Get the default token expiration time.
+class StateManagerDisk(StateManagerPersistent):
+    """A state manager that stores states in a local SQLite database.
 
-    Returns:
-        The default token expiration time.
+    Each substate is a row of a memory-mapped database file shared by all
+    worker processes of the host. The lock for a token is a row with an
+    expiration time, so a lock held by a crashed worker is released after
+    lock_expiration. Database calls are run in the default executor.
     """
-    return get_config().redis_token_expiration
 
+    # The path of the database file.
+    path: Path = pydantic.Field(default_factory=_default_disk_state_path)
 
-class StateManagerRedis(StateManager):
-    """A state manager that stores states in redis."""
+    # The size of the memory-mapped region of the database file (bytes).
+    mmap_size: int = 256 * 1024 * 1024
 
-    # The redis client to use.
-    redis: Redis
+    # The interval between two attempts to get a contended lock grows up to this value (s).
+    _max_lock_poll_interval: ClassVar[float] = 0.1
 
-    # The token expiration time (s).
-    token_expiration: int = pydantic.Field(default_factory=_default_token_expiration)
+    # The minimum interval between two purges of expired states and locks (s).
+    _purge_interval: ClassVar[float] = 60.0
 
-    # The maximum time to hold a lock (ms).
-    lock_expiration: int = pydantic.Field(default_factory=_default_lock_expiration)
+    # The maximum number of keys bound in a single query.
+    _max_query_keys: ClassVar[int] = 500
 
-    # The keyspace subscription string when redis is waiting for lock to be released
-    _redis_notify_keyspace_events: str = (
-        "K"  # Enable keyspace notifications (target a particular key)
-        "g"  # For generic commands (DEL, EXPIRE, etc)
-        "x"  # For expired events
-        "e"  # For evicted events (i.e. maxmemory exceeded)
-    )
+    # The tables of the substates and of the locks.
+    _schema: ClassVar[str] = """
+CREATE TABLE IF NOT EXISTS states (
+    key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS locks (
+    token TEXT PRIMARY KEY, lock_id BLOB NOT NULL, expires_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
 
-    # These events indicate that a lock is no longer held
-    _redis_keyspace_lock_release_events: Set[bytes] = {
-        b"del",
-        b"expire",
-        b"expired",
-        b"evicted",
-    }
+    # The connection to the database and the process that opened it.
+    _connection: Optional[sqlite3.Connection] = pydantic.PrivateAttr(None)
+    _connection_pid: Optional[int] = pydantic.PrivateAttr(None)
 
-    # Only warn about each state class size once.
-    _warned_about_state_size: ClassVar[Set[str]] = set()
+    # The mutex ensures the connection is used by one executor thread at a time.
+    _connection_lock: threading.Lock = pydantic.PrivateAttr(
+        default_factory=threading.Lock
+    )
 
-    async def _get_parent_state(self, token: str) -> BaseState | None:
-        """Get the parent state for the state requested in the token.
+    # The time of the last purge of expired states and locks.
+    _last_purge: float = pydantic.PrivateAttr(0.0)
 
-        Args:
-            token: The token to get the state for (_substate_key).
+    def _get_connection(self) -> sqlite3.Connection:
+        """Get the connection to the database, opening it in each process on first use.
 
         Returns:
-            The parent state for the state requested by the token or None if there is no such parent.
+            The database connection.
         """
-        parent_state = None
-        client_token, state_path = _split_substate_key(token)
-        parent_state_name = state_path.rpartition(".")[0]
-        if parent_state_name:
-            # Retrieve the parent state to populate event handlers onto this substate.
-            parent_state = await self.get_state(
-                token=_substate_key(client_token, parent_state_name),
-                top_level=False,
-                get_substates=False,
+        if self._connection is None or self._connection_pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Transactions are managed explicitly (isolation_level=None).
+            connection = sqlite3.connect(
+                self.path, isolation_level=None, check_same_thread=False
             )
-        return parent_state
-
-    async def _populate_substates(
-        self,
-        token: str,
-        state: BaseState,
-        all_substates: bool = False,
-    ):
-        """Fetch and link substates for the given state instance.
-
-        There is no return value; the side-effect is that `state` will have `substates` populated,
-        and each substate will have its `parent_state` set to `state`.
+            connection.execute(f"PRAGMA busy_timeout = {int(self.lock_expiration)}")
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+            connection.executescript(self._schema)
+            self._connection = connection
+            self._connection_pid = os.getpid()
+        return self._connection
+
+    async def _execute(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Call fn with the database connection in the default executor.
 
         Args:
-            token: The token to get the state for.
-            state: The state instance to populate substates for.
-            all_substates: Whether to fetch all substates or just required substates.
+            fn: The function to call with the connection and args.
+            *args: The arguments passed to fn.
+
+        Returns:
+            The return value of fn.
         """
-        client_token, _ = _split_substate_key(token)
 
-        if all_substates:
-            # All substates are requested.
-            fetch_substates = state.get_substates()
-        else:
-            # Only _potentially_dirty_substates need to be fetched to recalc computed vars.
-            fetch_substates = state._potentially_dirty_substates()
-
-        tasks = {}
-        # Retrieve the necessary substates from redis.
-        for substate_cls in fetch_substates:
-            substate_name = substate_cls.get_name()
-            tasks[substate_name] = asyncio.create_task(
-                self.get_state(
-                    token=_substate_key(client_token, substate_cls),
-                    top_level=False,
-                    get_substates=all_substates,
-                    parent_state=state,
-                )
-            )
+        def _call():
+            with self._connection_lock:
+                return fn(self._get_connection(), *args)
 
-        for substate_name, substate_task in tasks.items():
-            state.substates[substate_name] = await substate_task
+        return await asyncio.get_running_loop().run_in_executor(None, _call)
 
     @override
-    async def get_state(
+    async def _fetch_states(
         self,
-        token: str,
-        top_level: bool = True,
-        get_substates: bool = True,
-        parent_state: BaseState | None = None,
-    ) -> BaseState:
-        """Get the state for a token.
+        client_token: str,
+        required_state_classes: list[Type[BaseState]],
+    ) -> list[tuple[str | None, BaseState | bytes | dict[bytes, bytes] | None]]:
+        """Fetch the persisted substates of a token from the database.
 
         Args:
-            token: The token to get the state for.
-            top_level: If true, return an instance of the top-level state (self.state).
-            get_substates: If true, also retrieve substates.
-            parent_state: If provided, use this parent_state instead of getting it from redis.
+            client_token: The client token.
+            required_state_classes: The substate classes to fetch.
 
         Returns:
-            The state for the token.
-
-        Raises:
-            RuntimeError: when the state_cls is not specified in the token
+            None and the serialized substate or None (if not persisted) for each class.
         """
-        # Split the actual token from the fully qualified substate name.
-        _, state_path = _split_substate_key(token)
-        if state_path:
-            # Get the State class associated with the given path.
-            state_cls = self.state.get_class_substate(state_path)
-        else:
-            raise RuntimeError(
-                "StateManagerRedis requires token to be specified in the form of {token}_{state_full_name}"
-            )
-
-        # Fetch the serialized substate from redis.
-        redis_state = await self.redis.get(token)
+        keys = [self._storage_key(client_token, cls) for cls in required_state_classes]
+        values = await self._execute(self._select_states, keys)
+        return [(None, values.get(key)) for key in keys]
 
-        if redis_state is not None:
-            # Deserialize the substate.
-            state = dill.loads(redis_state)
-
-            # Populate parent state if missing and requested.
-            if parent_state is None:
-                parent_state = await self._get_parent_state(token)
-            # Set up Bidirectional linkage between this state and its parent.
-            if parent_state is not None:
-                parent_state.substates[state.get_name()] = state
-                state.parent_state = parent_state
-            # Populate substates if requested.
-            await self._populate_substates(token, state, all_substates=get_substates)
-
-            # To retain compatibility with previous implementation, by default, we return
-            # the top-level state by chasing `parent_state` pointers up the tree.
-            if top_level:
-                return state._get_root_state()
-            return state
-
-        # TODO: dedupe the following logic with the above block
-        # Key didn't exist so we have to create a new instance for this token.
-        if parent_state is None:
-            parent_state = await self._get_parent_state(token)
-        # Instantiate the new state class (but don't persist it yet).
-        state = state_cls(
-            parent_state=parent_state,
-            init_substates=False,
-            _reflex_internal_init=True,
-        )
-        # Set up Bidirectional linkage between this state and its parent.
-        if parent_state is not None:
-            parent_state.substates[state.get_name()] = state
-            state.parent_state = parent_state
-        # Populate substates for the newly created state.
-        await self._populate_substates(token, state, all_substates=get_substates)
-        # To retain compatibility with previous implementation, by default, we return
-        # the top-level state by chasing `parent_state` pointers up the tree.
-        if top_level:
-            return state._get_root_state()
-        return state
-
-    def _warn_if_too_large(
-        self,
-        state: BaseState,
-        pickle_state_size: int,
-    ):
-        """Print a warning when the state is too large.
+    def _select_states(
+        self, connection: sqlite3.Connection, keys: list[str]
+    ) -> dict[str, bytes]:
+        """Read the substates that have not expired.
 
         Args:
-            state: The state to check.
-            pickle_state_size: The size of the pickled state.
+            connection: The database connection.
+            keys: The substate keys to read.
+
+        Returns:
+            The serialized substates by key.
         """
-        state_full_name = state.get_full_name()
-        if (
-            state_full_name not in self._warned_about_state_size
-            and pickle_state_size > TOO_LARGE_SERIALIZED_STATE
-            and state.substates
-        ):
-            console.warn(
-                f"State {state_full_name} serializes to {pickle_state_size} bytes "
-                "which may present performance issues. Consider reducing the size of this state."
+        now = time.time()
+        values = {}
+        for i in range(0, len(keys), self._max_query_keys):
+            chunk = keys[i : i + self._max_query_keys]
+            values.update(
+                connection.execute(
+                    "SELECT key, value FROM states "
+                    f"WHERE key IN ({', '.join('?' * len(chunk))}) AND expires_at > ?",
+                    (*chunk, now),
+                ).fetchall()
             )
-            self._warned_about_state_size.add(state_full_name)
+        return values
 
     @override
     async def set_state(
@@ -2664,153 +5573,134 @@ class StateManagerRedis(StateManager):
     ):
         """Set the state for a token.
 
+        When lock_id is provided, the lock check and the writes for all touched
+        substates are performed in a single transaction.
+
         Args:
             token: The token to set the state for.
             state: The state to set.
-            lock_id: If provided, the lock_key must be set to this value to set the state.
+            lock_id: If provided, the lock for the token must be held by this ID to set the state.
 
         Raises:
             LockExpiredError: If lock_id is provided and the lock for the token is not held by that ID.
-            RuntimeError: If the state instance doesn't match the state name in the token.
         """
-        # Check that we're holding the lock.
-        if (
-            lock_id is not None
-            and await self.redis.get(self._lock_key(token)) != lock_id
-        ):
-            raise LockExpiredError(
-                f"Lock expired for token {token} while processing. Consider increasing "
-                f"`app.state_manager.lock_expiration` (currently {self.lock_expiration}) "
-                "or use `@rx.background` decorator for long-running tasks."
-            )
-        client_token, substate_name = _split_substate_key(token)
-        # If the substate name on the token doesn't match the instance name, it cannot have a parent.
-        if state.parent_state is not None and state.get_full_name() != substate_name:
-            raise RuntimeError(
-                f"Cannot `set_state` with mismatching token {token} and substate {state.get_full_name()}."
-            )
-
-        # Recursively set_state on all known substates.
-        tasks = []
-        for substate in state.substates.values():
-            tasks.append(
-                asyncio.create_task(
-                    self.set_state(
-                        token=_substate_key(client_token, substate),
-                        state=substate,
-                        lock_id=lock_id,
-                    )
-                )
-            )
-        # Persist only the given state (parents or substates are excluded by BaseState.__getstate__).
-        if state._get_was_touched():
-            pickle_state = dill.dumps(state, byref=True)
-            self._warn_if_too_large(state, len(pickle_state))
-            await self.redis.set(
-                _substate_key(client_token, state),
-                pickle_state,
-                ex=self.token_expiration,
-            )
+        # Only the given state and known substates that were touched are persisted.
+        serialized_states = {}
+        for key, known_state in self._get_keyed_states(token, state).items():
+            if not known_state._get_was_touched():
+                continue
+            pickle_state = self.codec.encode(known_state)
+            self._warn_if_too_large(known_state, len(pickle_state))
+            serialized_states[key] = pickle_state
 
-        # Wait for substates to be persisted.
-        for t in tasks:
-            await t
+        if lock_id is None and not serialized_states:
+            return
+        if not await self._execute(
+            self._write_states, self._lock_token(token), lock_id, serialized_states
+        ):
+            raise self._lock_expired_error(token)
 
-    @override
-    @contextlib.asynccontextmanager
-    async def modify_state(self, token: str) -> AsyncIterator[BaseState]:
-        """Modify the state for a token while holding exclusive lock.
+    def _write_states(
+        self,
+        connection: sqlite3.Connection,
+        lock_token: str,
+        lock_id: bytes | None,
+        serialized_states: dict[str, bytes],
+    ) -> bool:
+        """Write the serialized substates, if the lock is held.
 
         Args:
-            token: The token to modify the state for.
+            connection: The database connection.
+            lock_token: The token of the lock.
+            lock_id: If provided, the lock must be held by this ID to write the substates.
+            serialized_states: The serialized substates by key.
 
-        Yields:
-            The state for the token.
+        Returns:
+            False if lock_id is provided and the lock is not held by that ID.
         """
-        async with self._lock(token) as lock_id:
-            state = await self.get_state(token)
-            yield state
-            await self.set_state(token, state, lock_id)
+        now = time.time()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            if lock_id is not None and (
+                connection.execute(
+                    "SELECT 1 FROM locks WHERE token = ? AND lock_id = ? AND expires_at > ?",
+                    (lock_token, lock_id, now),
+                ).fetchone()
+                is None
+            ):
+                return False
+            connection.executemany(
+                "INSERT OR REPLACE INTO states (key, value, expires_at) VALUES (?, ?, ?)",
+                [
+                    (key, value, now + self.token_expiration)
+                    for key, value in serialized_states.items()
+                ],
+            )
+            if now - self._last_purge > self._purge_interval:
+                connection.execute("DELETE FROM states WHERE expires_at <= ?", (now,))
+                connection.execute("DELETE FROM locks WHERE expires_at <= ?", (now,))
+                self._last_purge = now
+        return True
 
     @staticmethod
-    def _lock_key(token: str) -> bytes:
-        """Get the redis key for a token's lock.
+    def _lock_token(token: str) -> str:
+        """Get the token identifying the lock of a token.
 
         Args:
-            token: The token to get the lock key for.
+            token: The token to get the lock token for.
 
         Returns:
-            The redis lock key for the token.
+            The client token, as all substates share the same lock domain.
         """
-        # All substates share the same lock domain, so ignore any substate path suffix.
-        client_token = _split_substate_key(token)[0]
-        return f"{client_token}_lock".encode()
+        return _split_substate_key(token)[0]
 
-    async def _try_get_lock(self, lock_key: bytes, lock_id: bytes) -> bool | None:
-        """Try to get a redis lock for a token.
+    def _try_get_lock(
+        self, connection: sqlite3.Connection, lock_token: str, lock_id: bytes
+    ) -> bool:
+        """Try to get the lock for a token, replacing an expired lock.
 
         Args:
-            lock_key: The redis key for the lock.
+            connection: The database connection.
+            lock_token: The token of the lock.
             lock_id: The ID of the lock.
 
         Returns:
             True if the lock was obtained.
         """
-        return await self.redis.set(
-            lock_key,
-            lock_id,
-            px=self.lock_expiration,
-            nx=True,  # only set if it doesn't exist
-        )
-
-    async def _wait_lock(self, lock_key: bytes, lock_id: bytes) -> None:
-        """Wait for a redis lock to be released via pubsub.
+        now = time.time()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                "DELETE FROM locks WHERE token = ? AND expires_at <= ?",
+                (lock_token, now),
+            )
+            return (
+                connection.execute(
+                    "INSERT OR IGNORE INTO locks (token, lock_id, expires_at) VALUES (?, ?, ?)",
+                    (lock_token, lock_id, now + self.lock_expiration / 1000.0),
+                ).rowcount
+                == 1
+            )
 
-        Coroutine will not return until the lock is obtained.
+    @staticmethod
+    def _release_lock(
+        connection: sqlite3.Connection, lock_token: str, lock_id: bytes
+    ) -> None:
+        """Release the lock for a token, if it is held by lock_id.
 
         Args:
-            lock_key: The redis key for the lock.
+            connection: The database connection.
+            lock_token: The token of the lock.
             lock_id: The ID of the lock.
-
-        Raises:
-            ResponseError: when the keyspace config cannot be set.
         """
-        state_is_locked = False
-        lock_key_channel = f"__keyspace@0__:{lock_key.decode()}"
-        # Enable keyspace notifications for the lock key, so we know when it is available.
-        try:
-            await self.redis.config_set(
-                "notify-keyspace-events",
-                self._redis_notify_keyspace_events,
-            )
-        except ResponseError:
-            # Some redis servers only allow out-of-band configuration, so ignore errors here.
-            ignore_config_error = os.environ.get(
-                "REFLEX_IGNORE_REDIS_CONFIG_ERROR",
-                None,
-            )
-            if not ignore_config_error:
-                raise
-        async with self.redis.pubsub() as pubsub:
-            await pubsub.psubscribe(lock_key_channel)
-            while not state_is_locked:
-                # wait for the lock to be released
-                while True:
-                    if not await self.redis.exists(lock_key):
-                        break  # key was removed, try to get the lock again
-                    message = await pubsub.get_message(
-                        ignore_subscribe_messages=True,
-                        timeout=self.lock_expiration / 1000.0,
-                    )
-                    if message is None:
-                        continue
-                    if message["data"] in self._redis_keyspace_lock_release_events:
-                        break
-                state_is_locked = await self._try_get_lock(lock_key, lock_id)
+        connection.execute(
+            "DELETE FROM locks WHERE token = ? AND lock_id = ?", (lock_token, lock_id)
+        )
 
+    @override
     @contextlib.asynccontextmanager
-    async def _lock(self, token: str):
-        """Obtain a redis lock for a token.
+    async def _lock(self, token: str) -> AsyncIterator[bytes]:
+        """Obtain the lock for a token, polling the database while it is held elsewhere.
 
         Args:
             token: The token to obtain a lock for.
@@ -2821,12 +5711,13 @@ class StateManagerRedis(StateManager):
         Raises:
             LockExpiredError: If the lock has expired while processing the event.
         """
-        lock_key = self._lock_key(token)
+        lock_token = self._lock_token(token)
         lock_id = uuid.uuid4().hex.encode()
 
-        if not await self._try_get_lock(lock_key, lock_id):
-            # Missed the fast-path to get lock, subscribe for lock delete/expire events
-            await self._wait_lock(lock_key, lock_id)
+        poll_interval = 0.005
+        while not await self._execute(self._try_get_lock, lock_token, lock_id):
+            await asyncio.sleep(poll_interval)
+            poll_interval = min(poll_interval * 2, self._max_lock_poll_interval)
         state_is_locked = True
 
         try:
@@ -2836,19 +5727,17 @@ class StateManagerRedis(StateManager):
             raise
         finally:
             if state_is_locked:
-                # only delete our lock
-                await self.redis.delete(lock_key)
+                await self._execute(self._release_lock, lock_token, lock_id)
 
     async def close(self):
-        """Explicitly close the redis connection and connection_pool.
-
-        It is necessary in testing scenarios to close between asyncio test cases
-        to avoid having lingering redis connections associated with event loops
-        that will be closed (each test case uses its own event loop).
+        """Close the database connection.
 
-        Note: Connections will be automatically reopened when needed.
+        Note: The connection will be automatically reopened when needed.
         """
-        await self.redis.aclose(close_connection_pool=True)
+        with self._connection_lock:
+            if self._connection is not None:
+                self._connection.close()
+            self._connection = None
 
 
 def get_state_manager() -> StateManager:
@@ -3037,7 +5926,17 @@ class MutableProxy(wrapt.ObjectProxy):
 
     __mutable_types__ = (list, dict, set, Base, DeclarativeBase)
 
-    def __init__(self, wrapped: Any, state: BaseState, field_name: str):
+    # Whether proxies for nested values are cached on the state until it is cleaned.
+    __cache_proxies__ = True
+
+    def __init__(
+        self,
+        wrapped: Any,
+        state: BaseState,
+        field_name: str,
+        path: Optional[Tuple[Union[str, int], ...]] = (),
+        patch_epoch: Optional[int] = None,
+    ):
         """Create a proxy for a mutable object that tracks changes.
 
         Args:
@@ -3045,10 +5944,16 @@ class MutableProxy(wrapt.ObjectProxy):
             state: The state to mark dirty when the object is changed.
             field_name: The name of the field on the state associated with the
                 wrapped object.
+            path: The path of the wrapped object in the field value, or None if unknown.
+            patch_epoch: The patch epoch of the field when the path was taken.
         """
         super().__init__(wrapped)
         self._self_state = state
         self._self_field_name = field_name
+        self._self_path = path
+        self._self_patch_epoch = patch_epoch
+        # The methods of the wrapped object tracked by the proxy, by name.
+        self._self_methods = {}
 
     def _mark_dirty(
         self,
@@ -3059,8 +5964,6 @@ class MutableProxy(wrapt.ObjectProxy):
     ) -> Any:
         """Mark the state as dirty, then call a wrapped function.
 
-        Intended for use with `FunctionWrapper` from the `wrapt` library.
-
         Args:
             wrapped: The wrapped function.
             instance: The instance of the wrapped function.
@@ -3070,16 +5973,218 @@ class MutableProxy(wrapt.ObjectProxy):
         Returns:
             The result of the wrapped function.
         """
-        self._self_state.dirty_vars.add(self._self_field_name)
-        self._self_state._mark_dirty()
+        state = self._self_state
+        field_name = self._self_field_name
+        if field_name in state.base_vars:
+            # Record the change, so the delta only has to send the operation.
+            ops, structural = self._get_patch_ops(
+                getattr(wrapped, "__name__", None), args, kwargs
+            )
+            state._record_patch(field_name, ops, structural)
+        state._mark_var_dirty(field_name)
         if wrapped is not None:
             return wrapped(*args, **(kwargs or {}))
 
-    def _wrap_recursive(self, value: Any) -> Any:
+    def _call_tracked(self, name: str, method: Callable, *args, **kwargs) -> Any:
+        """Call a method of the wrapped object, tracking the changes it makes.
+
+        Args:
+            name: The name of the method.
+            method: The bound method of the wrapped object.
+            *args: The args for the method.
+            **kwargs: The kwargs for the method.
+
+        Returns:
+            The result of the method, wrapped in a proxy if it is mutable and
+            tied to the state.
+        """
+        if name in self.__mark_dirty_attrs__:
+            result = self._mark_dirty(method, args=args, kwargs=kwargs)
+        else:
+            result = method(*args, **kwargs)
+        if name not in self.__wrap_mutable_attrs__:
+            return result
+        path = None
+        if args and isinstance(self.__wrapped__, dict) and args[0] in self.__wrapped__:
+            # The result is an item of the wrapped dict.
+            path = self._get_item_path(args[0])
+        return self._wrap_recursive(result, path)
+
+    def _has_valid_path(self, instance_dict: dict[str, Any]) -> bool:
+        """Check whether the path of the wrapped object in the field value is up to date.
+
+        Args:
+            instance_dict: The __dict__ of the state.
+
+        Returns:
+            True if patches can be recorded at the path of the wrapped object.
+        """
+        path = self._self_path
+        if path is None:
+            return False
+        if path:
+            return self._self_patch_epoch == _get_patch_epoch(
+                self._self_state, self._self_field_name
+            )
+        # The field may have been assigned a new value since the proxy was created.
+        return instance_dict.get(self._self_field_name) is self.__wrapped__
+
+    def _get_item_path(self, key: Any) -> Optional[Tuple[Union[str, int], ...]]:
+        """Get the path of an item of the wrapped object in the field value.
+
+        Args:
+            key: The key or index of the item.
+
+        Returns:
+            The path of the item, or None if it cannot be addressed by a patch.
+        """
+        path = self._self_path
+        wrapped = self.__wrapped__
+        if path is None:
+            return None
+        if isinstance(key, bool) or not isinstance(key, (str, int)):
+            return None
+        if isinstance(wrapped, list) and isinstance(key, int):
+            index = int(key)
+            if index < 0:
+                index += len(wrapped)
+            return (*path, index) if 0 <= index < len(wrapped) else None
+        if isinstance(wrapped, dict):
+            # Keys are always strings in the serialized value.
+            return (*path, key if isinstance(key, str) else str(int(key)))
+        return None
+
+    def _format_patch_value(self, value: Any) -> Any:
+        """Format a value set by a patch operation.
+
+        Mutable values may still be changed after the operation, so they are
+        checked again when the delta is built.
+
+        Args:
+            value: The value.
+
+        Returns:
+            The formatted value, or the value and its formatting if it is mutable.
+        """
+        formatted = format.format_state(value)
+        if isinstance(value, self.__mutable_types__) or dataclasses.is_dataclass(value):
+            return _PatchValue(value, formatted)
+        return formatted
+
+    def _get_patch_ops(
+        self, method: str | None, args: tuple, kwargs: dict[str, Any] | None
+    ) -> tuple[list[list[Any]] | None, bool]:
+        """Describe a change of the wrapped object as patch operations.
+
+        Only common changes of lists and dicts are described, everything else
+        requires sending the full value of the field.
+
+        Args:
+            method: The name of the method changing the wrapped object.
+            args: The args for the method.
+            kwargs: The kwargs for the method.
+
+        Returns:
+            The patch operations (or None if unknown) and whether the change may
+            move values nested in the wrapped object.
+        """
+        wrapped = self.__wrapped__
+        if not isinstance(wrapped, (list, dict)) or not self._has_valid_path(
+            self._self_state.__dict__
+        ):
+            return None, True
+        path = list(self._self_path)  # type: ignore
+        ops = None
+        structural = True
+        try:
+            if isinstance(wrapped, list):
+                if method == "append" and not kwargs:
+                    ops = [["extend", path, [self._format_patch_value(args[0])]]]
+                    structural = False
+                elif (
+                    method == "extend"
+                    and not kwargs
+                    and isinstance(args[0], (list, tuple))
+                ):
+                    ops = [
+                        ["extend", path, [self._format_patch_value(v) for v in args[0]]]
+                    ]
+                    structural = False
+                elif method == "insert" and not kwargs and isinstance(args[0], int):
+                    index = int(args[0])
+                    index = index + len(wrapped) if index < 0 else index
+                    index = min(max(index, 0), len(wrapped))
+                    ops = [["insert", path, index, self._format_patch_value(args[1])]]
+                elif method in ("pop", "__delitem__") and not kwargs:
+                    item_path = self._get_item_path(args[0] if args else -1)
+                    if item_path is not None:
+                        ops = [["delete", list(item_path)]]
+                elif method == "__setitem__" and not kwargs:
+                    item_path = self._get_item_path(args[0])
+                    if item_path is not None:
+                        ops = [
+                            ["set", list(item_path), self._format_patch_value(args[1])]
+                        ]
+                        structural = isinstance(
+                            wrapped[args[0]], self.__mutable_types__
+                        )
+            elif method in ("__setitem__", "setdefault") and not kwargs:
+                item_path = self._get_item_path(args[0])
+                if method == "setdefault" and args[0] in wrapped:
+                    # The dict is not changed.
+                    ops = []
+                    structural = False
+                elif item_path is not None:
+                    value = args[1] if len(args) > 1 else None
+                    ops = [["set", list(item_path), self._format_patch_value(value)]]
+                    structural = isinstance(
+                        wrapped.get(args[0]), self.__mutable_types__
+                    )
+            elif method in ("pop", "__delitem__") and not kwargs:
+                item_path = self._get_item_path(args[0])
+                if args[0] not in wrapped:
+                    # The dict is not changed.
+                    ops = []
+                    structural = False
+                elif item_path is not None:
+                    ops = [["delete", list(item_path)]]
+                    structural = isinstance(wrapped[args[0]], self.__mutable_types__)
+            elif method == "update" and (
+                (len(args) == 1 and isinstance(args[0], dict) and not kwargs)
+                or not args
+            ):
+                updates = dict(args[0]) if args else dict(kwargs or {})
+                item_paths = [self._get_item_path(key) for key in updates]
+                if None not in item_paths:
+                    ops = [
+                        [
+                            "update",
+                            path,
+                            {
+                                item_path[-1]: self._format_patch_value(value)  # type: ignore
+                                for item_path, value in zip(
+                                    item_paths, updates.values()
+                                )
+                            },
+                        ]
+                    ]
+                    structural = any(
+                        isinstance(wrapped.get(key), self.__mutable_types__)
+                        for key in updates
+                    )
+        except (IndexError, KeyError, TypeError):
+            # The change fails or the value cannot be serialized, send the full value.
+            return None, True
+        return ops, structural if ops is not None else True
+
+    def _wrap_recursive(
+        self, value: Any, path: Optional[Tuple[Union[str, int], ...]] = None
+    ) -> Any:
         """Wrap a value recursively if it is mutable.
 
         Args:
             value: The value to wrap.
+            path: The path of the value in the field value, if known.
 
         Returns:
             The wrapped value.
@@ -3088,29 +6193,33 @@ class MutableProxy(wrapt.ObjectProxy):
         if isinstance(value, self.__mutable_types__) and not isinstance(
             value, MutableProxy
         ):
+            state = self._self_state
+            instance_dict = state.__dict__
+            patch_epoch = self._self_patch_epoch
+            if path is not None and not self._self_path:
+                # Paths below the field value are valid until it changes structurally.
+                if self._has_valid_path(instance_dict):
+                    patch_epoch = _get_patch_epoch(state, self._self_field_name)
+                else:
+                    path = None
+            if self.__cache_proxies__:
+                return BaseState._get_mutable_proxy(
+                    state,
+                    instance_dict,
+                    self._self_field_name,
+                    value,
+                    path=path,
+                    patch_epoch=patch_epoch,
+                )
             return type(self)(
                 wrapped=value,
                 state=self._self_state,
                 field_name=self._self_field_name,
+                path=path,
+                patch_epoch=patch_epoch,
             )
         return value
 
-    def _wrap_recursive_decorator(self, wrapped, instance, args, kwargs) -> Any:
-        """Wrap a function that returns a possibly mutable value.
-
-        Intended for use with `FunctionWrapper` from the `wrapt` library.
-
-        Args:
-            wrapped: The wrapped function.
-            instance: The instance of the wrapped function.
-            args: The args for the wrapped function.
-            kwargs: The kwargs for the wrapped function.
-
-        Returns:
-            The result of the wrapped function (possibly wrapped in a MutableProxy).
-        """
-        return self._wrap_recursive(wrapped(*args, **kwargs))
-
     def __getattr__(self, __name: str) -> Any:
         """Get the attribute on the proxied object and return a proxy if mutable.
 
@@ -3120,30 +6229,37 @@ class MutableProxy(wrapt.ObjectProxy):
         Returns:
             The attribute value.
         """
+        # The methods tracking changes are looked up once per proxy.
+        method = self._self_methods.get(__name)
+        if method is not None:
+            return functools.partial(self._call_tracked, __name, method)
+
         value = super().__getattr__(__name)
 
         if callable(value):
-            if __name in self.__mark_dirty_attrs__:
-                # Wrap special callables, like "append", which should mark state dirty.
-                value = wrapt.FunctionWrapper(value, self._mark_dirty)
-
-            if __name in self.__wrap_mutable_attrs__:
-                # Wrap methods that may return mutable objects tied to the state.
-                value = wrapt.FunctionWrapper(
-                    value,
-                    self._wrap_recursive_decorator,
-                )
-
             if (
                 isinstance(self.__wrapped__, Base)
                 and __name not in self.__never_wrap_base_attrs__
                 and hasattr(value, "__func__")
             ):
                 # Wrap methods called on Base subclasses, which might do _anything_
-                return wrapt.FunctionWrapper(
-                    functools.partial(value.__func__, self),
-                    self._wrap_recursive_decorator,
-                )
+                func = value.__func__
+
+                def base_method(*args, **kwargs):
+                    return self._wrap_recursive(func(self, *args, **kwargs))
+
+                return base_method
+
+            if (
+                __name in self.__mark_dirty_attrs__
+                or __name in self.__wrap_mutable_attrs__
+            ):
+                # Wrap special callables, like "append", which should mark state
+                # dirty, and methods that may return mutable objects tied to the state.
+                # Only the method of the wrapped object is cached, so the proxy
+                # does not reference itself.
+                self._self_methods[__name] = value
+                return functools.partial(self._call_tracked, __name, value)
 
         if isinstance(value, self.__mutable_types__) and __name not in (
             "__wrapped__",
@@ -3165,7 +6281,7 @@ class MutableProxy(wrapt.ObjectProxy):
         """
         value = super().__getitem__(key)
         # Recursively wrap mutable items retrieved through this proxy.
-        return self._wrap_recursive(value)
+        return self._wrap_recursive(value, self._get_item_path(key))
 
     def __iter__(self) -> Any:
         """Iterate over the proxied object and return a proxy if mutable.
@@ -3173,9 +6289,12 @@ class MutableProxy(wrapt.ObjectProxy):
         Yields:
             Each item value (possibly wrapped in MutableProxy).
         """
-        for value in super().__iter__():
+        is_list = isinstance(self.__wrapped__, list)
+        for index, value in enumerate(super().__iter__()):
             # Recursively wrap mutable items retrieved through this proxy.
-            yield self._wrap_recursive(value)
+            yield self._wrap_recursive(
+                value, self._get_item_path(index) if is_list else None
+            )
 
     def __delattr__(self, name):
         """Delete the attribute on the proxied object and mark state dirty.
@@ -3279,6 +6398,9 @@ class ImmutableMutableProxy(MutableProxy):
     to modify the wrapped object when the StateProxy is immutable.
     """
 
+    # The proxies are bound to the StateProxy, so they are not cached on the state.
+    __cache_proxies__ = False
+
     def _mark_dirty(
         self,
         wrapped=None,
@@ -3288,8 +6410,6 @@ class ImmutableMutableProxy(MutableProxy):
     ) -> Any:
         """Raise an exception when an attempt is made to modify the object.
 
-        Intended for use with `FunctionWrapper` from the `wrapt` library.
-
         Args:
             wrapped: The wrapped function.
             instance: The instance of the wrapped function.
@@ -3303,10 +6423,7 @@ class ImmutableMutableProxy(MutableProxy):
             ImmutableStateError: if the StateProxy is not mutable.
         """
         if not self._self_state._is_mutable():
-            raise ImmutableStateError(
-                "Background task StateProxy is immutable outside of a context "
-                "manager. Use `async with self` to modify state."
-            )
+            raise self._self_state._get_immutable_error()
         return super()._mark_dirty(
             wrapped=wrapped, instance=instance, args=args, kwargs=kwargs
         )
@@ -3341,4 +6458,3 @@ def reload_state_module(
             state.class_subclasses.remove(subclass)
             state._always_dirty_substates.discard(subclass.get_name())
     state._init_var_dependency_dicts()
-    state.get_class_substate.cache_clear()
@@ -77,5 +77,13 @@ class LockExpiredError(ReflexError):
     """Raised when the state lock expires while an event is being processed."""
 
 
+class StateSerializationError(ReflexError):
+    """Raised when a persisted state cannot be encoded or decoded."""
+
+
+class InvalidStateManagerMode(ReflexError, ValueError):
+    """Raised when the configured state manager cannot be used."""
+
+
 class MatchTypeError(ReflexError, TypeError):
     """Raised when the return types of match cases are different."""
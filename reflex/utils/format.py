@@ -2,16 +2,33 @@
 
 from __future__ import annotations
 
+import functools
 import inspect
 import json
+import math
 import os
 import re
-from typing import TYPE_CHECKING, Any, Callable, List, Optional, Union
+import secrets
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    List,
+    Optional,
+    Union,
+    get_args,
+    get_origin,
+)
 
 from reflex import constants
 from reflex.utils import exceptions, types
 from reflex.vars import BaseVar, Var
 
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore
+
 if TYPE_CHECKING:
     from reflex.components.component import ComponentStyle
     from reflex.event import ArgsSpec, EventChain, EventHandler, EventSpec
@@ -726,8 +743,10 @@ def format_state(value: Any, key: Optional[str] = None) -> Any:
     if isinstance(value, types.StateIterBases):
         return [format_state(v) for v in value]
 
-    # Return state vars as is.
+    # Return state vars as is, marking floats which strict JSON cannot represent.
     if isinstance(value, types.StateBases):
+        if isinstance(value, float) and not math.isfinite(value):
+            return NonFiniteFloat(value)
         return value
 
     # Serialize the value.
@@ -745,6 +764,156 @@ def format_state(value: Any, key: Optional[str] = None) -> Any:
         )
 
 
+# The types of state values which are formatted as is (except non-finite floats).
+_JSON_VALUE_TYPES = frozenset((str, int, float, bool, type(None)))
+
+
+class NonFiniteFloat(float):
+    """A NaN or infinite float of formatted state.
+
+    Strict JSON cannot represent these floats, so formatting marks them with
+    this type, which the JSON encoder detects without walking the state.
+    """
+
+
+def format_float(value: float) -> float:
+    """Format a float of a state, marking it if it is NaN or infinite.
+
+    Args:
+        value: The float to format.
+
+    Returns:
+        The float, as a NonFiniteFloat if it is not finite.
+    """
+    if math.isfinite(value):
+        return value
+    return NonFiniteFloat(value)
+
+
+# A function formatting a state value, given the value and the name of its var.
+StateFormatter = Callable[[Any, Optional[str]], Any]
+
+
+def _format_json_value(value: Any, key: Optional[str] = None) -> Any:
+    """Format a state value which is expected to be a JSON value.
+
+    Args:
+        value: The value to format.
+        key: The key associated with the value (optional).
+
+    Returns:
+        The formatted value.
+    """
+    value_type = type(value)
+    if value_type in _JSON_VALUE_TYPES and (
+        value_type is not float or math.isfinite(value)
+    ):
+        return value
+    return format_state(value, key)
+
+
+@functools.lru_cache
+def get_state_formatter(type_: Any, defer_json: bool = False) -> StateFormatter:
+    """Compile a function formatting state values of the given type.
+
+    The function gives the same result as format_state, but skips checking the
+    type of each item for containers of JSON values.
+
+    Args:
+        type_: The type annotation of the state var.
+        defer_json: Whether values with a JSON encoder are left as is, to be
+            encoded straight to JSON when the state update is encoded.
+
+    Returns:
+        The formatting function, taking the value and optionally its key.
+    """
+    if types.is_optional(type_):
+        args = [arg for arg in get_args(type_) if arg is not type(None)]
+        if len(args) != 1:
+            return format_state
+        format_optional_value = get_state_formatter(args[0], defer_json)
+
+        def format_optional(value: Any, key: Optional[str] = None) -> Any:
+            return None if value is None else format_optional_value(value, key)
+
+        return format_optional
+
+    if type_ in _JSON_VALUE_TYPES or types.is_literal(type_):
+        return _format_json_value
+
+    origin, args = get_origin(type_), get_args(type_)
+    if (origin in (list, set) and len(args) == 1) or (
+        origin is tuple and len(args) == 2 and args[1] is Ellipsis
+    ):
+        if args[0] in _JSON_VALUE_TYPES:
+
+            def format_json_list(value: Any, key: Optional[str] = None) -> Any:
+                if isinstance(value, dict) or not isinstance(
+                    value, types.StateIterBases
+                ):
+                    return format_state(value, key)
+                return [
+                    item
+                    if (item_type := type(item)) in _JSON_VALUE_TYPES
+                    and (item_type is not float or math.isfinite(item))
+                    else format_state(item)
+                    for item in value
+                ]
+
+            return format_json_list
+
+        format_item = get_state_formatter(args[0], defer_json)
+
+        def format_list(value: Any, key: Optional[str] = None) -> Any:
+            if isinstance(value, dict) or not isinstance(value, types.StateIterBases):
+                return format_state(value, key)
+            return [format_item(item, None) for item in value]
+
+        return format_list
+
+    if origin is dict and len(args) == 2:
+        if args[1] in _JSON_VALUE_TYPES:
+
+            def format_json_dict(value: Any, key: Optional[str] = None) -> Any:
+                if not isinstance(value, dict):
+                    return format_state(value, key)
+                return {
+                    k: v
+                    if (v_type := type(v)) in _JSON_VALUE_TYPES
+                    and (v_type is not float or math.isfinite(v))
+                    else format_state(v, k)
+                    for k, v in value.items()
+                }
+
+            return format_json_dict
+
+        format_dict_value = get_state_formatter(args[1], defer_json)
+
+        def format_dict(value: Any, key: Optional[str] = None) -> Any:
+            if not isinstance(value, dict):
+                return format_state(value, key)
+            return {k: format_dict_value(v, k) for k, v in value.items()}
+
+        return format_dict
+
+    from reflex.utils import serializers
+
+    if (
+        defer_json
+        and isinstance(type_, type)
+        and serializers.get_json_encoder(type_) is not None
+    ):
+
+        def format_json_encodable(value: Any, key: Optional[str] = None) -> Any:
+            if isinstance(value, type_):
+                return value
+            return format_state(value, key)
+
+        return format_json_encodable
+
+    return format_state
+
+
 def format_state_name(state_name: str) -> str:
     """Format a state name, replacing dots with double underscore.
 
@@ -839,6 +1008,210 @@ def json_dumps(obj: Any) -> str:
     return json.dumps(obj, ensure_ascii=False, default=serializers.serialize)
 
 
+def _serialize_state_value(value: Any) -> Any:
+    """Serialize a value of a formatted state which is not a JSON value.
+
+    Args:
+        value: The value to serialize.
+
+    Returns:
+        The serialized value.
+    """
+    from reflex.base import Base
+    from reflex.utils import serializers
+
+    if isinstance(value, Base):
+        return value.dict()
+    return serializers.serialize(value)
+
+
+# Serialize datetimes and dataclasses like the json module, and allow int keys.
+_ORJSON_OPTIONS = (
+    orjson.OPT_NON_STR_KEYS
+    | orjson.OPT_PASSTHROUGH_DATETIME
+    | orjson.OPT_PASSTHROUGH_DATACLASS
+    if orjson is not None
+    else 0
+)
+
+
+def _has_non_finite_float(obj: Any) -> bool:
+    """Check whether formatted state contains NaN or infinite floats.
+
+    Values which are not JSON values are not checked.
+
+    Args:
+        obj: The formatted state.
+
+    Returns:
+        Whether a float of the state is not finite.
+    """
+    stack = [obj]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            if not math.isfinite(value):
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return False
+
+
+class _FragmentEmbedder:
+    """Encode values with a JSON encoder as placeholder strings, then embed their JSON instead."""
+
+    def __init__(self):
+        """Create the embedder."""
+        # The JSON of the values with a JSON encoder, by placeholder index.
+        self.fragments: List[Union[str, bytes]] = []
+        self.marker = ""
+        # Whether a serialized value contains NaN or infinite floats.
+        self.non_finite = False
+
+    def default(self, value: Any) -> Any:
+        """Serialize a value which is not a JSON value.
+
+        Args:
+            value: The value to serialize.
+
+        Returns:
+            The serialized value, or a placeholder for the JSON of a value with a
+            JSON encoder.
+        """
+        from reflex.utils import serializers
+
+        if isinstance(value, NonFiniteFloat):
+            self.non_finite = True
+            return float(value)
+        encode_json = serializers.get_json_encoder(type(value))
+        if encode_json is not None:
+            if not self.marker:
+                # Unique per encoding, so state values cannot match a placeholder.
+                self.marker = f"__reflex_fragment_{secrets.token_hex(8)}_"
+            self.fragments.append(encode_json(value))
+            return f"{self.marker}{len(self.fragments) - 1}"
+        serialized = _serialize_state_value(value)
+        if _has_non_finite_float(serialized):
+            self.non_finite = True
+        return serialized
+
+    def embed(self, encoded: Any) -> Any:
+        """Replace the placeholders with the JSON of the fragments.
+
+        Args:
+            encoded: The encoded JSON, as bytes or as a string.
+
+        Returns:
+            The JSON with the fragments embedded.
+        """
+        is_bytes = isinstance(encoded, bytes)
+        for index, fragment_json in enumerate(self.fragments):
+            placeholder = f'"{self.marker}{index}"'
+            if is_bytes:
+                if isinstance(fragment_json, str):
+                    fragment_json = fragment_json.encode()
+                encoded = encoded.replace(placeholder.encode(), fragment_json, 1)
+            else:
+                if isinstance(fragment_json, bytes):
+                    fragment_json = fragment_json.decode()
+                encoded = encoded.replace(placeholder, fragment_json, 1)
+        return encoded
+
+
+def json_encode_state(obj: Any) -> Optional[bytes]:
+    """Encode formatted state, like a state update, to strict JSON bytes.
+
+    Base instances are encoded as objects, and values with a JSON encoder, like
+    plotly figures, are encoded by it and embedded as is.
+    Strict JSON cannot represent NaN and infinite floats, which orjson encodes
+    as null, so states containing them are not encoded. They are detected
+    while encoding, as formatting marks them as NonFiniteFloat.
+
+    Args:
+        obj: The formatted state to encode.
+
+    Returns:
+        The UTF-8 encoded JSON, or None if orjson is not installed or cannot encode the state.
+    """
+    if orjson is None:
+        return None
+    embedder = _FragmentEmbedder()
+    try:
+        encoded = orjson.dumps(obj, default=embedder.default, option=_ORJSON_OPTIONS)
+    except orjson.JSONEncodeError:
+        # The json module supports more values, like integers above 64 bits.
+        return None
+    if embedder.non_finite:
+        # The json module writes them as NaN and Infinity, parsed by JSON5.
+        return None
+    return embedder.embed(encoded)
+
+
+def json_dumps_state(obj: Any) -> str:
+    """Dump formatted state, like a state update, to a JSON string.
+
+    Base instances are dumped as objects. orjson is used if it is installed.
+
+    Args:
+        obj: The formatted state to dump.
+
+    Returns:
+        The JSON string.
+    """
+    encoded = json_encode_state(obj)
+    if encoded is not None:
+        return encoded.decode()
+    embedder = _FragmentEmbedder()
+    return embedder.embed(json.dumps(obj, ensure_ascii=False, default=embedder.default))
+
+
+def get_msgpack():
+    """Get the msgpack module, used by the msgpack socket protocol.
+
+    Returns:
+        The msgpack module.
+
+    Raises:
+        ImportError: If the msgpack package is not installed.
+    """
+    try:
+        import msgpack
+
+        return msgpack
+    except ImportError as ie:
+        raise ImportError(
+            "Please install the `msgpack` package to use the msgpack socket protocol."
+        ) from ie
+
+
+def msgpack_encode_state(obj: Any) -> bytes:
+    """Encode formatted state, like a state update, to MessagePack.
+
+    Base instances are encoded as maps.
+
+    Args:
+        obj: The formatted state to encode.
+
+    Returns:
+        The MessagePack bytes.
+    """
+    return get_msgpack().packb(obj, default=_serialize_state_value)
+
+
+def msgpack_decode(data: bytes) -> Any:
+    """Decode a MessagePack message, like an event sent by the frontend.
+
+    Args:
+        data: The MessagePack bytes.
+
+    Returns:
+        The decoded value.
+    """
+    return get_msgpack().unpackb(data, strict_map_key=False)
+
+
 def unwrap_vars(value: str) -> str:
     """Unwrap var values from a JSON string.
 
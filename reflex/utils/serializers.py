@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import base64
 import functools
 import json
 import types as builtin_types
@@ -24,10 +25,16 @@ from typing import (
     overload,
 )
 
+from reflex import constants
 from reflex.base import Base
 from reflex.constants.colors import Color, format_color
 from reflex.utils import exceptions, types
 
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore
+
 # Mapping from type to a serializer.
 # The serializer should convert the type to a JSON object.
 SerializedType = Union[str, bool, int, float, list, dict]
@@ -39,6 +46,11 @@ Serializer = Callable[[Type], SerializedType]
 SERIALIZERS: dict[Type, Serializer] = {}
 SERIALIZER_TYPES: dict[Type, Type] = {}
 
+# Mapping from type to a function encoding its values straight to JSON.
+JSONEncoder = Callable[[Any], Union[str, bytes]]
+
+JSON_ENCODERS: dict[Type, JSONEncoder] = {}
+
 
 def serializer(
     fn: Serializer | None = None,
@@ -91,6 +103,52 @@ def serializer(
     return fn
 
 
+def json_encoder(fn: JSONEncoder) -> JSONEncoder:
+    """Decorator to add a function encoding values of a given type straight to JSON.
+
+    State updates embed the encoded JSON as is, instead of serializing the value
+    to Python objects and encoding them again.
+
+    Args:
+        fn: The function to decorate.
+
+    Returns:
+        The decorated function.
+
+    Raises:
+        ValueError: If the function does not take a single argument.
+    """
+    type_hints = get_type_hints(fn)
+    args = [arg for arg in type_hints if arg != "return"]
+    if len(args) != 1:
+        raise ValueError("JSON encoder must take a single argument.")
+
+    JSON_ENCODERS[type_hints[args[0]]] = fn
+    get_json_encoder.cache_clear()
+    return fn
+
+
+@functools.lru_cache
+def get_json_encoder(type_: Type) -> Optional[JSONEncoder]:
+    """Get the function encoding values of the type straight to JSON.
+
+    Args:
+        type_: The type to get the JSON encoder for.
+
+    Returns:
+        The JSON encoder for the type, or None if there is no JSON encoder.
+    """
+    encoder = JSON_ENCODERS.get(type_)
+    if encoder is not None:
+        return encoder
+
+    for registered_type, encoder in reversed(JSON_ENCODERS.items()):
+        if types._issubclass(type_, registered_type):
+            return encoder
+
+    return None
+
+
 @overload
 def serialize(
     value: Any, get_type: Literal[True]
@@ -360,7 +418,65 @@ def serialize_color(color: Color) -> str:
 
 
 try:
-    from pandas import DataFrame
+    import numpy as np
+    from pandas import DataFrame, NaT, Series
+    from pandas.api import types as pd_types
+
+    def format_dataframe_column(column: Series) -> List[Any]:
+        """Format the values of a dataframe column to a list.
+
+        Numeric, boolean, string and datetime columns are converted in a
+        single vectorized operation, only columns of mixed objects and float
+        columns with NaN or infinite values are formatted cell by cell.
+        Missing datetimes are formatted as None.
+
+        Args:
+            column: The column to format.
+
+        Returns:
+            The values of the column.
+        """
+        dtype = column.dtype
+        if pd_types.is_datetime64_any_dtype(dtype):
+            return column.astype(str).where(column.notna(), None).tolist()
+        if isinstance(dtype, np.dtype):
+            if dtype.kind in "biuf":
+                values = column.to_numpy()
+                if dtype.kind == "f" and not np.isfinite(values).all():
+                    from reflex.utils import format
+
+                    return [format.format_float(v) for v in values.tolist()]
+                return values.tolist()
+        elif pd_types.is_bool_dtype(dtype) or pd_types.is_numeric_dtype(dtype):
+            # Nullable extension dtypes.
+            return column.to_numpy(dtype=object, na_value=None).tolist()
+        values = column.tolist()
+        if pd_types.infer_dtype(values, skipna=True) in ("string", "empty"):
+            return values
+        return [
+            str(d) if isinstance(d, (list, tuple)) else None if d is NaT else d
+            for d in values
+        ]
+
+    def get_dataframe_column_type(column: Series) -> str:
+        """Get the type of a dataframe column, as used by the data editor.
+
+        Args:
+            column: The column.
+
+        Returns:
+            The type of the column.
+        """
+        dtype = column.dtype
+        if pd_types.is_bool_dtype(dtype):
+            return "bool"
+        if pd_types.is_integer_dtype(dtype):
+            return "int"
+        if pd_types.is_float_dtype(dtype):
+            return "float"
+        if pd_types.is_datetime64_any_dtype(dtype):
+            return "datetime"
+        return "str"
 
     def format_dataframe_values(df: DataFrame) -> List[List[Any]]:
         """Format dataframe values to a list of lists.
@@ -371,21 +487,53 @@ try:
         Returns:
             The dataframe as a list of lists.
         """
-        return [
+        rows = [
             [str(d) if isinstance(d, (list, tuple)) else d for d in data]
             for data in list(df.values.tolist())
         ]
+        floats = df.select_dtypes(include="floating")
+        if not np.isfinite(floats.to_numpy(dtype=float, na_value=np.nan)).all():
+            from reflex.utils import format
+
+            rows = [
+                [format.format_float(d) if isinstance(d, float) else d for d in row]
+                for row in rows
+            ]
+        return rows
+
+    def format_dataframe_columns(df: DataFrame) -> dict:
+        """Format a dataframe column by column, with the column types and the number of rows.
+
+        Args:
+            df: The dataframe to format.
+
+        Returns:
+            The dataframe in the columnar format.
+        """
+        return {
+            "columns": df.columns.tolist(),
+            "column_data": [format_dataframe_column(col) for _, col in df.items()],
+            "types": [get_dataframe_column_type(col) for _, col in df.items()],
+            "length": len(df),
+        }
 
     @serializer
     def serialize_dataframe(df: DataFrame) -> dict:
         """Serialize a pandas dataframe.
 
+        The values are sent as a list of rows, or column by column (with
+        vectorized formatting of each column) if the columnar format is configured.
+
         Args:
             df: The dataframe to serialize.
 
         Returns:
             The serialized dataframe.
         """
+        from reflex.config import get_config
+
+        if get_config().dataframe_format == constants.DataFrameFormat.COLUMNS:
+            return format_dataframe_columns(df)
         return {
             "columns": df.columns.tolist(),
             "data": format_dataframe_values(df),
@@ -410,6 +558,89 @@ try:
         """
         return json.loads(str(to_json(figure)))
 
+    # The plotly.js typed array dtypes of the numpy dtypes.
+    _PLOTLY_TYPED_ARRAY_DTYPES = {
+        "int8": "i1",
+        "uint8": "u1",
+        "int16": "i2",
+        "uint16": "u2",
+        "int32": "i4",
+        "uint32": "u4",
+        "float32": "f4",
+        "float64": "f8",
+    }
+
+    def _to_plotly_typed_array(array: Any) -> Optional[dict]:
+        """Encode a numeric numpy array as a plotly.js typed array.
+
+        64-bit integers are narrowed to 32 bits if their values fit, otherwise
+        they are converted to floats.
+
+        Args:
+            array: The array to encode.
+
+        Returns:
+            The typed array spec, or None if the array is not numeric.
+        """
+        import numpy as np
+
+        if array.dtype.kind not in "iuf" or array.size == 0:
+            return None
+        if array.dtype.name in ("int64", "uint64"):
+            narrow = np.int32 if array.dtype.kind == "i" else np.uint32
+            info = np.iinfo(narrow)
+            fits = array.min() >= info.min and array.max() <= info.max
+            array = array.astype(narrow if fits else np.float64)
+        dtype = _PLOTLY_TYPED_ARRAY_DTYPES.get(array.dtype.name)
+        if dtype is None:
+            array = array.astype(np.float64)
+            dtype = "f8"
+        array = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("<"))
+        typed_array = {
+            "dtype": dtype,
+            "bdata": base64.b64encode(array.tobytes()).decode(),
+        }
+        if array.ndim > 1:
+            typed_array["shape"] = ", ".join(map(str, array.shape))
+        return typed_array
+
+    @json_encoder
+    def encode_figure(figure: Figure) -> Union[str, bytes]:
+        """Encode a plotly figure straight to JSON.
+
+        With orjson, numeric numpy arrays of the traces are encoded as typed
+        arrays (base64 binary) if enabled in the config.
+
+        Args:
+            figure: The figure to encode.
+
+        Returns:
+            The JSON of the figure.
+        """
+        from plotly.utils import PlotlyJSONEncoder
+
+        from reflex.config import get_config
+
+        if orjson is None or not get_config().plotly_typed_arrays:
+            return to_json(figure, validate=False)
+        try:
+            import numpy as np
+        except ImportError:
+            # Figures without numpy have no arrays to encode as typed arrays.
+            return to_json(figure, validate=False)
+        plotly_encoder = PlotlyJSONEncoder()
+
+        def default(value: Any) -> Any:
+            if isinstance(value, np.ndarray):
+                typed_array = _to_plotly_typed_array(value)
+                if typed_array is not None:
+                    return typed_array
+            return plotly_encoder.default(value)
+
+        return orjson.dumps(
+            figure.to_plotly_json(), default=default, option=orjson.OPT_NON_STR_KEYS
+        )
+
     @serializer
     def serialize_template(template: layout.Template) -> dict:
         """Serialize a plotly template.
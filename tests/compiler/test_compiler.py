@@ -3,8 +3,10 @@ from typing import List
 
 import pytest
 
+import reflex as rx
 from reflex.compiler import compiler, utils
 from reflex.utils.imports import ImportVar, ParsedImportDict
+from tests.test_state import ReadOnlyState
 
 
 @pytest.mark.parametrize(
@@ -218,3 +220,43 @@ def test_create_document_root():
     assert root.lang == "rx"  # type: ignore
     assert isinstance(root.custom_attrs, dict)
     assert root.custom_attrs == {"project": "reflex"}
+
+
+def test_compile_read_only_events():
+    """Test that the read-only event handlers of the state tree are compiled."""
+    read_only_events = utils.compile_read_only_events(ReadOnlyState)
+    assert read_only_events == [
+        f"{ReadOnlyState.get_full_name()}.read_value",
+        f"{ReadOnlyState.get_full_name()}.write_value",
+        f"{ReadOnlyState.get_full_name()}.read_in_thread",
+    ]
+
+    context = compiler._compile_contexts(ReadOnlyState, None)
+    assert "export const readOnlyEvents = new Set([" in context
+    assert f'"{ReadOnlyState.get_full_name()}.read_value"' in context
+
+
+@pytest.mark.parametrize(
+    "config,imported",
+    [
+        ({}, False),
+        ({"socket_protocol": "msgpack", "socket_compression": "zstd"}, True),
+    ],
+)
+def test_compile_contexts_socket_decoders(mocker, config: dict, imported: bool):
+    """Test that the decoders of the socket encodings are only imported if enabled.
+
+    Args:
+        mocker: The pytest mocker object.
+        config: The socket options of the config.
+        imported: Whether the decoders are imported.
+    """
+    mocker.patch(
+        "reflex.compiler.compiler.get_config",
+        return_value=rx.Config(app_name="test", **config),
+    )
+    context = compiler._compile_contexts(ReadOnlyState, None)
+    assert ('from "@msgpack/msgpack"' in context) is imported
+    assert ('from "fzstd"' in context) is imported
+    assert ("export const msgpackDecode = undefined" in context) is not imported
+    assert ("export const zstdDecompress = undefined" in context) is not imported
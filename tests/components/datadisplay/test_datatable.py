@@ -1,9 +1,11 @@
+import math
+
 import pandas as pd
 import pytest
 
 import reflex as rx
 from reflex.components.gridjs.datatable import DataTable
-from reflex.utils import types
+from reflex.utils import format, types
 from reflex.utils.serializers import serialize, serialize_dataframe
 
 
@@ -44,9 +46,14 @@ def test_validate_data_table(data_table_state: rx.State, expected):
     state_name = data_table_state.get_name()
     expected = f"{state_name}.{expected}" if expected else state_name
 
+    if types.is_dataframe(data_table_state.data._var_type):
+        expected_data = f"dataFrameRows({expected})"
+    else:
+        expected_data = f"{expected}.data"
+
     assert data_table_dict["props"] == [
         f"columns={{{expected}.columns}}",
-        f"data={{{expected}.data}}",
+        f"data={{{expected_data}}}",
     ]
 
 
@@ -117,5 +124,118 @@ def test_serialize_dataframe():
     )
     value = serialize(df)
     assert value == serialize_dataframe(df)
-    assert isinstance(value, dict)
+    assert value == {
+        "columns": ["column1", "column2"],
+        "data": [["foo", "bar"], ["foo1", "bar1"]],
+    }
+
+
+def _format_rows_baseline(df: pd.DataFrame) -> list:
+    """Format the rows of a dataframe like before the columnar format was added.
+
+    Args:
+        df: The dataframe to format.
+
+    Returns:
+        The dataframe as a list of lists.
+    """
+    return [
+        [str(d) if isinstance(d, (list, tuple)) else d for d in data]
+        for data in df.values.tolist()
+    ]
+
+
+@pytest.mark.parametrize(
+    "df",
+    [
+        pd.DataFrame(
+            {
+                "name": ["foo", "bar"],
+                "date": pd.to_datetime(["2024-01-01", "2024-01-02"]),
+            }
+        ),
+        pd.DataFrame({"date": pd.to_datetime(["2024-01-01", "2024-01-02"])}),
+        pd.DataFrame({"value": [0.5, float("nan")], "list": [[1], (2, 3)]}),
+    ],
+)
+def test_serialize_dataframe_rows_unchanged(df: pd.DataFrame):
+    """Test that the row format of a dataframe is the same as before the columnar format.
+
+    Args:
+        df: The dataframe to serialize.
+    """
+    rows = serialize_dataframe(df)["data"]
+    assert format.json_dumps(rows) == format.json_dumps(_format_rows_baseline(df))
+    if "name" in df:
+        # Datetimes of mixed frames keep their time, even at midnight.
+        assert format.json_dumps(rows[0]) == '["foo", "2024-01-01 00:00:00"]'
+    elif "date" in df:
+        # Datetime frames are sent as nanoseconds.
+        assert rows[0] == [1704067200000000000]
+    else:
+        # NaN is sent as is in the json fallback instead of as null.
+        assert format.json_encode_state(rows) is None
+
+
+def test_serialize_dataframe_formats(mocker):
+    """Test that a dataframe is serialized by rows or by columns.
+
+    Args:
+        mocker: The pytest mocker object.
+    """
+    df = pd.DataFrame(
+        {
+            "int": [1, 2],
+            "float": [0.5, None],
+            "str": ["foo", None],
+            "list": [[1], (2, 3)],
+            "nullable": pd.array([1, None], dtype="Int64"),
+            "bool": [True, False],
+            "date": pd.to_datetime(["2024-01-01", None]),
+            "mixed": ["foo", pd.NaT],
+        }
+    )
+    value = serialize_dataframe(df)
     assert tuple(value) == ("columns", "data")
+    assert format.json_dumps(value["data"]) == format.json_dumps(
+        _format_rows_baseline(df)
+    )
+
+    mocker.patch(
+        "reflex.config.get_config",
+        return_value=rx.Config(app_name="test", dataframe_format="columns"),
+    )
+    value = serialize_dataframe(df)
+    assert value["columns"] == list(df.columns)
+    assert value["types"] == [
+        "int",
+        "float",
+        "str",
+        "str",
+        "int",
+        "bool",
+        "datetime",
+        "str",
+    ]
+    assert value["length"] == 2
+    column_data = value["column_data"]
+    assert column_data[0] == [1, 2]
+    assert column_data[1][0] == 0.5 and math.isnan(column_data[1][1])
+    assert column_data[2:] == [
+        ["foo", None],
+        ["[1]", "(2, 3)"],
+        [1, None],
+        [True, False],
+        ["2024-01-01", None],
+        ["foo", None],
+    ]
+
+
+def test_data_table_data_source():
+    """Test that a data table rejects the window of a data source."""
+
+    class DataTableSourceState(rx.DataSourceState, rx.State):
+        pass
+
+    with pytest.raises(ValueError):
+        DataTable.create(data=DataTableSourceState.window, columns=["column1"])
@@ -42,3 +42,21 @@ def test_plotly_config_option(plotly_fig: go.Figure):
     """
     # This tests just confirm that the component can be created with a config option.
     _ = rx.plotly(data=plotly_fig, config={"showLink": True})
+
+
+@pytest.mark.parametrize(
+    "typed_arrays,dependency", [(False, "plotly.js@2.22.0"), (True, "plotly.js@2.35.2")]
+)
+def test_plotly_typed_arrays_dependency(mocker, typed_arrays: bool, dependency: str):
+    """Test that plotly.js is only upgraded when figures are sent as typed arrays.
+
+    Args:
+        mocker: The pytest mocker object.
+        typed_arrays: Whether figure arrays are sent as typed arrays.
+        dependency: The expected plotly.js dependency.
+    """
+    mocker.patch(
+        "reflex.config.get_config",
+        return_value=rx.Config(app_name="test", plotly_typed_arrays=typed_arrays),
+    )
+    assert rx.plotly().lib_dependencies == [dependency]
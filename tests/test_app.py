@@ -1,12 +1,17 @@
 from __future__ import annotations
 
+import asyncio
 import functools
 import io
 import json
+import math
 import os.path
 import re
+import threading
+import time
 import unittest.mock
 import uuid
+import zlib
 from contextlib import nullcontext as does_not_raise
 from pathlib import Path
 from typing import Generator, List, Tuple, Type
@@ -24,17 +29,21 @@ import reflex as rx
 from reflex import AdminDash, constants
 from reflex.app import (
     App,
+    BackgroundTaskScheduler,
     ComponentCallable,
+    EventNamespace,
     OverlayFragment,
+    _merge_updates,
     default_overlay_component,
     process,
+    process_events,
     upload,
 )
 from reflex.components import Component
 from reflex.components.base.fragment import Fragment
 from reflex.components.core.cond import Cond
 from reflex.components.radix.themes.typography.text import Text
-from reflex.event import Event
+from reflex.event import Event, EventHandler
 from reflex.middleware import HydrateMiddleware
 from reflex.model import Model
 from reflex.state import (
@@ -1156,6 +1165,113 @@ async def test_process_events(mocker, token: str):
         await app.state_manager.close()
 
 
+class BatchState(BaseState):
+    """A state for processing batches of events."""
+
+    value: int = 0
+    recorded: List[int] = []
+
+    def record(self):
+        """Record the current value."""
+        self.recorded.append(self.value)
+
+
+@pytest.mark.asyncio
+async def test_process_events_batch(token: str):
+    """Test that a batch of events is coalesced and sent as one update.
+
+    Args:
+        token: a Token.
+    """
+    app = App(state=BatchState)
+    set_value = f"{BatchState.get_full_name()}.set_value"
+    events = [
+        Event(
+            token=token,
+            name=name,
+            payload=payload,
+            router_data={"pathname": "/", "query": {}},
+        )
+        for name, payload in [
+            (set_value, {"value": 1}),
+            (set_value, {"value": 2}),
+            (set_value, {"value": 3}),
+            (f"{BatchState.get_full_name()}.record", {}),
+            (set_value, {"value": 4}),
+            (set_value, {"value": 5}),
+        ]
+    ]
+    assert [event.payload for event in app._coalesce_events(events)] == [
+        {"value": 3},
+        {},
+        {"value": 5},
+    ]
+
+    updates = [
+        update
+        async for update in process_events(app, events, "mock_sid", {}, "127.0.0.1")
+    ]
+    assert len(updates) == 1
+    assert updates[0].final
+    assert updates[0].delta[BatchState.get_full_name()]["value"] == 5
+    assert updates[0].delta[BatchState.get_full_name()]["recorded"] == [3]
+
+    state = await app.state_manager.get_state(events[0].substate_token)
+    assert state.value == 5
+    assert state.recorded == [3]
+
+    with pytest.raises(ValueError):
+        async for _update in process_events(
+            app,
+            [events[0], events[1].copy(update={"token": "other"})],
+            "mock_sid",
+            {},
+            "127.0.0.1",
+        ):
+            pass
+
+    if isinstance(app.state_manager, StateManagerRedis):
+        await app.state_manager.close()
+
+
+def test_merge_updates():
+    """Test merging consecutive updates, including vars sent as patches."""
+    patch = constants.CompileVars.PATCH
+    merged = _merge_updates(
+        StateUpdate(
+            delta={"state": {"a": 1, "items": {patch: [["extend", [], [1]]]}}},
+            events=[Event(token="t", name="_console", payload={})],
+            final=True,
+        ),
+        StateUpdate(
+            delta={
+                "state": {"a": 2, "items": {patch: [["extend", [], [2]]]}},
+                "state.sub": {"b": 3},
+            },
+            final=False,
+        ),
+    )
+    assert merged is not None
+    assert merged.delta == {
+        "state": {
+            "a": 2,
+            "items": {patch: [["extend", [], [1]], ["extend", [], [2]]]},
+        },
+        "state.sub": {"b": 3},
+    }
+    assert len(merged.events) == 1
+    assert not merged.final
+
+    # A patch cannot be applied to a value the frontend did not receive yet.
+    assert (
+        _merge_updates(
+            StateUpdate(delta={"state": {"items": [1]}}),
+            StateUpdate(delta={"state": {"items": {patch: [["extend", [], [2]]]}}}),
+        )
+        is None
+    )
+
+
 @pytest.mark.parametrize(
     ("state", "overlay_component", "exp_page_child"),
     [
@@ -1365,6 +1481,183 @@ def test_raise_on_connect_error():
         App(connect_error_component="Foo")
 
 
+@pytest.mark.parametrize(
+    "config,packages",
+    [
+        ({}, set()),
+        ({"socket_compression": "deflate"}, set()),
+        (
+            {"socket_protocol": "msgpack", "socket_compression": "zstd"},
+            {
+                constants.PackageJson.MSGPACK_DEPENDENCY,
+                constants.PackageJson.ZSTD_DEPENDENCY,
+            },
+        ),
+    ],
+)
+def test_socket_frontend_packages(mocker, config: dict, packages: set):
+    """Test that the decoders of the socket encodings are only installed if enabled.
+
+    Args:
+        mocker: The pytest mocker object.
+        config: The socket options of the config.
+        packages: The expected frontend packages.
+    """
+    mocker.patch(
+        "reflex.app.get_config",
+        return_value=rx.Config(app_name="test", **config),
+    )
+    install = mocker.patch("reflex.utils.prerequisites.install_frontend_packages")
+    App()._get_frontend_packages({})
+    assert install.call_args[0][0] == packages
+
+
+@pytest.mark.parametrize("protocol", ["json", "msgpack"])
+def test_event_namespace_protocol(mocker, protocol: str):
+    """Test that the msgpack protocol is used for clients offering it, if enabled.
+
+    Args:
+        mocker: The pytest mocker object.
+        protocol: The socket protocol of the config.
+    """
+    if protocol == "msgpack":
+        pytest.importorskip("msgpack")
+    mocker.patch(
+        "reflex.app.get_config",
+        return_value=rx.Config(app_name="test", socket_protocol=protocol),
+    )
+    namespace = EventNamespace("/_event", App())
+    namespace.on_connect("sid1", {"QUERY_STRING": "protocol=msgpack&EIO=4"})
+    namespace.on_connect("sid2", {"QUERY_STRING": "protocol=json&EIO=4"})
+    namespace.on_connect("sid3", {})
+    if protocol == "msgpack":
+        assert namespace.sid_to_protocol == {"sid1": constants.SocketProtocol.MSGPACK}
+    else:
+        assert not namespace.sid_to_protocol
+    namespace.on_disconnect("sid1")
+    assert not namespace.sid_to_protocol
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("compression", ["deflate", "zstd"])
+async def test_emit_update_compression(mocker, compression: str):
+    """Test that large updates are compressed for clients supporting it.
+
+    Args:
+        mocker: The pytest mocker object.
+        compression: The socket compression of the config.
+    """
+    if compression == "zstd":
+        zstandard = pytest.importorskip("zstandard")
+        decompress = zstandard.ZstdDecompressor().decompress
+    else:
+        decompress = zlib.decompress
+    mocker.patch(
+        "reflex.app.get_config",
+        return_value=rx.Config(
+            app_name="test",
+            socket_compression=compression,
+            socket_compression_threshold=1000,
+        ),
+    )
+    namespace = EventNamespace("/_event", App())
+    namespace.emit = AsyncMock()  # type: ignore
+    namespace.on_connect("sid1", {"QUERY_STRING": f"compression=zstd,{compression}"})
+    namespace.on_connect("sid2", {"QUERY_STRING": ""})
+
+    small = StateUpdate(delta={"state": {"value": 1}})
+    large = StateUpdate(delta={"state": {"values": list(range(1000))}})
+    for sid in ("sid1", "sid2"):
+        await namespace.emit_update(small, sid)
+        await namespace.emit_update(large, sid)
+
+    payloads = [call.args[1] for call in namespace.emit.mock_calls]
+    assert json.loads(payloads[0]) == json.loads(small.json())
+    assert json.loads(decompress(payloads[1])) == json.loads(large.json())
+    assert json.loads(payloads[2]) == json.loads(small.json())
+    assert json.loads(payloads[3]) == json.loads(large.json())
+
+    metrics = namespace.metrics
+    assert metrics.count == 4
+    assert metrics.compressed_count == 1
+    assert metrics.max_encoded_bytes == len(payloads[3])
+    assert metrics.encoded_bytes == 2 * (len(payloads[0]) + len(payloads[3]))
+    assert metrics.sent_bytes == metrics.encoded_bytes - len(payloads[3]) + len(
+        payloads[1]
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("compression", [None, "deflate"])
+async def test_emit_update_size_in_bytes(mocker, compression: str | None):
+    """Test that the size of updates sent as strings is recorded in bytes.
+
+    Args:
+        mocker: The pytest mocker object.
+        compression: The socket compression of the config.
+    """
+    mocker.patch(
+        "reflex.app.get_config",
+        return_value=rx.Config(app_name="test", socket_compression=compression),
+    )
+    namespace = EventNamespace("/_event", App())
+    namespace.emit = AsyncMock()  # type: ignore
+    sid = f"size_{compression}"
+    namespace.on_connect(sid, {"QUERY_STRING": "compression=deflate"})
+    # NaN is only supported by the json string fallback.
+    update = StateUpdate(
+        delta={"state": {"name": "ü" * 10, "value": format.format_float(math.nan)}}
+    )
+    await namespace.emit_update(update, sid)
+    namespace.on_disconnect(sid)
+
+    payload = namespace.emit.mock_calls[0].args[1]
+    assert isinstance(payload, str)
+    assert namespace.metrics.encoded_bytes == len(payload.encode()) > len(payload)
+    assert namespace.metrics.sent_bytes == namespace.metrics.encoded_bytes
+
+
+@pytest.mark.asyncio
+async def test_emit_update_compression_in_thread(mocker):
+    """Test that updates are compressed in a thread, and still sent in order.
+
+    Args:
+        mocker: The pytest mocker object.
+    """
+    mocker.patch(
+        "reflex.app.get_config",
+        return_value=rx.Config(
+            app_name="test",
+            socket_compression="deflate",
+            socket_compression_threshold=1000,
+        ),
+    )
+    namespace = EventNamespace("/_event", App())
+    namespace.emit = AsyncMock()  # type: ignore
+    namespace.on_connect("sid1", {"QUERY_STRING": "compression=deflate"})
+    compress = namespace.sid_to_compressor["sid1"]
+    threads = []
+
+    def slow_compress(data: bytes) -> bytes:
+        threads.append(threading.current_thread())
+        time.sleep(0.1)
+        return compress(data)
+
+    namespace.sid_to_compressor["sid1"] = slow_compress
+    small = StateUpdate(delta={"state": {"value": 1}})
+    large = StateUpdate(delta={"state": {"values": list(range(1000))}})
+    await asyncio.gather(
+        namespace.emit_update(large, "sid1"), namespace.emit_update(small, "sid1")
+    )
+
+    assert threads and threads[0] is not threading.main_thread()
+    payloads = [call.args[1] for call in namespace.emit.mock_calls]
+    assert json.loads(zlib.decompress(payloads[0])) == json.loads(large.json())
+    assert json.loads(payloads[1]) == json.loads(small.json())
+    namespace.on_disconnect("sid1")
+    assert "sid1" not in namespace.sid_to_emit_lock
+
+
 def test_raise_on_state():
     """Test that the state is set."""
     # state kwargs is deprecated, we just make sure the app is created anyway.
@@ -1690,3 +1983,105 @@ def test_backend_exception_handler_validation(handler_fn, expected):
     """
     with expected:
         rx.App(backend_exception_handler=handler_fn)._validate_exception_handlers()
+
+
+@pytest.mark.asyncio
+async def test_background_task_scheduler():
+    """Test that background tasks start within the limits, in order of priority."""
+    scheduler = BackgroundTaskScheduler(max_tasks=2, max_tasks_per_token=1)
+    started = []
+    done = {}
+
+    def job(name: str):
+        done[name] = asyncio.Event()
+
+        async def _job():
+            started.append(name)
+            await done[name].wait()
+
+        return _job()
+
+    tasks = {
+        "a1": scheduler.schedule("a", job("a1")),
+        "a2": scheduler.schedule("a", job("a2")),
+        "a3": scheduler.schedule("a", job("a3"), priority=5),
+        "b1": scheduler.schedule("b", job("b1")),
+        "c1": scheduler.schedule("c", job("c1")),
+    }
+    await asyncio.sleep(0)
+    assert started == ["a1", "b1"]
+    assert scheduler.metrics.running == 2
+    assert scheduler.metrics.queued == 3
+
+    # The prioritized task of the client starts first.
+    done["a1"].set()
+    await tasks["a1"]
+    await asyncio.sleep(0)
+    assert started == ["a1", "b1", "a3"]
+
+    # The client is at its limit, so a task of another client starts.
+    done["b1"].set()
+    await tasks["b1"]
+    await asyncio.sleep(0)
+    assert started == ["a1", "b1", "a3", "c1"]
+    assert scheduler.metrics.queued == 1
+
+    # Both the running and the waiting task of the client are cancelled.
+    assert scheduler.cancel("a") == 2
+    await asyncio.gather(tasks["a2"], tasks["a3"], return_exceptions=True)
+    assert tasks["a2"].cancelled() and tasks["a3"].cancelled()
+    assert "a2" not in started
+    assert scheduler.metrics.cancelled == 2
+    assert scheduler.metrics.queued == 0
+    assert scheduler.metrics.max_queued == 3
+
+    done["c1"].set()
+    await tasks["c1"]
+    assert scheduler.metrics.running == 0
+    assert scheduler.metrics.started == 4
+    assert scheduler.cancel("a") == 0
+
+
+def test_background_priority():
+    """Test that the priority of a background handler is set by the decorator."""
+
+    @rx.background(priority=3)
+    async def prioritized(state):
+        pass
+
+    @rx.background
+    async def default(state):
+        pass
+
+    assert EventHandler(fn=prioritized).background_priority == 3
+    assert EventHandler(fn=default).background_priority == 0
+
+
+@pytest.mark.parametrize("cancel_on_disconnect", [True, False])
+def test_cancel_background_tasks_on_disconnect(mocker, cancel_on_disconnect: bool):
+    """Test that the background tasks of a client are cancelled on disconnect.
+
+    Args:
+        mocker: pytest mock object.
+        cancel_on_disconnect: Whether cancelling on disconnect is enabled.
+    """
+    mocker.patch(
+        "reflex.app.get_config",
+        return_value=rx.Config(
+            app_name="test",
+            background_task_max_concurrency=4,
+            background_task_cancel_on_disconnect=cancel_on_disconnect,
+        ),
+    )
+    app = App(state=BatchState)
+    assert app._background_task_scheduler is not None
+    assert app._background_task_scheduler.max_tasks == 4
+    cancel = mocker.patch.object(app._background_task_scheduler, "cancel")
+    namespace = EventNamespace(namespace="/event", app=app)
+    namespace.sid_to_token["sid"] = "token"
+    namespace.token_to_sid["token"] = "sid"
+    namespace.on_disconnect("sid")
+    if cancel_on_disconnect:
+        cancel.assert_called_once_with("token")
+    else:
+        cancel.assert_not_called()
@@ -4,15 +4,32 @@ import asyncio
 import copy
 import datetime
 import functools
+import gc
 import json
 import os
 import sys
+import threading
+import time
+import weakref
 from textwrap import dedent
-from typing import Any, Callable, Dict, Generator, List, Optional, Union
+from typing import (
+    Any,
+    Callable,
+    ClassVar,
+    Dict,
+    Generator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 from unittest.mock import AsyncMock, Mock
 
+import dill
 import pytest
 from plotly.graph_objects import Figure
+from redis.asyncio import Redis
+from redis.crc import key_slot
 
 import reflex as rx
 import reflex.config
@@ -23,23 +40,33 @@ from reflex.components.sonner.toast import Toaster
 from reflex.constants import CompileVars, RouteVar, SocketEvent
 from reflex.event import Event, EventHandler
 from reflex.state import (
+    PATCH_MIN_LENGTH,
     BaseState,
+    DataSourceState,
+    DataWindow,
+    DillStateCodec,
     ImmutableStateError,
     LockExpiredError,
     MutableProxy,
     OnLoadInternalState,
+    PickleStateCodec,
+    ReadOnlyStateProxy,
     RouterData,
     State,
     StateManager,
+    StateManagerDisk,
     StateManagerMemory,
     StateManagerRedis,
     StateProxy,
     StateUpdate,
+    _ProcessStateSnapshot,
     _substate_key,
 )
 from reflex.testing import chdir
 from reflex.utils import format, prerequisites, types
+from reflex.utils.exceptions import InvalidStateManagerMode, StateSerializationError
 from reflex.utils.format import json_dumps
+from reflex.utils.serializers import serialize_figure
 from reflex.vars import BaseVar, ComputedVar
 from tests.states.mutation import MutableSQLAModel, MutableTestState
 
@@ -485,6 +512,40 @@ def test_get_class_substate():
                 "invalid_child",
             )
         )
+    assert TestState.get_class_substate(GrandchildState.get_full_name()) == (
+        GrandchildState
+    )
+
+
+def test_get_class_substate_index_invalidation():
+    """Test that substates defined later are found and change the cached dependencies."""
+
+    class IndexedState(BaseState):
+        pass
+
+    assert IndexedState.get_class_substate(IndexedState.get_name()) is IndexedState
+    assert IndexedState._potentially_dirty_substates() == set()
+    assert (
+        IndexedState._potentially_dirty_substates()
+        is IndexedState._potentially_dirty_substates()
+    )
+
+    class IndexedChildState(IndexedState):
+        @rx.var(cache=False)
+        def always_dirty(self) -> int:
+            return 0
+
+    assert (
+        IndexedState.get_class_substate((IndexedChildState.get_name(),))
+        is IndexedChildState
+    )
+    assert IndexedState._potentially_dirty_substates() == {IndexedChildState}
+
+    # Lookups are memoized until the state tree changes.
+    assert IndexedState._class_substate_lookups is not None
+    generation, lookups = IndexedState._class_substate_lookups
+    assert generation == BaseState._class_tree_generation
+    assert lookups[(IndexedChildState.get_name(),)] is IndexedChildState
 
 
 def test_get_class_var():
@@ -923,6 +984,30 @@ def test_add_var():
     assert DynamicState().dynamic_dict == {"k1": 5, "k2": 10}
 
 
+def test_event_handler_binding_cached(test_state):
+    """Test that event handlers are bound once per instance.
+
+    Args:
+        test_state: A state.
+    """
+    assert test_state.do_something is test_state.do_something
+    assert test_state.do_something.args[0] is test_state
+
+    # A copy gets its own binding.
+    state_copy = test_state.copy()
+    assert state_copy.do_something.args[0] is state_copy
+    assert test_state.do_something.args[0] is test_state
+
+    # The binding is neither persisted nor part of the fields of the instance.
+    serialized = test_state.__getstate__()
+    assert "_bound_event_handlers" not in serialized["__dict__"]
+    assert "_bound_event_handlers" not in serialized["__private_attribute_values__"]
+    assert "_bound_event_handlers" not in test_state.__dict__
+    assert "_bound_event_handlers" not in super(Base, test_state).dict()
+    restored = dill.loads(dill.dumps(test_state))
+    assert restored.do_something.args[0] is restored
+
+
 def test_add_var_default_handlers(test_state):
     test_state.add_var("rand_int", int, 10)
     assert "set_rand_int" in test_state.event_handlers
@@ -1071,6 +1156,30 @@ def test_dirty_computed_var_from_backend_var(
     }
 
 
+def test_dirty_propagation_graph(
+    interdependent_state: InterdependentState,
+) -> None:
+    """Test that each var maps to its transitive dependents in topological order.
+
+    Args:
+        interdependent_state: A state with varying Var dependencies.
+    """
+    graph = InterdependentState._get_dirty_propagation_graph()
+    assert graph.computed_vars["v1"] == ("v1x2", "v1x2x2")
+    assert graph.computed_vars["_v2"].index("_v3") < graph.computed_vars["_v2"].index(
+        "v3x2"
+    )
+    assert "x" not in graph.computed_vars
+    assert InterdependentState._get_dirty_propagation_graph() is graph
+
+    # Only the changed var is propagated, and it can be read back immediately.
+    interdependent_state.v1 = 1
+    assert interdependent_state.dirty_vars == {"v1", "v1x2", "v1x2x2"}
+    assert interdependent_state.v1x2x2 == 4
+    interdependent_state.v1 = 2
+    assert interdependent_state.v1x2x2 == 8
+
+
 def test_per_state_backend_var(interdependent_state: InterdependentState) -> None:
     """Set backend var on one instance, expect no affect in other instances.
 
@@ -1588,12 +1697,13 @@ async def test_state_with_invalid_yield(capsys, mock_app):
     assert "must only return/yield: None, Events or other EventHandlers" in captured.out
 
 
-@pytest.fixture(scope="function", params=["in_process", "redis"])
-def state_manager(request) -> Generator[StateManager, None, None]:
-    """Instance of state manager parametrized for redis and in-process.
+@pytest.fixture(scope="function", params=["in_process", "disk", "redis"])
+def state_manager(request, tmp_path) -> Generator[StateManager, None, None]:
+    """Instance of state manager parametrized for redis, disk and in-process.
 
     Args:
         request: pytest request object.
+        tmp_path: A temporary directory.
 
     Yields:
         A state manager instance
@@ -1602,6 +1712,8 @@ def state_manager(request) -> Generator[StateManager, None, None]:
     if request.param == "redis":
         if not isinstance(state_manager, StateManagerRedis):
             pytest.skip("Test requires redis")
+    elif request.param == "disk":
+        state_manager = StateManagerDisk(state=TestState, path=tmp_path / "states.db")
     else:
         # explicitly NOT using redis
         state_manager = StateManagerMemory(state=TestState)
@@ -1609,7 +1721,7 @@ def state_manager(request) -> Generator[StateManager, None, None]:
 
     yield state_manager
 
-    if isinstance(state_manager, StateManagerRedis):
+    if isinstance(state_manager, (StateManagerRedis, StateManagerDisk)):
         asyncio.get_event_loop().run_until_complete(state_manager.close())
 
 
@@ -1698,6 +1810,321 @@ async def test_state_manager_contend(
         assert not state_manager._states_locks[token].locked()
 
 
+@pytest.mark.asyncio
+async def test_state_manager_read_state(
+    state_manager: StateManager, token: str, substate_token: str
+):
+    """Multiple coroutines reading the same state concurrently.
+
+    Args:
+        state_manager: A state manager instance.
+        token: A token.
+        substate_token: A token + substate name for looking up in state manager.
+    """
+    async with state_manager.modify_state(substate_token) as state:
+        state.num1 = 42
+
+    readers = 0
+    all_readers = asyncio.Event()
+
+    async def _read():
+        nonlocal readers
+        async with state_manager.read_state(substate_token) as state:
+            assert state.num1 == 42
+            readers += 1
+            if readers == 2:
+                all_readers.set()
+            await asyncio.wait_for(all_readers.wait(), timeout=5)
+
+    await asyncio.gather(_read(), _read())
+
+    if isinstance(state_manager, StateManagerRedis):
+        assert (await state_manager.redis.get(f"{token}_lock")) is None
+    elif isinstance(state_manager, StateManagerMemory):
+        assert not state_manager._states_readers
+        assert not state_manager._states_in_use
+
+        # A writer waits for the reader which got the state first.
+        order = []
+
+        async def _write():
+            async with state_manager.modify_state(substate_token):
+                order.append("write")
+
+        async with state_manager.read_state(substate_token):
+            writer = asyncio.create_task(_write())
+            await asyncio.sleep(0.01)
+            order.append("read")
+        await writer
+        assert order == ["read", "write"]
+
+
+@pytest.mark.asyncio
+async def test_state_manager_memory_eviction(tmp_path):
+    """Test that the memory state manager evicts, spills and restores states.
+
+    Args:
+        tmp_path: A temporary directory.
+    """
+    state_manager = StateManagerMemory(
+        state=TestState, max_states=2, spill_dir=tmp_path
+    )
+    for token in ("a", "b"):
+        async with state_manager.modify_state(token) as state:
+            state.num1 = ord(token)
+    # Accessing "a" makes "b" the least recently used state.
+    await state_manager.get_state("a")
+    await state_manager.get_state("c")
+    assert set(state_manager.states) == {"a", "c"}
+    assert set(state_manager._last_access) == {"a", "c"}
+    await asyncio.gather(*state_manager._spill_tasks.values())
+    assert len(list(tmp_path.glob("*.state"))) == 1
+
+    # The spilled state is restored with its substates.
+    state = await state_manager.get_state("b")
+    assert state.num1 == ord("b")
+    assert state.get_substate(
+        [ChildState.get_name(), GrandchildState.get_name()]
+    ).parent_state is state.get_substate([ChildState.get_name()])
+    assert set(state_manager.states) == {"c", "b"}
+    await asyncio.gather(*state_manager._spill_tasks.values())
+
+    # Without a spill directory, evicted states start over.
+    state_manager.spill_dir = None
+    async with state_manager.modify_state("c") as state:
+        state.num1 = ord("c")
+    await state_manager.get_state("b")
+    await state_manager.get_state("d")
+    assert set(state_manager.states) == {"b", "d"}
+    assert (await state_manager.get_state("c")).num1 == 0
+
+
+class UnpicklableState(BaseState):
+    """A state with a backend var which cannot be pickled."""
+
+    _items: Any = None
+
+
+@pytest.mark.asyncio
+async def test_state_manager_memory_spill_unpicklable(tmp_path):
+    """Test that states which cannot be spilled are evicted without spilling.
+
+    Args:
+        tmp_path: A temporary directory.
+    """
+    state_manager = StateManagerMemory(
+        state=UnpicklableState, max_states=1, spill_dir=tmp_path
+    )
+    async with state_manager.modify_state("a") as state:
+        state._items = (i for i in range(3))
+    await state_manager.get_state("b")
+    assert set(state_manager.states) == {"b"}
+    await asyncio.gather(*state_manager._spill_tasks.values())
+    assert not list(tmp_path.glob("*.state"))
+
+    # The state is not restored and starts over.
+    assert (await state_manager.get_state("a"))._items is None
+    assert set(state_manager.states) == {"a"}
+    await asyncio.gather(*state_manager._spill_tasks.values())
+
+
+@pytest.mark.asyncio
+async def test_state_manager_memory_spill_expiration(tmp_path):
+    """Test that spilled states expire even without a token expiration.
+
+    Args:
+        tmp_path: A temporary directory.
+    """
+    state_manager = StateManagerMemory(
+        state=TestState, max_states=1, spill_dir=tmp_path, spill_expiration=60
+    )
+    await state_manager.get_state("a")
+    await state_manager.get_state("b")
+    await asyncio.gather(*state_manager._spill_tasks.values())
+    (spill_path,) = tmp_path.glob("*.state")
+
+    state_manager.evict_expired_states()
+    assert spill_path.exists()
+
+    expired = time.time() - 61
+    os.utime(spill_path, (expired, expired))
+    state_manager.evict_expired_states()
+    assert not spill_path.exists()
+    assert set(state_manager.states) == {"b"}
+
+
+@pytest.mark.asyncio
+async def test_state_manager_memory_expiration():
+    """Test that expired states are evicted unless they are being modified."""
+    state_manager = StateManagerMemory(state=TestState, token_expiration=0)
+    await state_manager.get_state("a")
+    async with state_manager.modify_state("b"):
+        state_manager.evict_expired_states()
+        assert set(state_manager.states) == {"b"}
+    state_manager.evict_expired_states()
+    assert not state_manager.states
+    assert not state_manager._states_locks
+
+
+@pytest.mark.asyncio
+async def test_state_manager_disk_persistence(tmp_path, token: str):
+    """Test that the disk state manager shares substates between instances.
+
+    Args:
+        tmp_path: A temporary directory.
+        token: A token.
+    """
+    path = tmp_path / "states.db"
+    state_manager = StateManagerDisk(state=TestState, path=path)
+    async with state_manager.modify_state(_substate_key(token, ChildState)) as state:
+        state.num1 = 42
+        state.get_substate([ChildState.get_name()]).count = 7
+    await state_manager.close()
+
+    # Another manager (e.g. in another worker) sees the persisted substates.
+    other_state_manager = StateManagerDisk(state=TestState, path=path)
+    child_state = await other_state_manager.get_state(
+        _substate_key(token, ChildState), top_level=False, get_substates=False
+    )
+    assert isinstance(child_state, ChildState)
+    assert child_state.count == 7
+    assert child_state.parent_state.num1 == 42  # type: ignore
+    # Unrelated substates are not fetched.
+    assert ChildState2.get_name() not in child_state.parent_state.substates  # type: ignore
+
+    # Writing with a lock that is not held fails.
+    with pytest.raises(LockExpiredError):
+        await other_state_manager.set_state(
+            _substate_key(token, TestState),
+            child_state.parent_state,
+            b"stale",  # type: ignore
+        )
+    await other_state_manager.close()
+
+
+@pytest.mark.asyncio
+async def test_state_manager_disk_lock_expire(tmp_path, token: str):
+    """Test that an expired disk lock is taken over by a waiter.
+
+    Args:
+        tmp_path: A temporary directory.
+        token: A token.
+    """
+    state_manager = StateManagerDisk(
+        state=TestState, path=tmp_path / "states.db", lock_expiration=LOCK_EXPIRATION
+    )
+    substate_token = _substate_key(token, TestState)
+    state = await state_manager.get_state(substate_token)
+    order = []
+
+    async def _coro_waiter():
+        async with state_manager._lock(substate_token):
+            order.append("waiter")
+
+    with pytest.raises(LockExpiredError):
+        async with state_manager._lock(substate_token) as lock_id:
+            waiter = asyncio.create_task(_coro_waiter())
+            await asyncio.sleep(LOCK_EXPIRE_SLEEP)
+            order.append("blocker")
+            state.num1 = 1
+            await state_manager.set_state(substate_token, state, lock_id)
+    await waiter
+    assert order == ["waiter", "blocker"]
+    await state_manager.close()
+
+
+@pytest.mark.asyncio
+async def test_state_manager_disk_read_state_overlap(tmp_path, token: str):
+    """Test that disk readers overlap, as the lock is only held while fetching.
+
+    Args:
+        tmp_path: A temporary directory.
+        token: A token.
+    """
+    state_manager = StateManagerDisk(state=TestState, path=tmp_path / "states.db")
+    substate_token = _substate_key(token, TestState)
+    async with state_manager.modify_state(substate_token) as state:
+        state.num1 = 42
+
+    reading = asyncio.Event()
+    done_reading = asyncio.Event()
+    readers = []
+
+    async def _read():
+        async with state_manager.read_state(substate_token) as state:
+            readers.append(state.num1)
+            if len(readers) == 2:
+                reading.set()
+            await asyncio.wait_for(done_reading.wait(), timeout=5)
+
+    tasks = asyncio.gather(_read(), _read())
+    await asyncio.wait_for(reading.wait(), timeout=5)
+    # Both readers are reading, and a writer is not blocked by them.
+    async with state_manager.modify_state(substate_token) as state:
+        state.num1 = 43
+    done_reading.set()
+    await tasks
+    assert readers == [42, 42]
+    assert (await state_manager.get_state(substate_token)).num1 == 43
+    await state_manager.close()
+
+
+def test_state_manager_create_mode(tmp_path, mocker):
+    """Test that the configured state manager mode is created.
+
+    Args:
+        tmp_path: A temporary directory.
+        mocker: Pytest mocker object.
+    """
+    config = rx.Config(
+        app_name="project1",
+        state_manager_mode=constants.StateManagerMode.DISK,
+        disk_state_path=str(tmp_path / "states.db"),
+    )
+    mocker.patch("reflex.state.get_config", return_value=config)
+    state_manager = StateManager.create(state=TestState)
+    assert isinstance(state_manager, StateManagerDisk)
+    assert state_manager.path == tmp_path / "states.db"
+
+    config.state_manager_mode = constants.StateManagerMode.REDIS
+    mocker.patch("reflex.utils.prerequisites.get_redis", return_value=None)
+    with pytest.raises(InvalidStateManagerMode):
+        StateManager.create(state=TestState)
+
+
+def test_state_manager_create_expiration(tmp_path, mocker):
+    """Test that the state expirations fall back to the redis expirations.
+
+    Args:
+        tmp_path: A temporary directory.
+        mocker: Pytest mocker object.
+    """
+    config = rx.Config(
+        app_name="project1",
+        state_manager_mode=constants.StateManagerMode.DISK,
+        disk_state_path=str(tmp_path / "states.db"),
+        redis_lock_expiration=20000,
+        redis_token_expiration=5600,
+    )
+    mocker.patch("reflex.state.get_config", return_value=config)
+    state_manager = StateManager.create(state=TestState)
+    assert isinstance(state_manager, StateManagerDisk)
+    assert state_manager.lock_expiration == 20000
+    assert state_manager.token_expiration == 5600
+
+    config.state_lock_expiration = 30000
+    config.state_token_expiration = 7600
+    state_manager = StateManager.create(state=TestState)
+    assert state_manager.lock_expiration == 30000  # type: ignore
+    assert state_manager.token_expiration == 7600  # type: ignore
+
+    config.state_manager_mode = constants.StateManagerMode.MEMORY
+    config.memory_state_spill_dir = str(tmp_path / "spill")
+    state_manager = StateManager.create(state=TestState)
+    assert isinstance(state_manager, StateManagerMemory)
+    assert state_manager.spill_expiration == 7600
+
+
 @pytest.fixture(scope="function")
 def state_manager_redis() -> Generator[StateManager, None, None]:
     """Instance of state manager for redis only.
@@ -1794,6 +2221,418 @@ async def test_state_manager_lock_expire_contend(
     assert (await state_manager_redis.get_state(substate_token_redis)).num1 == exp_num1
 
 
+@pytest.mark.asyncio
+async def test_state_manager_get_state_single_round_trip(
+    state_manager_redis: StateManager, token: str, mocker
+):
+    """Test that all required substates are fetched from redis in one pipeline.
+
+    Args:
+        state_manager_redis: A state manager instance.
+        token: A token.
+        mocker: Pytest mocker object.
+    """
+    state_manager_redis.cache_size = 0  # type: ignore
+    async with state_manager_redis.modify_state(
+        _substate_key(token, GrandchildState)
+    ) as state:
+        state.num1 = 42
+        state.get_substate(GrandchildState.get_full_name().split(".")).value2 = "x"
+
+    pipeline_spy = mocker.spy(state_manager_redis.redis, "pipeline")
+    get_spy = mocker.spy(state_manager_redis.redis, "get")
+    root = await state_manager_redis.get_state(_substate_key(token, GrandchildState))
+    assert pipeline_spy.call_count == 1
+    assert get_spy.call_count == 0
+
+    # The parent chain and all substates of the target are linked up.
+    assert root.num1 == 42
+    grandchild = root.get_substate(GrandchildState.get_full_name().split("."))
+    assert grandchild.value2 == "x"
+    assert grandchild.parent_state.parent_state is root
+    # Potentially dirty substates (those with computed vars) are also fetched.
+    for substate_cls in TestState._potentially_dirty_substates():
+        assert substate_cls.get_name() in root.substates
+
+
+def test_state_manager_redis_legacy_keys(token: str):
+    """Test that the redis keys of a token are not hash tagged by default.
+
+    Args:
+        token: A token.
+    """
+    state_manager = StateManagerRedis(state=TestState, redis=Redis())
+    assert not state_manager.cluster_hash_tags
+    assert state_manager._lock_key(token) == f"{token}_lock".encode()
+    assert state_manager._storage_key(token, ChildState) == _substate_key(
+        token, ChildState
+    )
+
+
+def test_state_manager_redis_key_slot(token: str):
+    """Test that the lock and substate keys of a token share a Redis Cluster slot.
+
+    Args:
+        token: A token.
+    """
+    state_manager = StateManagerRedis(
+        state=TestState, redis=Redis(), cluster_hash_tags=True
+    )
+    keys = [
+        state_manager._lock_key(token),
+        *(
+            state_manager._storage_key(token, state_cls).encode()
+            for state_cls in (TestState, ChildState, GrandchildState)
+        ),
+    ]
+    assert len({key_slot(key) for key in keys}) == 1
+    assert key_slot(keys[0]) != key_slot(state_manager._lock_key(f"other{token}"))
+
+
+@pytest.mark.asyncio
+async def test_state_manager_set_state_lock_lost(
+    state_manager_redis: StateManager, token: str, substate_token_redis: str
+):
+    """Test that no substate is written back when the lock is no longer held.
+
+    Args:
+        state_manager_redis: A state manager instance.
+        token: A token.
+        substate_token_redis: A token + substate name for looking up in state manager.
+    """
+    async with state_manager_redis.modify_state(substate_token_redis) as state:
+        state.num1 = 1
+        state.get_substate(ChildState.get_full_name().split(".")).count = 1
+
+    lock_key = state_manager_redis._lock_key(token)  # type: ignore
+    with pytest.raises(LockExpiredError):
+        async with state_manager_redis.modify_state(substate_token_redis) as state:
+            state.num1 = 2
+            state.get_substate(ChildState.get_full_name().split(".")).count = 2
+            # Another worker acquires the lock before the write-back.
+            await state_manager_redis.redis.set(lock_key, b"other")  # type: ignore
+    await state_manager_redis.redis.delete(lock_key)  # type: ignore
+
+    state = await state_manager_redis.get_state(substate_token_redis)
+    assert state.num1 == 1
+    assert state.get_substate(ChildState.get_full_name().split(".")).count == 1
+
+
+@pytest.mark.asyncio
+async def test_state_manager_lock_waiters_share_listener(
+    state_manager_redis: StateManager, substate_token_redis: str, mocker
+):
+    """Test that waiters for a contended lock share one listener and queue up in order.
+
+    Args:
+        state_manager_redis: A state manager instance.
+        substate_token_redis: A token + substate name for looking up in state manager.
+        mocker: Pytest mocker object.
+    """
+    assert isinstance(state_manager_redis, StateManagerRedis)
+    pubsub_spy = mocker.spy(state_manager_redis.redis, "pubsub")
+    config_set_spy = mocker.spy(state_manager_redis.redis, "config_set")
+    order = []
+
+    async def _coro(n: int):
+        async with state_manager_redis.modify_state(substate_token_redis) as state:
+            order.append(n)
+            state.num1 += 1
+
+    async with state_manager_redis.modify_state(substate_token_redis) as state:
+        state.num1 = 0
+        tasks = []
+        for n in range(5):
+            tasks.append(asyncio.create_task(_coro(n)))
+            # Let each waiter queue up before starting the next one.
+            while (
+                len(
+                    state_manager_redis._lock_waiters.get(
+                        state_manager_redis._lock_key(substate_token_redis), ()
+                    )
+                )
+                <= n
+            ):
+                await asyncio.sleep(0.01)
+    await asyncio.wait_for(
+        asyncio.gather(*tasks), timeout=state_manager_redis.lock_expiration / 1000.0
+    )
+
+    assert order == list(range(5))
+    assert (await state_manager_redis.get_state(substate_token_redis)).num1 == 5
+    assert pubsub_spy.call_count == 1
+    assert config_set_spy.call_count == 1
+    assert not state_manager_redis._lock_waiters
+
+
+@pytest.mark.asyncio
+async def test_state_manager_lock_waiters_not_overtaken(
+    state_manager_redis: StateManager, substate_token_redis: str
+):
+    """Test that a late lock request does not overtake the queued waiters.
+
+    Args:
+        state_manager_redis: A state manager instance.
+        substate_token_redis: A token + substate name for looking up in state manager.
+    """
+    assert isinstance(state_manager_redis, StateManagerRedis)
+    lock_key = state_manager_redis._lock_key(substate_token_redis)
+    order = []
+
+    async def _coro(name: str):
+        async with state_manager_redis.modify_state(substate_token_redis):
+            order.append(name)
+
+    async with state_manager_redis.modify_state(substate_token_redis):
+        queued = asyncio.create_task(_coro("queued"))
+        while not state_manager_redis._lock_waiters.get(lock_key):
+            await asyncio.sleep(0.01)
+    # The lock is free, but the queued waiter was not notified yet.
+    late = asyncio.create_task(_coro("late"))
+    await asyncio.wait_for(
+        asyncio.gather(queued, late),
+        timeout=state_manager_redis.lock_expiration / 1000.0,
+    )
+
+    assert order == ["queued", "late"]
+    assert not state_manager_redis._lock_waiters
+
+
+@pytest.mark.asyncio
+async def test_state_manager_redis_cache(
+    state_manager_redis: StateManager, token: str, substate_token_redis: str
+):
+    """Test that cached substates are reused only while their version is current.
+
+    Args:
+        state_manager_redis: A state manager instance.
+        token: A token.
+        substate_token_redis: A token + substate name for looking up in state manager.
+    """
+    assert isinstance(state_manager_redis, StateManagerRedis)
+    version_key = f"{state_manager_redis._storage_key(token, TestState)}:version"
+
+    # Without the cache, no versions are stored.
+    async with state_manager_redis.modify_state(substate_token_redis) as state:
+        state.num1 = 1
+    assert not await state_manager_redis.redis.exists(version_key)
+
+    state_manager_redis.cache_size = 100
+    async with state_manager_redis.modify_state(substate_token_redis) as state:
+        state.num1 = 1
+    assert state_manager_redis.cache_info().misses > 0
+    version = await state_manager_redis.redis.get(version_key)
+    assert version is not None
+
+    # The same worker reuses the instances it wrote.
+    async with state_manager_redis.modify_state(substate_token_redis) as cached_state:
+        assert cached_state is state
+        assert cached_state.num1 == 1
+        cached_state.num1 = 2
+    cache_info = state_manager_redis.cache_info()
+    assert cache_info.hits > 0
+    assert cache_info.size > 0
+
+    # Another worker modifies the state, so the cached instance is stale.
+    other_state_manager = StateManager.create(TestState)
+    assert isinstance(other_state_manager, StateManagerRedis)
+    other_state_manager.cache_size = 100
+    async with other_state_manager.modify_state(substate_token_redis) as other_state:
+        assert other_state.num1 == 2
+        other_state.num1 = 3
+    await other_state_manager.close()
+    # Each write stores a new random version.
+    assert await state_manager_redis.redis.get(version_key) not in (None, version)
+
+    misses = state_manager_redis.cache_info().misses
+    fresh_state = await state_manager_redis.get_state(substate_token_redis)
+    assert fresh_state is not state
+    assert fresh_state.num1 == 3
+    assert state_manager_redis.cache_info().misses > misses
+
+    # Instances are taken out of the cache until they are written back.
+    assert await state_manager_redis.get_state(substate_token_redis) is not fresh_state
+
+    # The cache is bounded.
+    state_manager_redis.cache_size = 1
+    async with state_manager_redis.modify_state(substate_token_redis):
+        pass
+    assert state_manager_redis.cache_info().size == 1
+
+
+@pytest.mark.asyncio
+async def test_state_manager_redis_hash_layout(
+    state_manager_redis: StateManager, token: str, substate_token_redis: str
+):
+    """Test that only the modified vars are written with the hash layout.
+
+    Args:
+        state_manager_redis: A state manager instance.
+        token: A token.
+        substate_token_redis: A token + substate name for looking up in state manager.
+    """
+    assert isinstance(state_manager_redis, StateManagerRedis)
+    state_manager_redis.layout = constants.StateLayout.HASH
+    async with state_manager_redis.modify_state(substate_token_redis) as state:
+        state.num1 = 1
+        state.key = "a"
+
+    hash_key = state_manager_redis._storage_key(token, TestState)
+    assert await state_manager_redis.redis.hget(hash_key, "v:num1") is not None
+
+    # Change a field behind the back of the state manager, which is not
+    # overwritten when another var is modified.
+    codec = state_manager_redis.codec
+    await state_manager_redis.redis.hset(hash_key, "v:key", codec._encode_field("b"))  # type: ignore
+    async with state_manager_redis.modify_state(substate_token_redis) as state:
+        assert state.key == "b"
+        state.num1 = 2
+
+    state = await state_manager_redis.get_state(substate_token_redis)
+    assert state.num1 == 2
+    assert state.key == "b"
+
+
+class MigratedState(BaseState):
+    """A state with vars that changed after another state was persisted."""
+
+    value: int = 0
+    count: int = 0
+    _backend: int = 0
+
+
+@pytest.mark.parametrize("compression", [None, "zstd", "lz4"])
+def test_pickle_state_codec_roundtrip(test_state: TestState, compression):
+    """Test that the pickle codec restores vars and computed var caches.
+
+    Args:
+        test_state: A state.
+        compression: The compression algorithm to use.
+    """
+    if compression is not None:
+        pytest.importorskip("zstandard" if compression == "zstd" else "lz4")
+    codec = PickleStateCodec(compression=compression, compression_threshold=0)
+    child_state = test_state.get_substate([ChildState.get_name()])
+    child_state.value = "value"
+    test_state.num1 = 42
+    assert test_state.sum == 42 + 3.14
+
+    data = codec.encode(test_state)
+    state = codec.decode(data, TestState)
+    assert isinstance(state, TestState)
+    assert state.parent_state is None
+    assert state.substates == {}
+    assert state.dirty_vars == test_state.dirty_vars
+    assert state.num1 == 42
+    assert state.fig == test_state.fig
+    assert state.dt == test_state.dt
+    assert state.sum == 42 + 3.14
+
+    child = codec.decode(codec.encode(child_state), ChildState)
+    assert child.value == "value"
+    assert child.count == 23
+
+    grandchild_state = test_state.get_substate(
+        [ChildState2.get_name(), GrandchildState2.get_name()]
+    )
+    assert grandchild_state.cached == ""
+    grandchild = codec.decode(codec.encode(grandchild_state), GrandchildState2)
+    assert "__cached_cached" in grandchild.__dict__
+
+
+def test_pickle_state_codec_legacy_dill(test_state: TestState):
+    """Test that states persisted in the legacy dill format are still decoded.
+
+    Args:
+        test_state: A state.
+    """
+    child_state = test_state.get_substate([ChildState.get_name()])
+    child_state.count = 7
+    state = PickleStateCodec().decode(dill.dumps(child_state, byref=True), ChildState)
+    assert isinstance(state, ChildState)
+    assert state.count == 7
+
+    assert DillStateCodec().decode(PickleStateCodec().encode(child_state), ChildState)
+
+
+def test_pickle_state_codec_schema_change():
+    """Test that states persisted with a different schema are migrated."""
+    codec = PickleStateCodec()
+
+    class OldState(BaseState):
+        value: str = "1"
+        count: int = 5
+        removed: int = 3
+        _backend: int = 2
+
+    # Vars of the new class that still exist and validate are kept.
+    old_state = OldState(_reflex_internal_init=True)  # type: ignore
+    state = codec.decode(codec.encode(old_state), MigratedState)
+    assert isinstance(state, MigratedState)
+    assert state.value == 1
+    assert state.count == 5
+    assert state._backend == 2
+    assert not hasattr(state, "removed")
+    assert state._get_was_touched()
+
+    old_state.value = "not a number"
+    state = codec.decode(codec.encode(old_state), MigratedState)
+    assert state.value == 0
+    assert state.count == 5
+
+
+def test_pickle_state_codec_fields(test_state: TestState):
+    """Test that the pickle codec encodes only the requested vars as fields.
+
+    Args:
+        test_state: A state.
+    """
+    codec = PickleStateCodec()
+    test_state.num1 = 42
+    test_state._clean()
+    encoded, deleted = codec.encode_fields(test_state)
+    assert "v:num1" in encoded
+    assert "v:fig" in encoded
+
+    state = codec.decode_fields(
+        {field.encode(): value for field, value in encoded.items()}, TestState
+    )
+    assert state.num1 == 42
+    assert state.fig == test_state.fig
+    assert state.dirty_vars == set()
+    assert state._unpersisted_vars == set()
+
+    # Modifications are tracked once the state was decoded from fields.
+    state.num2 = 1.5
+    assert state._get_was_touched()
+    encoded, deleted = codec.encode_fields(state, state._unpersisted_vars)
+    assert {field for field in encoded if field.startswith("v:")} == {"v:num2"}
+    # The computed var depending on num2 is no longer cached.
+    assert deleted == ["c:__cached_sum", "c:__last_updated_sum"]
+
+    grandchild_state = test_state.get_substate(
+        [ChildState2.get_name(), GrandchildState2.get_name()]
+    )
+    assert grandchild_state.cached == ""
+    encoded, deleted = codec.encode_fields(grandchild_state, {"cached"})
+    assert "c:__cached_cached" in encoded
+    GrandchildState2.computed_vars["cached"].mark_dirty(grandchild_state)
+    encoded, deleted = codec.encode_fields(grandchild_state, {"cached"})
+    assert deleted == ["c:__cached_cached"]
+
+
+def test_pickle_state_codec_unsupported_version(test_state: TestState):
+    """Test that an unknown format version raises an error.
+
+    Args:
+        test_state: A state.
+    """
+    data = bytearray(PickleStateCodec().encode(test_state))
+    data[2] = 255
+    with pytest.raises(StateSerializationError):
+        PickleStateCodec().decode(bytes(data), TestState)
+
+
 @pytest.fixture(scope="function")
 def mock_app(monkeypatch, state_manager: StateManager) -> rx.App:
     """Mock app fixture.
@@ -2187,6 +3026,155 @@ async def test_background_task_no_chain():
         await bts.bad_chain2()
 
 
+class ReadOnlyState(BaseState):
+    """A state with read-only event handlers."""
+
+    value: int = 0
+    items: List[int] = [1, 2, 3]
+
+    @rx.read_only
+    async def read_value(self):
+        """Read the value while other read-only events may run.
+
+        Returns:
+            An event showing the value.
+        """
+        ReadOnlyState._readers += 1
+        await ReadOnlyState._all_reading.wait()
+        return rx.console_log(str(self.value))
+
+    @rx.read_only
+    def write_value(self):
+        """Try to modify the state."""
+        self.value += 1
+
+    @rx.run_in_thread
+    @rx.read_only
+    def read_in_thread(self):
+        """Record the thread reading the value.
+
+        Returns:
+            An event showing the value.
+        """
+        ReadOnlyState._thread_names.append(threading.current_thread().name)
+        return rx.console_log(str(self.value))
+
+    # The number of read_value calls processing and the event set when all are.
+    _readers: ClassVar[int] = 0
+    _all_reading: ClassVar[asyncio.Event]
+
+    # The names of the threads running read_in_thread.
+    _thread_names: ClassVar[List[str]] = []
+
+
+@pytest.mark.asyncio
+async def test_read_only_state_proxy(mock_app: rx.App):
+    """Test that a read-only event handler cannot modify the state.
+
+    Args:
+        mock_app: An app that will be returned by `get_app()`
+    """
+    assert ReadOnlyState.event_handlers["read_value"].is_read_only
+    assert not BackgroundTaskState.event_handlers["background_task"].is_read_only
+    assert not ReadOnlyState.event_handlers["set_value"].is_read_only
+
+    proxy = ReadOnlyStateProxy(ReadOnlyState(_reflex_internal_init=True))  # type: ignore
+    assert proxy.value == 0
+    assert proxy.items[0] == 1
+    with pytest.raises(ImmutableStateError):
+        proxy.value = 1
+    with pytest.raises(ImmutableStateError):
+        proxy.items.append(4)
+    with pytest.raises(ImmutableStateError):
+        proxy.write_value()
+    with pytest.raises(ImmutableStateError):
+        async with proxy:
+            pass
+    assert isinstance(await proxy.get_state(ReadOnlyState), ReadOnlyStateProxy)
+
+
+@pytest.mark.asyncio
+async def test_read_only_events_concurrent(mock_app: rx.App, token: str):
+    """Test that read-only events for the same token are processed concurrently.
+
+    Args:
+        mock_app: An app that will be returned by `get_app()`
+        token: A token.
+    """
+    mock_app.state_manager.state = mock_app.state = ReadOnlyState
+    ReadOnlyState._readers = 0
+    ReadOnlyState._all_reading = asyncio.Event()
+
+    async def _read() -> List[StateUpdate]:
+        event = Event(
+            token=token,
+            name=f"{ReadOnlyState.get_full_name()}.read_value",
+            router_data={"query": {}},
+            payload={},
+        )
+        return [
+            update
+            async for update in rx.app.process(  # type: ignore
+                mock_app, event, sid="", headers={}, client_ip=""
+            )
+        ]
+
+    # The first event sets the router data, which requires exclusive access.
+    ReadOnlyState._all_reading.set()
+    await _read()
+
+    ReadOnlyState._readers = 0
+    ReadOnlyState._all_reading.clear()
+    reads = asyncio.gather(_read(), _read())
+    while ReadOnlyState._readers < 2:
+        await asyncio.sleep(0.01)
+    ReadOnlyState._all_reading.set()
+    for updates in await asyncio.wait_for(reads, timeout=5):
+        assert len(updates) == 1
+        assert not updates[0].delta
+        assert updates[0].final
+        assert updates[0].events[0].name == "_console"
+
+
+@pytest.mark.asyncio
+async def test_read_only_events_not_in_thread(mock_app: rx.App, token: str):
+    """Test that concurrent read-only events marked to run in a thread run on the event loop.
+
+    The readers share one state, so running them in threads would race with the
+    delta of the other reader computed on the event loop.
+
+    Args:
+        mock_app: An app that will be returned by `get_app()`
+        token: A token.
+    """
+    mock_app.state_manager.state = mock_app.state = ReadOnlyState
+    ReadOnlyState._thread_names = []
+    assert not reflex.state._runs_in_thread(
+        ReadOnlyState.event_handlers["read_in_thread"]
+    )
+
+    async def _read() -> List[StateUpdate]:
+        event = Event(
+            token=token,
+            name=f"{ReadOnlyState.get_full_name()}.read_in_thread",
+            router_data={"query": {}},
+            payload={},
+        )
+        return [
+            update
+            async for update in rx.app.process(  # type: ignore
+                mock_app, event, sid="", headers={}, client_ip=""
+            )
+        ]
+
+    await _read()
+    for updates in await asyncio.wait_for(asyncio.gather(_read(), _read()), timeout=5):
+        assert len(updates) == 1
+        assert not updates[0].delta
+        assert updates[0].events[0].name == "_console"
+    assert ReadOnlyState._thread_names == [threading.current_thread().name] * 3
+
+
 def test_mutable_list(mutable_state: MutableTestState):
     """Test that mutable lists are tracked correctly.
 
@@ -2241,6 +3229,230 @@ def test_mutable_list(mutable_state: MutableTestState):
         assert_array_dirty()
 
 
+class PatchState(BaseState):
+    """A state with large mutable vars sent as patches."""
+
+    rows: List[Dict[str, int]] = [{"id": i} for i in range(PATCH_MIN_LENGTH)]
+    index: Dict[str, List[int]] = {str(i): [i] for i in range(PATCH_MIN_LENGTH)}
+    small: List[int] = [0]
+
+
+def test_mutable_patch_delta():
+    """Test that changes of large mutable vars are sent as patch operations."""
+    state = PatchState(_reflex_internal_init=True)  # type: ignore
+
+    def get_patches() -> dict:
+        delta = state.get_delta()[PatchState.get_full_name()]
+        state._clean()
+        return {
+            var: value[CompileVars.PATCH]
+            if isinstance(value, dict) and CompileVars.PATCH in value
+            else None
+            for var, value in delta.items()
+        }
+
+    state.rows.append({"id": -1})
+    state.rows[1]["id"] = -2
+    for row in state.rows:
+        row["seen"] = 1
+        break
+    state.index.setdefault("new", [1])
+    state.index["2"].append(1)
+    state.index.pop("0")
+    state.index.update({"1": []})
+    state.small.append(1)
+    assert get_patches() == {
+        "rows": [
+            ["extend", [], [{"id": -1}]],
+            ["set", [1, "id"], -2],
+            ["set", [0, "seen"], 1],
+        ],
+        "index": [
+            ["set", ["new"], [1]],
+            ["extend", ["2"], [1]],
+            ["delete", ["0"]],
+            ["update", [], {"1": []}],
+        ],
+        "small": None,
+    }
+
+    # Values changed after they were added send the full value.
+    row = {"id": -1}
+    state.rows.append(row)
+    row["id"] = -2
+    assert get_patches() == {"rows": None}
+    state.rows.append({"id": -1})
+    state.rows[-1]["id"] = -2
+    assert get_patches() == {"rows": None}
+    state.index.update({"1": [1]})
+    state.index["1"].append(2)
+    delta = state.get_delta()[PatchState.get_full_name()]
+    state._clean()
+    assert delta["index"]["1"] == [1, 2]
+
+    # Values changed and restored before the delta is built are still patched.
+    row = {"id": -1}
+    state.rows.append(row)
+    row["id"] = -2
+    row["id"] = -1
+    assert get_patches() == {"rows": [["extend", [], [{"id": -1}]]]}
+
+    # A nested proxy taken before a structural change may point to another item.
+    row = state.rows[1]
+    state.rows.insert(0, {})
+    row["id"] = 0
+    assert get_patches() == {"rows": None}
+
+    # Assigning the var sends the full value.
+    state.rows.append({})
+    state.rows = state.rows[:-1]
+    state.rows.append({})
+    assert get_patches() == {"rows": None}
+
+    # Unknown changes send the full value.
+    state.rows.sort(key=lambda row: row.get("id", 0))
+    assert get_patches() == {"rows": None}
+
+    # A proxy taken into a var replaced since does not record patches.
+    row = state.rows[1]
+    state.rows = [{"id": i} for i in range(PATCH_MIN_LENGTH)]
+    state._clean()
+    row["id"] = 3
+    state.rows[2]["id"] = 4
+    assert get_patches() == {"rows": None}
+
+    # Patches are neither persisted with the state nor shared with its copies.
+    state.rows.append({})
+    serialized = state.__getstate__()
+    for attr in ("_var_patches", "_var_patch_epochs"):
+        assert attr not in state.__dict__
+        assert attr not in serialized["__dict__"]
+        assert attr not in serialized["__private_attribute_values__"]
+    assert state.copy()._var_patches == {}
+    assert state._var_patches
+
+
+def test_mutable_proxy_cached(mutable_state: MutableTestState):
+    """Test that proxies and their tracking methods are reused during an event.
+
+    Args:
+        mutable_state: A test state.
+    """
+    mutable_state.array = [{"foo": "bar"}]
+    mutable_state._clean()
+
+    array = mutable_state.array
+    assert mutable_state.array is array
+    assert array[0] is array[0]
+    assert next(iter(array)) is array[0]
+
+    # Changes through the cached proxies are still tracked.
+    array[0]["foo"] = "baz"
+    assert mutable_state.dirty_vars == {"array"}
+    array.append(1)
+    assert mutable_state.array == [{"foo": "baz"}, 1]
+
+    # The cache is not part of the fields of the state, nor persisted.
+    assert "_mutable_proxies" not in mutable_state.__dict__
+    assert "_mutable_proxies" not in super(Base, mutable_state).dict()
+    serialized = mutable_state.__getstate__()
+    assert "_mutable_proxies" not in serialized["__private_attribute_values__"]
+
+    # The proxies are dropped when the state is cleaned, without reference cycles.
+    proxy_ref = weakref.ref(array)
+    gc.disable()
+    try:
+        del array
+        mutable_state._clean()
+        assert proxy_ref() is None
+    finally:
+        gc.enable()
+
+
+def test_state_update_encode():
+    """Test that an encoded state update matches its json representation."""
+    update = StateUpdate(
+        delta={"state": {"rows": [{"id": 1, "name": "ü"}], "count": 1}},
+        events=[Event(token="token", name="state.handler", payload={"a": 1})],
+        final=False,
+    )
+    encoded = update.encode()
+    assert isinstance(encoded, (str, bytes))
+    assert json.loads(encoded) == json.loads(update.json())
+    assert json.loads(encoded)["delta"]["state"]["rows"][0]["name"] == "ü"
+
+
+def test_state_update_figure(test_state: TestState):
+    """Test that figures are only encoded straight to JSON with the state update.
+
+    Args:
+        test_state: A state.
+    """
+    test_state.fig = Figure(layout={"title": "figure"})
+    delta = test_state.get_delta()
+    assert delta[TestState.get_full_name()]["fig"] == serialize_figure(test_state.fig)
+
+    update_delta = test_state._get_delta(defer_json=True)
+    assert update_delta[TestState.get_full_name()]["fig"] is test_state.fig
+    update = StateUpdate(delta=update_delta)
+    assert json.loads(update.encode())["delta"] == json.loads(json_dumps(delta))
+
+
+class NonFiniteBase(Base):
+    """A Base with a NaN field."""
+
+    value: float = float("nan")
+
+
+@pytest.mark.parametrize(
+    "value,type_",
+    [
+        (float("nan"), float),
+        (float("inf"), Any),
+        ([1.0, float("-inf")], List[float]),
+        ({"a": 1.0, "b": float("nan")}, Dict[str, float]),
+        ([{"a": float("inf")}], List[Dict[str, Any]]),
+        (NonFiniteBase(), NonFiniteBase),
+    ],
+)
+def test_state_update_encode_non_finite(value: Any, type_: Any):
+    """Test that NaN and infinite floats are not encoded as null.
+
+    Args:
+        value: The value of a var containing non-finite floats.
+        type_: The type of the var.
+    """
+    formatted = format.get_state_formatter(type_, defer_json=True)(value, "value")
+    update = StateUpdate(delta={"state": {"value": formatted, "none": None}})
+    encoded = update.encode()
+    # The json string is parsed by JSON5 on the frontend, like before orjson was used.
+    assert isinstance(encoded, str)
+    assert "NaN" in encoded or "Infinity" in encoded
+    assert json.loads(encoded) == json.loads(update.json())
+
+
+def test_state_update_encode_finite_with_none():
+    """Test that an update with None and only finite floats is encoded to JSON bytes."""
+    formatted = format.get_state_formatter(List[Optional[float]])([0.5, None], "value")
+    update = StateUpdate(delta={"state": {"value": formatted}})
+    encoded = update.encode()
+    if format.orjson is not None:
+        assert isinstance(encoded, bytes)
+    assert json.loads(encoded)["delta"] == {"state": {"value": [0.5, None]}}
+
+
+def test_state_update_encode_msgpack():
+    """Test that a state update is encoded to MessagePack for the msgpack protocol."""
+    msgpack = pytest.importorskip("msgpack")
+    update = StateUpdate(
+        delta={"state": {"rows": [{"id": 1, "name": "ü"}], "ratio": 0.5}},
+        events=[Event(token="token", name="state.handler", payload={"a": 1})],
+    )
+    encoded = update.encode(constants.SocketProtocol.MSGPACK)
+    assert isinstance(encoded, bytes)
+    assert msgpack.unpackb(encoded) == json.loads(update.json())
+
+
 def test_mutable_dict(mutable_state: MutableTestState):
     """Test that mutable dicts are tracked correctly.
 
@@ -2653,8 +3865,11 @@ def test_set_base_field_via_setter():
     assert isinstance(mp, MutableProxy)
     mp2 = mp.set()
     assert mp is mp2
+    # The proxy is cached until the state is cleaned
     mp3 = bfss.c1.set()
-    assert mp is not mp3
+    assert mp is mp3
+    bfss._clean()
+    assert bfss.c1 is not mp
     # Since none of these set calls had values, the state should not be dirty
     assert not bfss.dirty_vars
 
@@ -3154,3 +4369,293 @@ def test_mixin_state() -> None:
     assert "num" in UsesMixinState.base_vars
     assert "num" in UsesMixinState.vars
     assert UsesMixinState.backend_vars == {"_backend": 0}
+
+
+class RangeDataSourceState(DataSourceState, State):
+    """A data source state serving a range of numbers."""
+
+    window_size: ClassVar[int] = 10
+
+    max_cached_windows: ClassVar[int] = 3
+
+    # The offsets of the loaded blocks.
+    loads: List[int] = []
+
+    def _load_rows(self, offset: int, limit: int) -> Tuple[List[Any], int]:
+        """Load a range of numbers, reversed if the query asks so.
+
+        Args:
+            offset: The index of the first row to load.
+            limit: The maximum number of rows to load.
+
+        Returns:
+            The rows and the total number of rows.
+        """
+        self.loads.append(offset)
+        numbers = list(range(95))
+        if self.query.get("reverse"):
+            numbers.reverse()
+        return [[n] for n in numbers[offset : offset + limit]], len(numbers)
+
+
+def test_data_source_state(mocker):
+    """Test that a data source state loads and caches windows of rows.
+
+    Args:
+        mocker: The pytest mocker object.
+    """
+    state = RangeDataSourceState(_reflex_internal_init=True)  # type: ignore
+    state.loads = []
+
+    state.load_region({"x": 0, "y": 15, "width": 1, "height": 10})
+    assert state.window.offset == 10
+    assert state.window.total == 95
+    assert [row[0] for row in state.window.rows] == list(range(10, 30))
+    assert state.loads == [10, 20]
+    assert "window" in state.dirty_vars
+
+    # The visible region is already loaded.
+    state._clean()
+    state.load_region({"x": 0, "y": 12, "width": 1, "height": 5})
+    assert not state.dirty_vars
+    assert state.loads == [10, 20]
+
+    # Cached blocks are not loaded again, and the least recently used are evicted.
+    state.load_page(9)
+    assert [row[0] for row in state.window.rows] == list(range(90, 95))
+    state.load_page(0)
+    state.load_page(2)
+    assert [row[0] for row in state.window.rows] == list(range(20, 30))
+    assert state.loads == [10, 20, 90, 0]
+    state.load_page(1)
+    assert state.loads == [10, 20, 90, 0, 10]
+
+    # A new query clears the cache and reloads the first rows.
+    state.apply_query({"reverse": True})
+    assert state.window == DataWindow(
+        offset=0, rows=[[n] for n in range(94, 84, -1)], total=95
+    )
+    assert state.loads[-1] == 0
+    assert len(state._get_windows()) == 1
+
+    # The cache is kept outside of the state.
+    assert "_window_caches" not in state.backend_vars
+    assert state.dirty_vars == {"window", "query", "loads"}
+    state._clean()
+    state.load_page(0)
+    assert not state.dirty_vars
+
+    # The least recently used states are evicted from the cache.
+    mocker.patch.object(RangeDataSourceState, "max_cached_sources", 1)
+    other_state = RangeDataSourceState(_reflex_internal_init=True)  # type: ignore
+    other_state.query = {"page_size": 10}
+    other_state.loads = []
+    other_state.load_page(0)
+    assert other_state.loads == [0]
+    assert state._get_windows() == {}
+
+
+class ThreadedState(BaseState):
+    """A state with synchronous event handlers running in a thread pool."""
+
+    value: int = 0
+    _thread_names: List[str] = []
+
+    @rx.run_in_thread
+    def wait(self):
+        """Block until the event loop sets the event."""
+        self._thread_names.append(threading.current_thread().name)
+        assert ThreadedState._waiting.wait(timeout=5)
+        self.value += 1
+
+    @rx.run_in_thread
+    def count(self, c: int):
+        """Increment the value c times, yielding after each.
+
+        Args:
+            c: The number of times to increment.
+
+        Yields:
+            After each increment.
+
+        Returns:
+            An event after the last increment.
+        """
+        for _ in range(c):
+            self._thread_names.append(threading.current_thread().name)
+            self.value += 1
+            yield
+        return rx.console_log("done")
+
+    def unmarked(self):
+        """Record the thread the handler runs in."""
+        self._thread_names.append(threading.current_thread().name)
+
+    # The event the wait handler blocks on.
+    _waiting: ClassVar[threading.Event] = threading.Event()
+
+
+@pytest.mark.asyncio
+async def test_process_event_in_thread():
+    """Test that a marked handler runs in a thread, without blocking the event loop."""
+    state = ThreadedState(_reflex_internal_init=True)  # type: ignore
+    ThreadedState._waiting.clear()
+
+    async def _process() -> List[StateUpdate]:
+        event = Event(token="t", name="wait", payload={})
+        return [update async for update in state._process(event)]
+
+    async def _set_waiting():
+        ThreadedState._waiting.set()
+
+    updates, _ = await asyncio.gather(_process(), _set_waiting())
+    assert updates[0].delta[ThreadedState.get_full_name()]["value"] == 1
+    assert updates[0].final
+    assert state._thread_names[0].startswith("reflex_event_handler")
+
+
+@pytest.mark.asyncio
+async def test_process_event_generator_in_thread():
+    """Test that the steps of a marked generator handler run in a thread."""
+    state = ThreadedState(_reflex_internal_init=True)  # type: ignore
+    event = Event(token="t", name="count", payload={"c": 3})
+    updates = [update async for update in state._process(event)]
+    assert [update.delta for update in updates[:3]] == [
+        {ThreadedState.get_full_name(): {"value": value}} for value in (1, 2, 3)
+    ]
+    # The return value of the generator is sent as an event.
+    assert updates[3].events[0].name == "_console"
+    assert not any(update.final for update in updates[:4])
+    assert updates[4].final
+    assert len(updates) == 5
+    assert all(name.startswith("reflex_event_handler") for name in state._thread_names)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("in_thread", [True, False])
+async def test_sync_event_handlers_in_thread(mocker, in_thread: bool):
+    """Test running all synchronous handlers, except setters, in a thread.
+
+    Args:
+        mocker: pytest mock object.
+        in_thread: Whether synchronous handlers run in a thread by config.
+    """
+    mocker.patch(
+        "reflex.state.get_config",
+        return_value=rx.Config(
+            app_name="test", sync_event_handlers_in_thread=in_thread
+        ),
+    )
+    state = ThreadedState(_reflex_internal_init=True)  # type: ignore
+    async for _ in state._process(Event(token="t", name="unmarked")):
+        pass
+    assert state._thread_names[0].startswith("reflex_event_handler") is in_thread
+
+    event = Event(token="t", name="set_value", payload={"value": 5})
+    updates = [update async for update in state._process(event)]
+    assert updates[0].delta[ThreadedState.get_full_name()]["value"] == 5
+
+
+def test_run_in_thread_async():
+    """Test that async handlers cannot be marked to run in a thread."""
+    with pytest.raises(TypeError):
+
+        @rx.run_in_thread
+        async def handler(self):
+            pass
+
+
+class ProcessState(BaseState):
+    """A state with an event handler running in a worker process."""
+
+    values: List[int] = [1, 2, 3]
+    total: int = 0
+    _pids: List[int] = []
+
+    @rx.run_in_process
+    def aggregate(self, factor: int):
+        """Sum the values in a worker process.
+
+        Args:
+            factor: The factor to multiply the sum by.
+
+        Returns:
+            An event logging the sum.
+        """
+        self.total = sum(self.values) * factor
+        self._pids = [*self._pids, os.getpid()]
+        return rx.console_log(str(self.total))
+
+
+@pytest.mark.asyncio
+async def test_process_event_in_process(mock_app: rx.App, token: str):
+    """Test that a handler runs in a worker process and its vars are set on the state.
+
+    Args:
+        mock_app: An app that will be returned by `get_app()`
+        token: A token.
+    """
+    mock_app.state_manager.state = mock_app.state = ProcessState
+    async for update in rx.app.process(  # type: ignore
+        mock_app,
+        Event(
+            token=token,
+            name=f"{ProcessState.get_full_name()}.aggregate",
+            router_data={"query": {}},
+            payload={"factor": 2},
+        ),
+        sid="",
+        headers={},
+        client_ip="",
+    ):
+        # The handler runs in the background.
+        assert update == StateUpdate()
+
+    for task in tuple(mock_app.background_tasks):
+        await task
+
+    state = await mock_app.state_manager.get_state(_substate_key(token, ProcessState))
+    assert state.total == 12
+    assert len(state._pids) == 1
+    assert state._pids[0] != os.getpid()
+
+    assert mock_app.event_namespace is not None
+    messages = [
+        json.loads(call.args[1])
+        for call in mock_app.event_namespace.emit.mock_calls  # type: ignore
+    ]
+    assert messages[-2]["delta"][ProcessState.get_full_name()] == {"total": 12}
+    assert messages[-1]["events"][0]["name"] == "_console"
+    assert messages[-1]["events"][0]["payload"] == {"message": "12"}
+
+    # The handler cannot be called directly.
+    with pytest.raises(RuntimeError):
+        state.aggregate(2)
+
+
+def test_process_state_snapshot():
+    """Test that only the vars of a state snapshot can be read and set."""
+    snapshot = _ProcessStateSnapshot("state", {"value": 1})
+    snapshot.value += 1
+    assert snapshot.value == 2
+    with pytest.raises(AttributeError):
+        _ = snapshot.other
+    with pytest.raises(AttributeError):
+        snapshot.other = 1
+
+    snapshot = dill.loads(dill.dumps(snapshot))
+    assert snapshot._reflex_updates == {"value": 2}
+
+
+def test_run_in_process_invalid():
+    """Test that only synchronous functions can be marked to run in a process."""
+
+    async def async_handler(self):
+        pass
+
+    def generator_handler(self):
+        yield
+
+    for fn in (async_handler, generator_handler):
+        with pytest.raises(TypeError):
+            rx.run_in_process(fn)
@@ -1,11 +1,15 @@
 from __future__ import annotations
 
+import base64
 import datetime
-from typing import Any, List
+import json
+from typing import Any, Dict, List, Literal, Optional, Set, Tuple
 
+import numpy as np
 import plotly.graph_objects as go
 import pytest
 
+import reflex as rx
 from reflex.components.tags.tag import Tag
 from reflex.event import EventChain, EventHandler, EventSpec, FrontendEvent
 from reflex.style import Style
@@ -20,6 +24,7 @@ from tests.test_state import (
     GrandchildState,
     GrandchildState2,
     GrandchildState3,
+    Object,
     TestState,
 )
 
@@ -742,6 +747,38 @@ def test_format_state(input, output):
     assert format.format_state(input) == output
 
 
+@pytest.mark.parametrize(
+    "type_,value",
+    [
+        (int, 1),
+        (str, datetime.date(2024, 1, 1)),
+        (Optional[int], None),
+        (Optional[int], 2),
+        (Literal["a", "b"], "a"),
+        (List[int], [1, 2, 3]),
+        (List[int], [1, datetime.timedelta(1), None]),
+        (List[int], {"not": "a list"}),
+        (Set[str], {"a"}),
+        (Tuple[float, ...], (1.0, 2.5)),
+        (List[Dict[str, int]], [{"a": 1}, {"b": datetime.date(2024, 1, 1)}]),
+        (Dict[str, List[int]], {"a": [1, 2], "b": []}),
+        (Dict[str, Any], {"a": {"b": {datetime.date(2024, 1, 1)}}}),
+        (Dict[int, str], {1: "a", 2: datetime.date(2024, 1, 1)}),
+        (Tuple[int, str], (1, "a")),
+    ],
+)
+def test_get_state_formatter(type_: Any, value: Any):
+    """Test that the compiled formatters give the same result as format_state.
+
+    Args:
+        type_: The type of the state var.
+        value: The value to format.
+    """
+    formatted = format.get_state_formatter(type_)(value, "var")
+    assert formatted == format.format_state(value, "var")
+    assert format.get_state_formatter(type_) is format.get_state_formatter(type_)
+
+
 @pytest.mark.parametrize(
     "input,output",
     [
@@ -831,3 +868,56 @@ def test_format_library_name(input: str, output: str):
 )
 def test_json_dumps(input, output):
     assert format.json_dumps(input) == output
+
+
+@pytest.mark.parametrize(
+    "input,output",
+    [
+        ({"a": [1, 2.5, None, True]}, {"a": [1, 2.5, None, True]}),
+        ({1: "a"}, {"1": "a"}),
+        ({"dt": datetime.date(2024, 1, 2)}, {"dt": "2024-01-02"}),
+        ({"obj": Object()}, {"obj": {"prop1": 42, "prop2": "hello"}}),
+        ({"big": 2**70}, {"big": 2**70}),
+    ],
+)
+def test_json_dumps_state(input, output):
+    """Test dumping formatted state to JSON.
+
+    Args:
+        input: The formatted state.
+        output: The expected parsed JSON.
+    """
+    assert json.loads(format.json_dumps_state(input)) == output
+
+
+@pytest.mark.parametrize("typed_arrays", [False, True])
+def test_json_dumps_state_figure(mocker, typed_arrays: bool):
+    """Test that figure state vars are embedded as their JSON, encoded with the update.
+
+    Args:
+        mocker: Pytest mocker object.
+        typed_arrays: Whether to encode figure arrays as typed arrays.
+    """
+    mocker.patch(
+        "reflex.config.get_config",
+        return_value=rx.Config(app_name="test", plotly_typed_arrays=typed_arrays),
+    )
+    fig = go.Figure(go.Scatter(x=np.array([1, 2, 3]), y=np.array([1.5, 2.5, 3.5])))
+    # The public formatter serializes the figure, the deferred one keeps it as is.
+    assert format.get_state_formatter(go.Figure)(fig, "fig") == serialize_figure(fig)
+    fragment = format.get_state_formatter(go.Figure, defer_json=True)(fig, "fig")
+    assert fragment is fig
+
+    state = {"a": fragment, "b": ["x", fragment]}
+    encoded = format.json_encode_state(state)
+    dumped = json.loads(format.json_dumps_state(state))
+    if encoded is not None:
+        assert json.loads(encoded) == dumped
+    assert dumped["b"][0] == "x"
+    assert dumped["a"] == dumped["b"][1]
+    if typed_arrays and encoded is not None:
+        x = dumped["a"]["data"][0]["x"]
+        assert x["dtype"] == "i4"
+        assert np.frombuffer(base64.b64decode(x["bdata"]), "<i4").tolist() == [1, 2, 3]
+    else:
+        assert dumped["a"] == serialize_figure(fig)